@@ -0,0 +1,325 @@
+# benchmarks/bench_database.py
+# Mede cada função pública do database.py sobre um banco sintético com volumes de produção
+# (centenas de milhares de entregas, dezenas de milhares de lançamentos de caixa e ausências),
+# em vários níveis de concorrência, e grava os resultados em JSON para comparar execuções.
+#
+# Uso: python benchmarks/bench_database.py [--deliveries 300000] [--cash 30000] [--absences 20000]
+#                                           [--concurrency 1 8 32] [--ops 200] [--json resultado.json]
+#      python benchmarks/bench_database.py --compare antes.json depois.json [--threshold 0.2]
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CALLER_DIR = os.getcwd() # Caminhos de --json e --compare são relativos a onde o comando foi executado
+sys.path.insert(0, ROOT)
+os.chdir(ROOT) # metrics importa o config.py, que lê o config.json relativo à raiz
+
+import aiosqlite
+import database
+import metrics
+
+USERS = 2000
+ITEMS = ["Ouro", "Madeira", "Ferro", "Cobre", "Carvão", "Pedra", "Couro", "Tecido"]
+IMAGE_URL = "https://cdn.example/img.png"
+# Funções de ciclo de vida e de migração: rodam uma vez na inicialização, não por requisição
+NOT_BENCHMARKED = {"open_pool", "close_pool", "init_db", "get_schema_version", "apply_migrations"}
+# Grupos cujas regressões bloqueiam o deploy na comparação (--compare sai com código 1)
+CRITICAL_GROUPS = {"ranking", "saldo", "relatorio"}
+
+class Sizes:
+    """Volumes do banco sintético, usados pelos casos para sortear IDs existentes."""
+    def __init__(self, deliveries: int, cash: int, absences: int):
+        self.deliveries = deliveries
+        self.cash = cash
+        self.absences = absences
+
+def _user(rng: random.Random) -> int:
+    return rng.randint(1, USERS)
+
+def _new_ticket_user(rng: random.Random, seq: int) -> int:
+    return USERS + 1 + seq # Usuários sem ticket, para não violar a chave primária
+
+# função -> (grupo, argumentos(rng, seq, sizes))
+CASES = {
+    # Configurações
+    "get_setting": ("config", lambda rng, seq, sizes: ("ranking_message",)),
+    "set_setting": ("config", lambda rng, seq, sizes: (f"bench:{rng.randint(0, 99)}", {"seq": seq})),
+    # Ausências
+    "add_absence": ("ausencia", lambda rng, seq, sizes: (_user(rng), "Viagem", (datetime.now() + timedelta(days=rng.randint(1, 30))).strftime('%Y-%m-%d'))),
+    "get_active_absences": ("ausencia", lambda rng, seq, sizes: ()),
+    "get_expired_absences": ("ausencia", lambda rng, seq, sizes: ()),
+    "deactivate_absence": ("ausencia", lambda rng, seq, sizes: (rng.randint(1, sizes.absences),)),
+    "deactivate_absences": ("ausencia", lambda rng, seq, sizes: ([rng.randint(1, sizes.absences) for _ in range(20)],)),
+    # Farm
+    "get_user_ticket": ("farm", lambda rng, seq, sizes: (_user(rng),)),
+    "create_farm_ticket": ("farm", lambda rng, seq, sizes: (_new_ticket_user(rng, seq), 10**17 + seq)),
+    "delete_farm_ticket": ("farm", lambda rng, seq, sizes: (_new_ticket_user(rng, seq),)),
+    "add_farm_delivery": ("farm", lambda rng, seq, sizes: (_user(rng), rng.choice(ITEMS), rng.randint(1, 5000), IMAGE_URL)),
+    "set_private_message_id": ("farm", lambda rng, seq, sizes: (rng.randint(1, sizes.deliveries), 10**17 + seq)),
+    "set_approval_message_id": ("farm", lambda rng, seq, sizes: (rng.randint(1, sizes.deliveries), 10**17 + seq)),
+    "get_delivery_info": ("farm", lambda rng, seq, sizes: (rng.randint(1, sizes.deliveries),)),
+    "get_user_deliveries": ("farm", lambda rng, seq, sizes: (_user(rng),)),
+    "bulk_update_pending_deliveries": ("farm", lambda rng, seq, sizes: ("negado", _user(rng))),
+    # Ranking
+    "update_delivery_status": ("ranking", lambda rng, seq, sizes: (rng.randint(1, sizes.deliveries), rng.choice(["aprovado", "negado"]))),
+    "get_farm_ranking": ("ranking", lambda rng, seq, sizes: (10,)),
+    "verify_farm_ranking": ("ranking", lambda rng, seq, sizes: ()),
+    # Caixa
+    "get_current_balance": ("saldo", lambda rng, seq, sizes: ()),
+    "record_cash_transaction": ("saldo", lambda rng, seq, sizes: (rng.choice(["entrada", "saida"]), round(rng.uniform(1, 500), 2), "Benchmark", _user(rng))),
+    "add_cash_transaction": ("saldo", lambda rng, seq, sizes: ("entrada", 10.0, "Benchmark", None, database._ledger.balance, round(database._ledger.balance + 10.0, 2), _user(rng))),
+    "set_cash_transaction_image": ("caixa", lambda rng, seq, sizes: (rng.randint(1, sizes.cash), IMAGE_URL)),
+    # Relatórios
+    "get_farm_report_stats": ("relatorio", lambda rng, seq, sizes: ()),
+    "get_cash_control_report_stats": ("relatorio", lambda rng, seq, sizes: ()),
+}
+
+def public_functions() -> dict:
+    return {
+        name: function for name, function in inspect.getmembers(database, inspect.iscoroutinefunction)
+        if not name.startswith("_") and function.__module__ == database.__name__ and name not in NOT_BENCHMARKED
+    }
+
+# --- Dados sintéticos ---
+async def seed(db: aiosqlite.Connection, sizes: Sizes):
+    rng = random.Random(1234)
+    now = datetime.now()
+
+    def deliveries():
+        for _ in range(sizes.deliveries):
+            status = rng.choices(["aprovado", "negado", "pendente"], weights=[70, 20, 10])[0]
+            ts = (now - timedelta(minutes=rng.randint(0, 525600))).isoformat()
+            yield (rng.randint(1, USERS), rng.choice(ITEMS), rng.randint(1, 5000), IMAGE_URL, ts, status)
+
+    def cash():
+        # Livro-caixa encadeado: cada lançamento parte do saldo do anterior
+        balance = 0.0
+        start = now - timedelta(days=365)
+        for i in range(sizes.cash):
+            kind = "entrada" if balance < 1000 or rng.random() < 0.55 else "saida"
+            amount = round(rng.uniform(1, 2000), 2)
+            after = round(balance + amount if kind == "entrada" else balance - amount, 2)
+            ts = (start + timedelta(minutes=i * 525600 // max(1, sizes.cash))).isoformat()
+            yield (kind, amount, "Sintético", IMAGE_URL, balance, after, rng.randint(1, USERS), ts)
+            balance = after
+
+    def absences():
+        # Histórico grande de ausências já encerradas e poucas ativas, como em produção
+        for _ in range(sizes.absences):
+            active = 1 if rng.random() < 0.02 else 0
+            ret = (now + timedelta(days=rng.randint(-365, 30))).strftime('%Y-%m-%d')
+            yield (rng.randint(1, USERS), "Viagem", ret, now.isoformat(), active)
+
+    await db.executemany("INSERT INTO farm_deliveries (user_id, item_name, item_quantity, image_url, timestamp, status) VALUES (?, ?, ?, ?, ?, ?)", deliveries())
+    await db.executemany("INSERT INTO cash_control (type, amount, reason, image_url, balance_before, balance_after, user_id, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", cash())
+    await db.executemany("INSERT INTO absences (user_id, reason, return_date, submitted_at, is_active) VALUES (?, ?, ?, ?, ?)", absences())
+    await db.executemany("INSERT INTO farm_tickets (user_id, channel_id) VALUES (?, ?)", ((u, 10_000 + u) for u in range(1, USERS + 1)))
+    await db.execute("DELETE FROM farm_ranking_totals")
+    await db.execute(database._RANKING_REBUILD_SQL)
+    await db.commit()
+
+# --- Verificação do pool ---
+async def _borrow(pool: database.ConnectionPool, hold: float = 0.0, order: list = None, label: str = None):
+    async with pool.reader():
+        if order is not None:
+            order.append(label)
+        await asyncio.sleep(hold)
+
+async def check_reader_handoff(path: str):
+    """Casos de regressão do empréstimo de conexões de leitura, com um pool de uma só conexão.
+
+    Falha com RuntimeError antes das medições, já que os números não valem com o pool quebrado.
+    """
+    pool = database.ConnectionPool(path, readers=1)
+    await pool.open()
+    try:
+        # 1) Quem espera é cancelado na mesma iteração em que a conexão é devolvida
+        holder = pool.reader()
+        await holder.__aenter__()
+        waiter = asyncio.create_task(_borrow(pool))
+        await asyncio.sleep(0) # O waiter entra na fila
+        waiter.cancel()
+        await holder.__aexit__(None, None, None) # Devolve antes de o waiter acordar
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            raise RuntimeError(f"cancelamento durante a devolução levantou {type(e).__name__}: {e}") from e
+
+        # 2) Cancelado depois de já ter recebido a conexão: ela precisa seguir para o próximo
+        first = asyncio.create_task(_borrow(pool, hold=0.01))
+        second = asyncio.create_task(_borrow(pool, hold=0.01))
+        third = asyncio.create_task(_borrow(pool))
+        await asyncio.sleep(0.005)
+        await asyncio.wait_for(first, 1) # Entrega a conexão a `second`...
+        second.cancel() # ...que é cancelado antes de rodar
+        await asyncio.wait_for(asyncio.gather(second, third, return_exceptions=True), 1)
+
+        # 3) Ordem de chegada: um chamador em laço não retoma a conexão na frente de quem espera
+        order = []
+        async def looper():
+            for i in range(3):
+                await _borrow(pool, 0.005, order, f"laço{i}")
+        async def latecomer():
+            await asyncio.sleep(0.002) # Chega enquanto o laço segura a conexão
+            await _borrow(pool, 0, order, "espera")
+        await asyncio.gather(looper(), latecomer())
+        if order[:2] != ["laço0", "espera"]:
+            raise RuntimeError(f"empréstimo fora da ordem de chegada: {order}")
+
+        if pool._reader_waiters or len(pool._idle_readers) != 1:
+            raise RuntimeError(f"fila inconsistente: {len(pool._reader_waiters)} esperando, {len(pool._idle_readers)} livres")
+    finally:
+        await pool.close()
+    print("Pool de leitura: ordem de chegada e cancelamentos ok.\n")
+
+# --- Medição ---
+async def measure(function, make_args, sizes: Sizes, concurrency: int, ops: int, budget: float, rng: random.Random, seq) -> dict:
+    """Executa `ops` chamadas com `concurrency` chamadores simultâneos (ou até esgotar `budget` segundos)."""
+    histogram = metrics.Histogram()
+    deadline = time.perf_counter() + budget
+    issued = 0
+
+    async def caller():
+        nonlocal issued
+        while issued < ops and time.perf_counter() < deadline:
+            issued += 1
+            args = make_args(rng, next(seq), sizes)
+            started = time.perf_counter()
+            await function(*args)
+            histogram.record(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(caller() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {
+        "ops": histogram.count,
+        "p50_ms": round(histogram.percentile(0.5) * 1000, 4),
+        "p95_ms": round(histogram.percentile(0.95) * 1000, 4),
+        "p99_ms": round(histogram.percentile(0.99) * 1000, 4),
+        "max_ms": round(histogram.max * 1000, 4),
+        "vazao_por_s": round(histogram.count / wall, 1) if wall else 0,
+    }
+
+async def run(args) -> dict:
+    sizes = Sizes(args.deliveries, args.cash, args.absences)
+    functions = public_functions()
+    missing = sorted(functions.keys() - CASES.keys())
+    if missing:
+        print(f"⚠️ Funções públicas sem caso de benchmark (adicione em CASES): {', '.join(missing)}")
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_FILE = os.path.join(tmp, "bench.db")
+        await check_reader_handoff(os.path.join(tmp, "pool.db"))
+        async with aiosqlite.connect(database.DATABASE_FILE) as db:
+            await db.execute("PRAGMA journal_mode=WAL;")
+            await database.apply_migrations(db)
+            print(f"Gerando {sizes.deliveries:,} entregas, {sizes.cash:,} lançamentos de caixa e {sizes.absences:,} ausências...")
+            start = time.perf_counter()
+            await seed(db, sizes)
+            print(f"Dados gerados em {time.perf_counter() - start:.1f}s.\n")
+
+        await database.open_pool()
+        await database.init_db() # Carrega o livro-caixa e as configurações, como na inicialização do bot
+        rng = random.Random(args.seed)
+        seq = iter(range(10**9))
+        try:
+            for name, (group, make_args) in CASES.items():
+                function = functions.get(name)
+                if function is None:
+                    print(f"   {name}: não existe mais no database.py; ignorada.")
+                    continue
+                await function(*make_args(rng, next(seq), sizes)) # Aquecimento (cache de páginas e statements)
+                results[name] = {"grupo": group, "niveis": {}}
+                for concurrency in args.concurrency:
+                    row = await measure(function, make_args, sizes, concurrency, args.ops, args.budget, rng, seq)
+                    results[name]["niveis"][str(concurrency)] = row
+                    print(f"{name:<32} c={concurrency:<3} n={row['ops']:<5} p50={row['p50_ms']:9.3f}ms "
+                          f"p95={row['p95_ms']:9.3f}ms p99={row['p99_ms']:9.3f}ms {row['vazao_por_s']:>9}/s")
+        finally:
+            await database.close_pool()
+    return {
+        "parametros": {key: value for key, value in vars(args).items() if key not in ("json", "compare")},
+        "ambiente": {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "plataforma": platform.platform()},
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "resultados": results,
+        "sem_caso": missing,
+    }
+
+# --- Comparação ---
+def compare(old_path: str, new_path: str, threshold: float, min_ms: float) -> int:
+    """Compara p50 e p95 de cada função e nível. Retorna 1 se um grupo crítico regrediu."""
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+    if old["parametros"] != new["parametros"]:
+        print(f"⚠️ Execuções com parâmetros diferentes:\n   antes : {old['parametros']}\n   depois: {new['parametros']}\n")
+
+    regressions = []
+    print(f"{'Função':<32} {'conc.':>5} {'p50 antes':>11} {'p50 depois':>11} {'p95 antes':>11} {'p95 depois':>11}")
+    for name, entry in new["resultados"].items():
+        before = old["resultados"].get(name)
+        if before is None:
+            print(f"{name:<32} (nova)")
+            continue
+        for level, row in entry["niveis"].items():
+            previous = before["niveis"].get(level)
+            if previous is None:
+                continue
+            flags = []
+            for metric in ("p50_ms", "p95_ms"):
+                delta = row[metric] - previous[metric]
+                # Diferenças abaixo de `min_ms` são ruído de medição, mesmo que relativamente grandes
+                if delta > min_ms and row[metric] > previous[metric] * (1 + threshold):
+                    flags.append(metric[:3])
+            critical = flags and entry["grupo"] in CRITICAL_GROUPS
+            marker = " !! REGRESSÃO" if critical else " regressão" if flags else ""
+            print(f"{name:<32} {level:>5} {previous['p50_ms']:>9.3f}ms {row['p50_ms']:>9.3f}ms "
+                  f"{previous['p95_ms']:>9.3f}ms {row['p95_ms']:>9.3f}ms{marker}{' (' + ', '.join(flags) + ')' if flags else ''}")
+            if flags:
+                regressions.append((name, level, entry["grupo"], critical))
+
+    critical = [r for r in regressions if r[3]]
+    print(f"\n{len(regressions)} regressões acima de {threshold:.0%}; {len(critical)} em ranking, saldo ou relatórios.")
+    for name, level, group, _ in critical:
+        print(f"   !! {name} ({group}) com concorrência {level}")
+    return 1 if critical else 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das funções públicas do database.py sobre dados sintéticos.")
+    parser.add_argument("--deliveries", type=int, default=300_000, help="Entregas de farm sintéticas.")
+    parser.add_argument("--cash", type=int, default=30_000, help="Lançamentos de caixa sintéticos.")
+    parser.add_argument("--absences", type=int, default=20_000, help="Ausências sintéticas.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="Chamadores simultâneos por medição.")
+    parser.add_argument("--ops", type=int, default=200, help="Chamadas por função e nível de concorrência.")
+    parser.add_argument("--budget", type=float, default=10.0, help="Limite em segundos por função e nível (consultas pesadas).")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Grava os resultados neste arquivo.")
+    parser.add_argument("--compare", nargs=2, metavar=("ANTES", "DEPOIS"), help="Compara dois arquivos de resultados em vez de medir.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Aumento relativo considerado regressão na comparação.")
+    parser.add_argument("--min-ms", type=float, default=0.05, help="Aumento absoluto mínimo para contar como regressão.")
+    args = parser.parse_args()
+
+    if args.compare:
+        old, new = (os.path.join(CALLER_DIR, path) for path in args.compare)
+        sys.exit(compare(old, new, args.threshold, args.min_ms))
+    report = asyncio.run(run(args))
+    if args.json:
+        with open(os.path.join(CALLER_DIR, args.json), "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados gravados em {args.json}.")
+
+if __name__ == "__main__":
+    main()
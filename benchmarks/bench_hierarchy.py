@@ -0,0 +1,173 @@
+# benchmarks/bench_hierarchy.py
+# Conta as chamadas à API feitas por atualização da hierarquia com milhares de membros
+# sintéticos, comparando o renderizador incremental com o antigo "limpar e repostar".
+#
+# Uso: python benchmarks/bench_hierarchy.py [--members 10000]
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT) # config.py lê o config.json relativo à raiz
+
+import discord
+import config
+import database
+import member_index
+from cogs import hierarchy_system
+
+# --- Objetos falsos do Discord ---
+class FakeMember:
+    def __init__(self, member_id: int, name: str):
+        self.id = member_id
+        self.display_name = name
+        self.mention = f"<@{member_id}>"
+        self.roles = []
+
+class FakeRole:
+    def __init__(self, role_id: int):
+        self.id = role_id
+        self.color = discord.Color(0x5865F2)
+        self.members = []
+
+class FakeGuild:
+    def __init__(self, roles):
+        self.id = 1
+        self.roles = {role.id: role for role in roles}
+    @property
+    def members(self):
+        return [member for role in self.roles.values() for member in role.members]
+    def get_role(self, role_id):
+        return self.roles.get(role_id)
+
+class FakeMessage:
+    def __init__(self, channel, message_id):
+        self.channel = channel
+        self.id = message_id
+    async def edit(self, **kwargs):
+        self.channel.calls["edit"] += 1
+    async def delete(self):
+        self.channel.calls["delete"] += 1
+        self.channel.live.discard(self.id)
+
+class FakeChannel:
+    def __init__(self, guild):
+        self.id = 1
+        self.name = "hierarquia"
+        self.guild = guild
+        self.live = set()
+        self._next_id = 1000
+        self.calls = {"send": 0, "edit": 0, "delete": 0, "purge": 0}
+    async def send(self, **kwargs):
+        self.calls["send"] += 1
+        self._next_id += 1
+        self.live.add(self._next_id)
+        return FakeMessage(self, self._next_id)
+    def get_partial_message(self, message_id):
+        return FakeMessage(self, message_id)
+    async def purge(self, limit, check):
+        # Uma página de histórico e um bulk delete a cada 100 mensagens
+        removed = min(limit, len(self.live))
+        self.calls["purge"] += max(1, 2 * math.ceil(removed / 100))
+        self.live = set(sorted(self.live)[:-removed] if removed else self.live)
+    def total(self):
+        return sum(self.calls.values())
+    def reset(self):
+        self.calls = dict.fromkeys(self.calls, 0)
+
+# --- Mutações (mantêm os cargos e o índice em dia, como fariam os eventos de membro) ---
+def set_role(member, old_role, new_role):
+    if old_role:
+        old_role.members.remove(member)
+        member.roles.remove(old_role)
+    if new_role:
+        new_role.members.append(member)
+        member.roles.append(new_role)
+    member_index.index.update(member)
+
+# --- Custo do método antigo (purge + um envio por mensagem + 1s de espera por cargo) ---
+def legacy_calls(guild, previous_messages: int) -> tuple:
+    sends = 0
+    for rank in config.current().hierarquia:
+        role = guild.get_role(rank.role_id)
+        if not role:
+            continue
+        length, parts = 0, 1
+        for member in role.members:
+            line = len(f"{config.current().hierarchy_bullet_emoji} {member.mention}\n")
+            if length + line > hierarchy_system.EMBED_DESCRIPTION_LIMIT:
+                parts, length = parts + 1, 0
+            length += line
+        sends += parts + 1 # embeds do cargo + separador
+    purge = max(1, 2 * math.ceil(min(100, previous_messages) / 100))
+    return purge + sends, sends, len(config.current().hierarquia)
+
+def build_guild(total_members: int, rng: random.Random):
+    roles = [FakeRole(rank.role_id) for rank in config.current().hierarquia]
+    weights = [50, 25, 12, 6, 4, 2, 1][:len(roles)]
+    for i in range(total_members):
+        member = FakeMember(10**17 + i * 7919, f"Membro {rng.randint(0, 10**6):07d}")
+        role = rng.choices(roles, weights=weights)[0]
+        role.members.append(member)
+        member.roles.append(role)
+    guild = FakeGuild(roles)
+    member_index.index.build(guild)
+    return guild, roles
+
+def promote(roles, rng: random.Random):
+    source = rng.randrange(len(roles) - 1)
+    member = rng.choice(roles[source].members)
+    set_role(member, roles[source], roles[source + 1])
+
+async def main():
+    parser = argparse.ArgumentParser(description="Chamadas à API por atualização da hierarquia.")
+    parser.add_argument("--members", type=int, default=10_000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    guild, roles = build_guild(args.members, rng)
+    channel = FakeChannel(guild)
+    cog = hierarchy_system.HierarchySystem(bot=type("Bot", (), {"user": None})())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_FILE = os.path.join(tmp, "bench.db")
+        await database.init_db()
+
+        def newly_dismissed():
+            member = rng.choice(roles[0].members)
+            set_role(member, roles[0], None)
+
+        def newly_registered():
+            member = FakeMember(10**18 + rng.randint(0, 10**6), f"Novato {rng.randint(0, 10**6):07d}")
+            set_role(member, None, roles[0])
+
+        scenarios = [
+            ("Publicação inicial", lambda: None),
+            ("Sem alterações", lambda: None),
+            ("1 promoção", lambda: promote(roles, rng)),
+            ("1 registro novo", newly_registered),
+            ("1 desligamento", newly_dismissed),
+            ("10 promoções", lambda: [promote(roles, rng) for _ in range(10)]),
+        ]
+
+        print(f"{args.members:,} membros sintéticos em {len(roles)} cargos.\n")
+        print(f"{'Cenário':<22} {'Antigo':>8} {'Novo':>8}   Detalhe (novo)")
+        published = 0
+        for name, mutate in scenarios:
+            mutate()
+            old_total, _, sleeps = legacy_calls(guild, published)
+            channel.reset()
+            await cog.post_hierarchy(channel)
+            published = len(channel.live)
+            detail = ", ".join(f"{k}={v}" for k, v in channel.calls.items() if v)
+            print(f"{name:<22} {old_total:>8} {channel.total():>8}   {detail or 'nenhuma chamada'} (antigo: +{sleeps}s de espera)")
+
+        await database.close_pool()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,129 @@
+# benchmarks/bench_indexes.py
+# Compara planos de execução e tempos das consultas "quentes" do database.py
+# antes (esquema v1, sem índices) e depois das migrações, sobre dados sintéticos.
+#
+# Uso: python benchmarks/bench_indexes.py [--rows 500000] [--repeat 20]
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import aiosqlite
+import database
+
+USERS = 2000
+ITEMS = ["Ouro", "Madeira", "Ferro", "Cobre", "Carvão", "Pedra", "Couro", "Tecido"]
+
+# (nome, SQL, parâmetros, versão mínima do esquema para a consulta existir)
+QUERIES = [
+    ("get_farm_ranking (GROUP BY legado)",
+     "SELECT user_id, SUM(item_quantity) as total FROM farm_deliveries WHERE status = 'aprovado' GROUP BY user_id ORDER BY total DESC LIMIT ?",
+     (10,), 1),
+    ("get_farm_ranking",
+     "SELECT user_id, total FROM farm_ranking_totals WHERE total > 0 ORDER BY total DESC, user_id LIMIT ?",
+     (10,), 3),
+    ("get_user_deliveries",
+     "SELECT item_name, item_quantity, image_url, status, timestamp FROM farm_deliveries WHERE user_id = ? ORDER BY id DESC LIMIT ?",
+     (42, 10), 1),
+    ("get_expired_absences",
+     "SELECT id, user_id FROM absences WHERE return_date <= ? AND is_active = 1",
+     (datetime.now().strftime('%Y-%m-%d'),), 1),
+    ("get_user_ticket",
+     "SELECT channel_id FROM farm_tickets WHERE user_id = ?",
+     (42,), 1),
+    ("get_farm_report_stats",
+     "SELECT COUNT(id) as total_deliveries, COUNT(DISTINCT user_id) as unique_farmers FROM farm_deliveries WHERE status = 'aprovado'",
+     (), 1),
+]
+
+async def seed(db: aiosqlite.Connection, rows: int):
+    rng = random.Random(1234)
+    now = datetime.now()
+
+    def deliveries():
+        for _ in range(rows):
+            status = rng.choices(["aprovado", "negado", "pendente"], weights=[70, 20, 10])[0]
+            ts = (now - timedelta(minutes=rng.randint(0, 525600))).isoformat()
+            yield (rng.randint(1, USERS), rng.choice(ITEMS), rng.randint(1, 5000), "https://cdn.example/img.png", ts, status)
+
+    def absences():
+        # Histórico grande de ausências já encerradas e poucas ativas, como em produção
+        for i in range(rows // 10):
+            active = 1 if rng.random() < 0.02 else 0
+            ret = (now + timedelta(days=rng.randint(-365, 30))).strftime('%Y-%m-%d')
+            yield (rng.randint(1, USERS), "Viagem", ret, now.isoformat(), active)
+
+    await db.executemany("INSERT INTO farm_deliveries (user_id, item_name, item_quantity, image_url, timestamp, status) VALUES (?, ?, ?, ?, ?, ?)", deliveries())
+    await db.executemany("INSERT INTO absences (user_id, reason, return_date, submitted_at, is_active) VALUES (?, ?, ?, ?, ?)", absences())
+    await db.executemany("INSERT INTO farm_tickets (user_id, channel_id) VALUES (?, ?)", ((u, 10_000 + u) for u in range(1, USERS + 1)))
+    await db.commit()
+
+async def query_plan(db: aiosqlite.Connection, sql: str, params: tuple) -> str:
+    async with db.execute(f"EXPLAIN QUERY PLAN {sql}", params) as cursor:
+        return "; ".join(row[3] for row in await cursor.fetchall())
+
+async def measure(db: aiosqlite.Connection, repeat: int) -> dict:
+    version = await database.get_schema_version(db)
+    results = {}
+    for name, sql, params, min_version in QUERIES:
+        if version < min_version:
+            continue
+        await database._fetchall(sql, params) # aquecimento (cache de páginas e statements)
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            await database._fetchall(sql, params)
+            timings.append((time.perf_counter() - start) * 1000)
+        results[name] = (await query_plan(db, sql, params), statistics.median(timings))
+    return results
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark dos índices das tabelas quentes.")
+    parser.add_argument("--rows", type=int, default=500_000, help="Quantidade de entregas de farm sintéticas.")
+    parser.add_argument("--repeat", type=int, default=20, help="Execuções por consulta (usa-se a mediana).")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_FILE = os.path.join(tmp, "bench.db")
+        async with aiosqlite.connect(database.DATABASE_FILE) as db:
+            await db.execute("PRAGMA journal_mode=WAL;")
+            await database.apply_migrations(db, target=1)
+            print(f"Gerando {args.rows:,} entregas sintéticas...")
+            start = time.perf_counter()
+            await seed(db, args.rows)
+            print(f"Dados gerados em {time.perf_counter() - start:.1f}s.\n")
+
+            await database.open_pool()
+            before = await measure(db, args.repeat)
+
+            start = time.perf_counter()
+            applied = await database.apply_migrations(db)
+            print(f"Migrações {applied} aplicadas em {time.perf_counter() - start:.2f}s.\n")
+            after = await measure(db, args.repeat)
+            await database.close_pool()
+
+    for name, *_ in QUERIES:
+        print(f"== {name}")
+        plan_after, ms_after = after[name]
+        if name in before:
+            plan_before, ms_before = before[name]
+            speedup = ms_before / ms_after if ms_after else float("inf")
+            print(f"   antes : {ms_before:9.3f} ms | {plan_before}")
+        else:
+            speedup = None
+            print("   antes : (tabela inexistente no esquema v1)")
+        print(f"   depois: {ms_after:9.3f} ms | {plan_after}")
+        if speedup is not None:
+            print(f"   ganho : {speedup:.1f}x")
+        print()
+
+if __name__ == "__main__":
+    asyncio.run(main())
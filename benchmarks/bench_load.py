@@ -0,0 +1,245 @@
+# benchmarks/bench_load.py
+# Teste de carga de ponta a ponta, sem rede: o bot real (main.bot, com os cogs, listeners e
+# instrumentação de produção) recebe cliques, formulários e anexos sintéticos, e a API do
+# Discord é simulada pelo fake_discord com latência configurável.
+#
+# Uso: python benchmarks/bench_load.py [--scenario farm caixa promocao] [--users 1000]
+#                                       [--latency-ms 40] [--json resultado.json]
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT) # config.py lê o config.json relativo à raiz
+
+import discord
+import config
+import database
+import log_queue
+import main # O mesmo bot da produção, com os listeners e a instrumentação já registrados
+import metrics
+import uploads
+from fake_discord import FakeDiscord
+
+log = logging.getLogger("bench_load")
+
+ADMINISTRATOR = 8
+TEXT, CATEGORY = 0, 4
+FIRST_USER_ID = 10**17
+BOT_USER_ID = 10**17 - 1
+
+# --- Servidor sintético ---
+def build_guild(fake: FakeDiscord, users: int) -> dict:
+    """Cria o servidor com os canais e cargos do config.json, `users` membros comuns e `users` membros da staff."""
+    cfg = config.current()
+    guild_id = cfg.guild_id
+    admin_role_id = fake.snowflake()
+    roles = [(guild_id, "@everyone", 0, 0), (cfg.staff_role_id, "Staff", 0, 50)]
+    roles += [(rank.role_id, rank.display_name, 0, position + 1) for position, rank in enumerate(cfg.hierarquia)]
+    roles += [(role_id, "Cargo", 0, 1) for role_id in (cfg.unregistered_role_id, cfg.registered_role_id_2, cfg.absent_role_id) if role_id]
+    roles += [(admin_role_id, "Bot", ADMINISTRATOR, 100)] # O último cargo é dado ao bot
+
+    channel_ids = {value for name, value in vars(cfg).items() if name.endswith("_channel_id") and value}
+    channels = [(channel_id, f"canal-{channel_id}", TEXT, None) for channel_id in channel_ids]
+    channels.append((cfg.farm_ticket_category_id, "Farm", CATEGORY, None))
+
+    farmers = [FIRST_USER_ID + i for i in range(users)]
+    staff = [FIRST_USER_ID + users + i for i in range(users)]
+    tickets = {user_id: fake.snowflake() for user_id in farmers}
+    channels += [(channel_id, f"farm-{user_id}", TEXT, cfg.farm_ticket_category_id) for user_id, channel_id in tickets.items()]
+    first_rank = cfg.hierarquia[0].role_id
+    members = [(user_id, f"farmer{user_id % 100000}", [first_rank]) for user_id in farmers]
+    members += [(user_id, f"staff{user_id % 100000}", [cfg.staff_role_id]) for user_id in staff]
+    fake.create_guild(guild_id, roles, channels, members, owner_id=staff[0])
+    return {"farmers": farmers, "staff": staff, "tickets": tickets}
+
+def panel_message(fake: FakeDiscord, channel_id: int) -> dict:
+    """Mensagem de painel já publicada; as views persistentes respondem pelo custom_id."""
+    return fake.message_payload(channel_id, fake._bot_author(), "Painel")
+
+async def until_waiting_upload(user_id: int, channel_id: int):
+    while not uploads.dispatcher.is_waiting(user_id, channel_id):
+        await asyncio.sleep(0.001)
+
+# --- Fluxos de um usuário ---
+async def farm_delivery(fake: FakeDiscord, user_id: int, ticket_id: int):
+    click = fake.click(user_id, panel_message(fake, ticket_id), "deliver_farm")
+    modal = (await click.response)["data"]
+    submit = fake.submit_modal(user_id, ticket_id, modal, ["Ouro", 1500])
+    await submit.response
+    await until_waiting_upload(user_id, ticket_id)
+    upload = fake.upload(user_id, ticket_id)
+    # O envio termina apagando a imagem do usuário, depois de publicar a entrega para a staff
+    await fake.wait_for("DELETE", f"/channels/{ticket_id}/messages/{upload['id']}")
+
+async def farm_approval(fake: FakeDiscord, staff_id: int, approval_message: dict):
+    custom_id = approval_message["components"][0]["components"][0]["custom_id"] # farm:aprovado:...
+    _, _, _, ticket_id, private_id = custom_id.split(":")
+    private_edit = fake.wait_for("PATCH", f"/channels/{ticket_id}/messages/{private_id}")
+    click = fake.click(staff_id, approval_message, custom_id)
+    await click.response
+    await private_edit
+
+async def cash_transaction(fake: FakeDiscord, staff_id: int, panel: dict):
+    channel_id = int(panel["channel_id"])
+    click = fake.click(staff_id, panel, "cash_deposit")
+    modal = (await click.response)["data"]
+    submit = fake.submit_modal(staff_id, channel_id, modal, ["150.50", "Teste de carga"])
+    await submit.response
+    await until_waiting_upload(staff_id, channel_id)
+    upload = fake.upload(staff_id, channel_id)
+    await fake.wait_for("DELETE", f"/channels/{channel_id}/messages/{upload['id']}")
+
+async def promotion(fake: FakeDiscord, staff_id: int, panel: dict, member_id: int):
+    channel_id = int(panel["channel_id"])
+    click = fake.click(staff_id, panel, "hr_promote")
+    modal = (await click.response)["data"]
+    submit = fake.submit_modal(staff_id, channel_id, modal, [member_id, "Teste de carga"])
+    done = fake.wait_for("POST", f"/webhooks/{fake.bot.application_id}/{submit.token}") # Confirmação ao staff
+    await done
+
+# --- Execução ---
+async def settle(existing: set, timeout: float):
+    """Espera as tarefas criadas durante a fase (modais que continuam após o último passo medido,
+    atualizações agendadas de hierarquia e ranking...), para a próxima fase começar com o bot ocioso."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        pending = asyncio.all_tasks() - existing - {asyncio.current_task()}
+        if not pending:
+            return
+        await asyncio.wait(pending, timeout=deadline - loop.time())
+    log.warning("Tarefas ainda pendentes após %.0fs de espera.", timeout)
+
+async def run_phase(fake: FakeDiscord, name: str, flows: list, timeout: float) -> dict:
+    """Roda os fluxos ao mesmo tempo e mede a latência de cada um e as chamadas REST da fase."""
+    histogram = metrics.Histogram()
+    failures = Counter()
+    calls_before = fake.stats.snapshot()
+    fake.stats.peak_in_flight = 0
+    existing = asyncio.all_tasks()
+
+    async def timed(flow):
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(flow, timeout)
+        except asyncio.TimeoutError:
+            failures["tempo esgotado"] += 1
+            return
+        except Exception as e:
+            failures[type(e).__name__] += 1
+            return
+        histogram.record(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed(flow) for flow in flows))
+    wall = time.perf_counter() - started
+    await settle(existing, timeout)
+    calls = fake.stats.snapshot() - calls_before
+    return {
+        "fase": name,
+        "fluxos": len(flows),
+        "concluidos": histogram.count,
+        "falhas": dict(failures),
+        "duracao_s": round(wall, 3),
+        "vazao_por_s": round(histogram.count / wall, 1) if wall else 0,
+        "latencia_ms": {f"p{int(q * 100)}": round(histogram.percentile(q) * 1000, 1) for q in metrics.QUANTILES} | {"max": round(histogram.max * 1000, 1)},
+        "chamadas_rest": sum(calls.values()),
+        "chamadas_por_fluxo": round(sum(calls.values()) / max(1, histogram.count), 2),
+        "pico_rest_simultaneas": fake.stats.peak_in_flight,
+        "rotas": dict(calls.most_common()),
+    }
+
+async def run(args) -> list:
+    bot = main.bot
+    state = bot._connection
+    state.user = discord.ClientUser(state=state, data=FakeDiscord.user_payload(BOT_USER_ID, "Oasis"))
+    state.application_id = BOT_USER_ID
+    fake = FakeDiscord(bot, latency_ms=args.latency_ms, seed=args.seed)
+    fake.install()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE_FILE = os.path.join(tmp, "load.db")
+        await database.open_pool()
+        await database.init_db()
+        try:
+            async with bot:
+                await main.load_cogs()
+                people = build_guild(fake, args.users)
+                for user_id, channel_id in people["tickets"].items():
+                    await database.create_farm_ticket(user_id, channel_id)
+                bot._ready.set()
+                bot.dispatch("ready")
+                await asyncio.sleep(0.1) # Índice da hierarquia e demais on_ready
+
+                cfg = config.current()
+                farmers, staff = people["farmers"], people["staff"]
+                if "farm" in args.scenario:
+                    flows = [farm_delivery(fake, user_id, people["tickets"][user_id]) for user_id in farmers]
+                    results.append(await run_phase(fake, "farm: entregas", flows, args.timeout))
+                    approvals = [fake.messages[message_id] for message_id in fake.channel_messages[cfg.farm_approval_channel_id]
+                                 if fake.messages.get(message_id, {}).get("components")]
+                    flows = [farm_approval(fake, staff[i % len(staff)], message) for i, message in enumerate(approvals)]
+                    results.append(await run_phase(fake, "farm: aprovações", flows, args.timeout))
+                if "caixa" in args.scenario:
+                    panel = panel_message(fake, cfg.cash_control_panel_channel_id)
+                    flows = [cash_transaction(fake, staff_id, panel) for staff_id in staff]
+                    results.append(await run_phase(fake, "caixa: depósitos", flows, args.timeout))
+                if "promocao" in args.scenario:
+                    panel = panel_message(fake, cfg.hr_panel_channel_id)
+                    flows = [promotion(fake, staff_id, panel, member_id) for staff_id, member_id in zip(staff, farmers)]
+                    results.append(await run_phase(fake, "rh: promoções", flows, args.timeout))
+
+                await log_queue.flush()
+        finally:
+            fake.uninstall()
+            await database.close_pool()
+    if fake.stats.unmodeled:
+        print(f"Rotas sem modelo no fake (responderam vazio): {dict(fake.stats.unmodeled)}")
+    return results
+
+def print_results(results: list, args):
+    print(f"\n{args.users:,} usuários por cenário, latência simulada de {args.latency_ms:.0f}ms por chamada.\n")
+    print(f"{'Fase':<20} {'ok':>6} {'falhas':>7} {'tempo':>8} {'fluxos/s':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'REST/fluxo':>11} {'pico':>5}")
+    for result in results:
+        latency = result["latencia_ms"]
+        print(f"{result['fase']:<20} {result['concluidos']:>6} {sum(result['falhas'].values()):>7} {result['duracao_s']:>7.2f}s "
+              f"{result['vazao_por_s']:>9} {latency['p50']:>7}ms {latency['p95']:>7}ms {latency['p99']:>7}ms "
+              f"{result['chamadas_por_fluxo']:>11} {result['pico_rest_simultaneas']:>5}")
+    for result in results:
+        print(f"\n== {result['fase']}: chamadas REST por rota")
+        for route, count in result["rotas"].items():
+            print(f"   {count:>7}  {route}")
+        if result["falhas"]:
+            print(f"   falhas: {result['falhas']}")
+    print("\n== Operações mais lentas do bot (instrumentação de produção)")
+    for operation, count, p50, p95, p99, worst in metrics.registry.summary()[:10]:
+        print(f"   {operation:<45} n={count:<6} p50={p50 * 1000:7.1f}ms p99={p99 * 1000:7.1f}ms")
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Teste de carga offline dos fluxos de farm, caixa e RH.")
+    parser.add_argument("--scenario", nargs="+", choices=["farm", "caixa", "promocao"], default=["farm", "caixa", "promocao"])
+    parser.add_argument("--users", type=int, default=1000, help="Usuários simultâneos em cada cenário.")
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="Latência média de cada chamada à API simulada.")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Limite por fluxo, em segundos.")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Grava os resultados neste arquivo para comparar execuções.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    results = asyncio.run(run(args))
+    print_results(results, args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "resultados": results}, f, ensure_ascii=False, indent=2)
+
+if __name__ == "__main__":
+    main_cli()
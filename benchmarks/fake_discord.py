@@ -0,0 +1,400 @@
+# benchmarks/fake_discord.py
+# Substituto local da API REST e do gateway do Discord para rodar os cogs reais sem rede.
+#
+# As chamadas REST do bot (HTTPClient.request, o adaptador de webhooks usado pelas respostas
+# de interação e o download de anexos) são atendidas aqui com uma latência simulada e contadas
+# por rota. Os eventos do gateway (servidor, interações, mensagens, atualizações de membro) são
+# entregues pelos mesmos parse_* que o discord.py usa ao receber um evento real.
+import asyncio
+import itertools
+import json
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from urllib.parse import unquote
+import discord
+from discord.http import Route
+from discord.webhook.async_ import AsyncWebhookAdapter
+
+DISCORD_EPOCH_MS = 1420070400000
+CDN = "https://cdn.fake.discord"
+FAKE_IMAGE = b"\x89PNG\r\n\x1a\n" + b"\x00" * 4096
+
+class RestStats:
+    """Chamadas e latência simulada por rota (ex.: `POST /channels/{channel_id}/messages`)."""
+    def __init__(self):
+        self.calls = Counter()
+        self.latency = defaultdict(float)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.unmodeled = Counter()
+
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+    def snapshot(self) -> Counter:
+        return Counter(self.calls)
+
+class FakeInteraction:
+    """Interação enviada ao bot; `response` resolve com o corpo da primeira resposta dele."""
+    def __init__(self, interaction_id: int, response: asyncio.Future):
+        self.id = interaction_id
+        self.token = f"token-{interaction_id}"
+        self.response = response
+
+class FakeDiscord:
+    """Estado mínimo de um servidor do Discord mantido em memória.
+
+    `install()` redireciona as chamadas REST do bot para cá; os métodos `click`, `submit_modal`
+    e `upload` geram os eventos do gateway que um usuário real produziria.
+    """
+    def __init__(self, bot: discord.Client, latency_ms: float = 40.0, jitter: float = 0.5, seed: int = 42):
+        self.bot = bot
+        self.state = bot._connection
+        self.latency = latency_ms / 1000
+        self.jitter = jitter
+        self.rng = random.Random(seed)
+        self.stats = RestStats()
+        self._ids = itertools.count()
+        self.guild_id = None
+        self.members = {} # user_id -> payload de membro
+        self.channels = {} # channel_id -> payload de canal
+        self.messages = {} # message_id -> payload de mensagem
+        self.channel_messages = defaultdict(list) # channel_id -> [message_id]
+        self._callbacks = {} # interaction_id -> Future com o corpo da resposta
+        self._token_channels = {} # token da interação -> canal, para as respostas e follow-ups
+        self._waiters = defaultdict(list) # (método, caminho) -> [Future]
+        self._original_webhook_request = None
+        self._handlers = [
+            ("POST", "/interactions/{webhook_id}/{webhook_token}/callback", self._interaction_callback),
+            ("POST", "/webhooks/{webhook_id}/{webhook_token}", self._followup),
+            ("GET", "/webhooks/{webhook_id}/{webhook_token}/messages/{message_id}", self._get_webhook_message),
+            ("PATCH", "/webhooks/{webhook_id}/{webhook_token}/messages/{message_id}", self._edit_webhook_message),
+            ("DELETE", "/webhooks/{webhook_id}/{webhook_token}/messages/{message_id}", self._delete_nothing),
+            ("POST", "/channels/{channel_id}/messages", self._create_message),
+            ("GET", "/channels/{channel_id}/messages/{message_id}", self._get_message),
+            ("PATCH", "/channels/{channel_id}/messages/{message_id}", self._edit_message),
+            ("DELETE", "/channels/{channel_id}/messages/{message_id}", self._delete_message),
+            ("POST", "/channels/{channel_id}/messages/bulk-delete", self._delete_nothing),
+            ("GET", "/channels/{channel_id}/messages", self._history),
+            ("PUT", "/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me", self._delete_nothing),
+            ("GET", "/channels/{channel_id}", self._get_channel),
+            ("DELETE", "/channels/{channel_id}", self._delete_channel),
+            ("POST", "/guilds/{guild_id}/channels", self._create_channel),
+            ("GET", "/guilds/{guild_id}/members/{user_id}", self._get_member),
+            ("PATCH", "/guilds/{guild_id}/members/{user_id}", self._edit_member),
+            ("PUT", "/guilds/{guild_id}/members/{user_id}/roles/{role_id}", self._add_role),
+            ("DELETE", "/guilds/{guild_id}/members/{user_id}/roles/{role_id}", self._remove_role),
+        ]
+        self._routes = {(method, path): handler for method, path, handler in self._handlers}
+
+    # --- Identificadores e payloads ---
+    def snowflake(self) -> int:
+        now_ms = int(time.time() * 1000) - DISCORD_EPOCH_MS
+        return (now_ms << 22) | (next(self._ids) & 0x3FFFFF)
+
+    @staticmethod
+    def now_iso() -> str:
+        return datetime.now(timezone.utc).isoformat()
+
+    @staticmethod
+    def user_payload(user_id: int, name: str, bot: bool = False) -> dict:
+        return {"id": str(user_id), "username": name, "global_name": name, "discriminator": "0", "avatar": None, "bot": bot}
+
+    def member_payload(self, user_id: int) -> dict:
+        return dict(self.members[user_id])
+
+    def message_payload(self, channel_id: int, author: dict, content: str = "", embeds=(), components=(), attachments=(), message_id: int = None) -> dict:
+        message_id = message_id or self.snowflake()
+        payload = {
+            "id": str(message_id), "channel_id": str(channel_id), "guild_id": str(self.guild_id), "author": author,
+            "content": content or "", "timestamp": self.now_iso(), "edited_timestamp": None, "tts": False,
+            "mention_everyone": False, "mentions": [], "mention_roles": [], "attachments": list(attachments),
+            "embeds": list(embeds), "components": list(components), "pinned": False, "type": 0, "flags": 0,
+        }
+        self.messages[message_id] = payload
+        self.channel_messages[channel_id].append(message_id)
+        return payload
+
+    def _attachments(self, channel_id: int, files) -> list:
+        attachments = []
+        for file in files or ():
+            attachment_id = self.snowflake()
+            url = f"{CDN}/attachments/{channel_id}/{attachment_id}/{file.filename}"
+            attachments.append({"id": str(attachment_id), "filename": file.filename, "size": len(FAKE_IMAGE), "url": url, "proxy_url": url, "content_type": "image/png"})
+        return attachments
+
+    # --- Servidor ---
+    def create_guild(self, guild_id: int, roles: list, channels: list, members: list, owner_id: int):
+        """roles: [(id, nome, permissões, posição)]; channels: [(id, nome, tipo, categoria)]; members: [(id, nome, [cargos])]."""
+        self.guild_id = guild_id
+        bot_user = self.user_payload(self.bot.user.id, self.bot.user.name, bot=True)
+        role_payloads = [
+            {"id": str(role_id), "name": name, "permissions": str(permissions), "position": position, "color": 0,
+             "hoist": False, "managed": False, "mentionable": True, "flags": 0}
+            for role_id, name, permissions, position in roles
+        ]
+        for channel_id, name, channel_type, parent_id in channels:
+            self.channels[channel_id] = {
+                "id": str(channel_id), "type": channel_type, "guild_id": str(guild_id), "name": name, "position": 0,
+                "parent_id": str(parent_id) if parent_id else None, "permission_overwrites": [], "nsfw": False, "topic": None,
+                "last_message_id": None, "rate_limit_per_user": 0,
+            }
+        for user_id, name, role_ids in members:
+            self.add_member(user_id, name, role_ids, dispatch=False)
+        self.state.parse_guild_create({
+            "id": str(guild_id), "name": "Servidor Sintético", "owner_id": str(owner_id), "icon": None, "roles": role_payloads,
+            "channels": list(self.channels.values()), "members": list(self.members.values()) + [{
+                "user": bot_user, "roles": [str(roles[-1][0])], "joined_at": self.now_iso(), "deaf": False, "mute": False, "nick": None, "flags": 0,
+            }],
+            "member_count": len(self.members) + 1, "unavailable": False, "emojis": [], "stickers": [], "features": [],
+            "large": len(self.members) > 250, "premium_tier": 0, "threads": [], "stage_instances": [], "guild_scheduled_events": [],
+            "voice_states": [], "presences": [], "joined_at": self.now_iso(),
+        })
+
+    def add_member(self, user_id: int, name: str, role_ids, dispatch: bool = True):
+        self.members[user_id] = {
+            "user": self.user_payload(user_id, name), "roles": [str(role_id) for role_id in role_ids],
+            "joined_at": self.now_iso(), "deaf": False, "mute": False, "nick": None, "flags": 0,
+        }
+        if dispatch:
+            self.state.parse_guild_member_add({"guild_id": str(self.guild_id), **self.member_payload(user_id)})
+
+    # --- Eventos do gateway gerados pelos "usuários" ---
+    def _interaction(self, interaction_type: int, user_id: int, channel_id: int, data: dict, message: dict = None) -> FakeInteraction:
+        interaction = FakeInteraction(self.snowflake(), asyncio.get_running_loop().create_future())
+        interaction_id = interaction.id
+        self._callbacks[interaction_id] = interaction.response
+        self._token_channels[interaction.token] = channel_id
+        payload = {
+            "id": str(interaction_id), "application_id": str(self.bot.application_id), "type": interaction_type, "data": data,
+            "guild_id": str(self.guild_id), "channel_id": str(channel_id), "channel": self.channels[channel_id],
+            "member": {**self.member_payload(user_id), "permissions": "0"}, "token": interaction.token, "version": 1,
+            "app_permissions": "8", "locale": "pt-BR", "guild_locale": "pt-BR", "entitlements": [],
+            "authorizing_integration_owners": {}, "context": 0, "attachment_size_limit": 10 * 1024 * 1024,
+        }
+        if message is not None:
+            payload["message"] = message
+        self.state.parse_interaction_create(payload)
+        return interaction
+
+    def click(self, user_id: int, message: dict, custom_id: str) -> FakeInteraction:
+        """Clique em um botão da mensagem."""
+        return self._interaction(3, user_id, int(message["channel_id"]), {"custom_id": custom_id, "component_type": 2}, message)
+
+    def submit_modal(self, user_id: int, channel_id: int, modal: dict, values: list) -> FakeInteraction:
+        """Envia o formulário recebido em `modal` (dados da resposta tipo 9) com os valores na ordem dos campos."""
+        inputs = list(_text_inputs(modal["components"]))
+        rows = [{"type": 1, "components": [{"type": 4, "custom_id": custom_id, "value": str(value)}]} for custom_id, value in zip(inputs, values)]
+        return self._interaction(5, user_id, channel_id, {"custom_id": modal["custom_id"], "components": rows})
+
+    def upload(self, user_id: int, channel_id: int, filename: str = "prova.png") -> dict:
+        """Mensagem do usuário com uma imagem anexada."""
+        attachment_id = self.snowflake()
+        url = f"{CDN}/attachments/{channel_id}/{attachment_id}/{filename}"
+        attachment = {"id": str(attachment_id), "filename": filename, "size": len(FAKE_IMAGE), "url": url, "proxy_url": url, "content_type": "image/png"}
+        payload = self.message_payload(channel_id, self.members[user_id]["user"], attachments=[attachment])
+        self.state.parse_message_create({**payload, "member": self.member_payload(user_id)})
+        return payload
+
+    def wait_for(self, method: str, path: str) -> asyncio.Future:
+        """Future resolvido na próxima chamada REST `método caminho` (caminho já com os IDs)."""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[(method, path)].append(future)
+        return future
+
+    # --- Instalação ---
+    def install(self):
+        http = self.bot.http
+        http.request = self._http_request
+        http.get_from_cdn = self._get_from_cdn
+        self._original_webhook_request = AsyncWebhookAdapter.request
+        fake = self
+        async def webhook_request(adapter, route, session=None, *, payload=None, multipart=None, files=None, **kwargs):
+            return await fake._rest(route, payload if payload is not None else _multipart_json(multipart), files)
+        AsyncWebhookAdapter.request = webhook_request
+
+    def uninstall(self):
+        if self._original_webhook_request:
+            AsyncWebhookAdapter.request = self._original_webhook_request
+            self._original_webhook_request = None
+
+    async def _http_request(self, route: Route, *, files=None, form=None, **kwargs):
+        payload = kwargs.get("json")
+        if payload is None and form:
+            payload = _multipart_json(form)
+        return await self._rest(route, payload, files)
+
+    async def _get_from_cdn(self, url: str) -> bytes:
+        await self._simulate(Route("GET", "/cdn"))
+        return FAKE_IMAGE
+
+    async def _simulate(self, route: Route):
+        key = f"{route.method} {route.path}"
+        stats = self.stats
+        stats.calls[key] += 1
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        delay = self.latency * (1 + self.rng.uniform(-self.jitter, self.jitter))
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            stats.in_flight -= 1
+            stats.latency[key] += delay
+
+    async def _rest(self, route: Route, payload, files):
+        await self._simulate(route)
+        path = route.url[len(Route.BASE):]
+        handler = self._routes.get((route.method, route.path))
+        if handler is None:
+            self.stats.unmodeled[f"{route.method} {route.path}"] += 1
+            result = None
+        else:
+            result = handler(payload or {}, files, **_route_parameters(route.path, path))
+        for future in self._waiters.pop((route.method, path), ()):
+            if not future.done():
+                future.set_result(result)
+        return result
+
+    # --- Rotas ---
+    def _bot_author(self) -> dict:
+        return self.user_payload(self.bot.user.id, self.bot.user.name, bot=True)
+
+    def _interaction_callback(self, payload, files, webhook_id, webhook_token):
+        callback_type = payload.get("type")
+        data = payload.get("data") or {}
+        resource = {"type": callback_type}
+        message_id = None
+        if callback_type in (4, 7): # Mensagem nova ou edição da mensagem do componente
+            message = self.message_payload(
+                self._token_channels.get(webhook_token, 0), self._bot_author(), data.get("content"), data.get("embeds", ()), data.get("components", ()),
+                self._attachments(0, files),
+            )
+            resource["message"] = message
+            message_id = message["id"]
+        future = self._callbacks.pop(webhook_id, None)
+        if future and not future.done():
+            future.set_result(payload)
+        return {
+            "interaction": {"id": str(webhook_id), "type": 3, "response_message_id": message_id,
+                            "response_message_loading": callback_type == 5, "response_message_ephemeral": bool(data.get("flags", 0) & 64)},
+            "resource": resource,
+        }
+
+    def _followup(self, payload, files, webhook_id, webhook_token):
+        channel_id = self._token_channels.get(webhook_token, 0)
+        return self.message_payload(channel_id, self._bot_author(), payload.get("content"), payload.get("embeds", ()), payload.get("components", ()), self._attachments(channel_id, files))
+
+    def _get_webhook_message(self, payload, files, webhook_id, webhook_token, message_id):
+        return self.message_payload(self._token_channels.get(webhook_token, 0), self._bot_author())
+
+    def _edit_webhook_message(self, payload, files, webhook_id, webhook_token, message_id):
+        channel_id = self._token_channels.get(webhook_token, 0)
+        return self.message_payload(channel_id, self._bot_author(), payload.get("content"), payload.get("embeds", ()), payload.get("components", ()))
+
+    def _create_message(self, payload, files, channel_id):
+        return self.message_payload(channel_id, self._bot_author(), payload.get("content"), payload.get("embeds", ()), payload.get("components", ()), self._attachments(channel_id, files))
+
+    def _get_message(self, payload, files, channel_id, message_id):
+        message = self.messages.get(message_id)
+        if message is None:
+            raise discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), {"code": 10008, "message": "Unknown Message"})
+        return message
+
+    def _edit_message(self, payload, files, channel_id, message_id):
+        message = self.messages.get(message_id) or self.message_payload(channel_id, self._bot_author(), message_id=message_id)
+        for key in ("content", "embeds", "components"):
+            if key in payload:
+                message[key] = payload[key] or ([] if key != "content" else "")
+        message["edited_timestamp"] = self.now_iso()
+        return message
+
+    def _delete_message(self, payload, files, channel_id, message_id):
+        self.messages.pop(message_id, None)
+        return None
+
+    def _delete_nothing(self, payload, files, **kwargs):
+        return None
+
+    def _history(self, payload, files, channel_id):
+        return []
+
+    def _get_channel(self, payload, files, channel_id):
+        channel = self.channels.get(channel_id)
+        if channel is None:
+            raise discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), {"code": 10003, "message": "Unknown Channel"})
+        return channel
+
+    def _delete_channel(self, payload, files, channel_id):
+        channel = self.channels.pop(channel_id, None)
+        if channel:
+            asyncio.get_running_loop().call_soon(self.state.parse_channel_delete, channel)
+        return channel
+
+    def _create_channel(self, payload, files, guild_id):
+        channel_id = self.snowflake()
+        channel = {
+            "id": str(channel_id), "type": payload.get("type", 0), "guild_id": str(guild_id), "name": payload.get("name", "canal"),
+            "position": 0, "parent_id": payload.get("parent_id"), "permission_overwrites": payload.get("permission_overwrites", []),
+            "nsfw": False, "topic": None, "last_message_id": None, "rate_limit_per_user": 0,
+        }
+        self.channels[channel_id] = channel
+        # O gateway confirma a criação logo depois da resposta REST
+        asyncio.get_running_loop().call_soon(self.state.parse_channel_create, channel)
+        return channel
+
+    def _get_member(self, payload, files, guild_id, user_id):
+        if user_id not in self.members:
+            raise discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), {"code": 10007, "message": "Unknown Member"})
+        return self.member_payload(user_id)
+
+    def _member_changed(self, user_id: int):
+        asyncio.get_running_loop().call_soon(self.state.parse_guild_member_update, {"guild_id": str(self.guild_id), **self.member_payload(user_id)})
+
+    def _edit_member(self, payload, files, guild_id, user_id):
+        member = self.members[user_id]
+        if "roles" in payload:
+            member["roles"] = [str(role_id) for role_id in payload["roles"]]
+        if "nick" in payload:
+            member["nick"] = payload["nick"]
+        self._member_changed(user_id)
+        return self.member_payload(user_id)
+
+    def _add_role(self, payload, files, guild_id, user_id, role_id):
+        roles = self.members[user_id]["roles"]
+        if str(role_id) not in roles:
+            roles.append(str(role_id))
+        self._member_changed(user_id)
+
+    def _remove_role(self, payload, files, guild_id, user_id, role_id):
+        roles = self.members[user_id]["roles"]
+        if str(role_id) in roles:
+            roles.remove(str(role_id))
+        self._member_changed(user_id)
+
+def _route_parameters(template: str, path: str) -> dict:
+    """Extrai {channel_id} etc. comparando o modelo da rota com o caminho já formatado."""
+    parameters = {}
+    for name, value in zip(template.split("/"), path.split("/")):
+        if name.startswith("{"):
+            value = unquote(value)
+            parameters[name[1:-1]] = int(value) if value.isdigit() else value
+    return parameters
+
+def _multipart_json(form) -> dict:
+    for part in form or ():
+        if part.get("name") == "payload_json":
+            return json.loads(part["value"])
+    return {}
+
+def _text_inputs(components):
+    """custom_id dos campos de texto de um modal, na ordem, qualquer que seja o aninhamento."""
+    for component in components:
+        if component.get("type") == 4:
+            yield component["custom_id"]
+        if "components" in component:
+            yield from _text_inputs(component["components"])
+        if "component" in component:
+            yield from _text_inputs([component["component"]])
@@ -1,19 +1,85 @@
 # cogs/absence_system.py
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import app_commands
-import json
-from datetime import datetime
+import heapq
+import asyncio
+import logging
+from datetime import datetime, timedelta
+import config
 import database
+import log_queue
+import member_mutations
+import resolver
+import rest_workers
+from rest_scheduler import Priority
 
-# --- Carregar Configurações ---
-with open('config.json', 'r', encoding='utf-8') as f:
-    config = json.load(f)
+log = logging.getLogger(__name__)
 
-GUILD_ID = config.get('GUILD_ID')
-ABSENT_ROLE_ID = config.get('ABSENT_ROLE_ID')
-ABSENCE_LOGS_CHANNEL_ID = config.get('ABSENCE_LOGS_CHANNEL_ID')
-ABSENCE_RETURN_CHANNEL_ID = config.get('ABSENCE_RETURN_CHANNEL_ID')
+MAX_SLEEP_SECONDS = 3600 # Acorda ao menos uma vez por hora para absorver ajustes no relógio do sistema
+RETRY_DELAY = timedelta(minutes=10) # Espera antes de tentar de novo um retorno que falhou
+MESSAGE_LIMIT = 2000
+
+def return_due_at(return_date: str) -> datetime:
+    """O membro volta no início do dia de retorno (mesma regra da antiga verificação diária)."""
+    return datetime.strptime(return_date, '%Y-%m-%d')
+
+# --- Agendador de Retornos ---
+class AbsenceScheduler:
+    """Min-heap de ausências ativas ordenado pelo horário de retorno.
+
+    Dorme até o próximo retorno e entrega a `on_due` todos os que vencerem juntos. `on_due`
+    devolve os itens que falharam, que voltam para a fila após RETRY_DELAY.
+    """
+    def __init__(self, on_due):
+        self._on_due = on_due
+        self._heap = [] # (due_at, absence_id, user_id)
+        self._scheduled = set()
+        self._wake = asyncio.Event()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def load(self, rows):
+        """Acrescenta as ausências ativas do banco, ignorando as que já estão na fila ou em andamento."""
+        for absence_id, user_id, return_date in rows:
+            self.add(absence_id, user_id, return_due_at(return_date))
+
+    def add(self, absence_id: int, user_id: int, due_at: datetime):
+        if absence_id in self._scheduled:
+            return
+        self._scheduled.add(absence_id)
+        heapq.heappush(self._heap, (due_at, absence_id, user_id))
+        self._wake.set()
+
+    async def run(self):
+        while True:
+            self._wake.clear()
+            if not self._heap:
+                await self._wake.wait()
+                continue
+            delay = (self._heap[0][0] - datetime.now()).total_seconds()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=min(delay, MAX_SLEEP_SECONDS))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            now = datetime.now()
+            due = []
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap))
+            try:
+                failed = await self._on_due([(absence_id, user_id) for _, absence_id, user_id in due])
+            except Exception:
+                log.exception("Erro inesperado ao processar retornos.")
+                failed = [(absence_id, user_id) for _, absence_id, user_id in due]
+            failed_ids = {absence_id for absence_id, _ in failed}
+            for _, absence_id, user_id in due:
+                self._scheduled.discard(absence_id)
+                if absence_id in failed_ids:
+                    self.add(absence_id, user_id, datetime.now() + RETRY_DELAY)
 
 # --- Formulário de Ausência ---
 class AbsenceModal(discord.ui.Modal, title="Solicitação de Ausência"):
@@ -40,13 +106,18 @@ class AbsenceModal(discord.ui.Modal, title="Solicitação de Ausência"):
         except ValueError:
             await interaction.followup.send("❌ Formato de data inválido. Por favor, use **DD/MM/AAAA**.", ephemeral=True)
             return
+        if return_date_obj.date() <= datetime.now().date():
+            # O retorno é processado no início do dia informado; hoje ou antes encerraria a ausência na hora
+            await interaction.followup.send("❌ A data de retorno deve ser a partir de amanhã.", ephemeral=True)
+            return
 
         guild = interaction.guild
-        absent_role = guild.get_role(ABSENT_ROLE_ID)
+        cfg = config.current()
+        absent_role = resolver.get_role(guild, cfg.absent_role_id)
         
         # --- VERIFICAÇÃO MELHORADA DO CANAL DE LOGS ---
         try:
-            logs_channel = await guild.fetch_channel(ABSENCE_LOGS_CHANNEL_ID)
+            logs_channel = await resolver.fetch_channel(guild, cfg.absence_logs_channel_id)
         except (discord.NotFound, ValueError):
             # Adiciona o cargo e o registro no DB, mas avisa o admin sobre o erro no log
             await interaction.followup.send(
@@ -67,13 +138,21 @@ class AbsenceModal(discord.ui.Modal, title="Solicitação de Ausência"):
             await interaction.followup.send("🚨 Erro de configuração: Cargo 'Ausente' não encontrado.", ephemeral=True)
             return
 
+        change = None
         try:
-            await interaction.user.add_roles(absent_role, reason=f"Ausência solicitada: {self.motivo.value}")
-            await database.add_absence(interaction.user.id, self.motivo.value, return_date_str_db)
+            change = await member_mutations.apply_member_changes(interaction.user, add=[absent_role], reason=f"Ausência solicitada: {self.motivo.value}")
+            absence_id = await database.add_absence(interaction.user.id, self.motivo.value, return_date_str_db)
         except Exception as e:
+            # O cargo não pode ficar sem o registro que o remove no retorno
+            if change:
+                try:
+                    await member_mutations.revert(change, reason="Falha ao registrar a ausência")
+                except discord.HTTPException:
+                    pass
             await interaction.followup.send(f"⚠️ Ocorreu um erro ao processar sua solicitação: {e}", ephemeral=True)
             # Se falhar aqui, não envia o log
             return
+        interaction.client.dispatch("absence_created", absence_id, interaction.user.id, return_date_str_db)
 
         if logs_channel:
             embed = discord.Embed(
@@ -84,7 +163,7 @@ class AbsenceModal(discord.ui.Modal, title="Solicitação de Ausência"):
             embed.set_author(name=interaction.user.display_name, icon_url=interaction.user.display_avatar.url)
             embed.add_field(name="Motivo", value=self.motivo.value, inline=False)
             embed.add_field(name="Data de Retorno", value=self.data_retorno.value, inline=False)
-            await logs_channel.send(embed=embed)
+            log_queue.enqueue(logs_channel, embed=embed)
         
         # A mensagem de sucesso só é enviada se não houve erro no log
         if logs_channel:
@@ -105,47 +184,93 @@ class AbsenceSystem(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.bot.add_view(AbsencePanelView())
-        self.check_absences.start()
+        self.scheduler = AbsenceScheduler(self.process_returns)
+        self._scheduler_task = None
+
+    async def cog_load(self):
+        self._scheduler_task = asyncio.create_task(self.run_scheduler())
 
     def cog_unload(self):
-        self.check_absences.cancel()
+        if self._scheduler_task:
+            self._scheduler_task.cancel()
 
-    @tasks.loop(hours=24)
-    async def check_absences(self):
-        print("Verificando ausências expiradas...")
-        expired_absences = await database.get_expired_absences()
-        
-        if not GUILD_ID:
-            print("ERRO: GUILD_ID não definido no config.json. A verificação de ausências foi pulada.")
-            return
+    async def run_scheduler(self):
+        await self.bot.wait_until_ready()
+        # O banco é a fonte da verdade: após um reinício, tudo o que continua ativo volta para a fila
+        self.scheduler.load(await database.get_active_absences())
+        log.info("%d retornos agendados.", len(self.scheduler))
+        await self.scheduler.run()
+
+    @commands.Cog.listener("on_absence_created")
+    async def on_absence_created(self, absence_id: int, user_id: int, return_date: str):
+        self.scheduler.add(absence_id, user_id, return_due_at(return_date))
+
+    async def process_returns(self, due: list) -> list:
+        """Remove o cargo de ausente de todos os retornos vencidos e anuncia em uma única mensagem.
+
+        Retorna os (absence_id, user_id) que não puderam ser processados agora.
+        """
+        cfg = config.current()
+        if not cfg.guild_id:
+            log.error("GUILD_ID não definido no config.json. Os retornos de ausência foram adiados.")
+            return due
             
-        guild = self.bot.get_guild(int(GUILD_ID))
+        guild = self.bot.get_guild(cfg.guild_id)
         if not guild:
-            print(f"ERRO: Servidor com ID {GUILD_ID} não encontrado.")
-            return
+            log.error("Servidor com ID %s não encontrado.", cfg.guild_id)
+            return due
 
-        return_channel = guild.get_channel(ABSENCE_RETURN_CHANNEL_ID)
-        absent_role = guild.get_role(ABSENT_ROLE_ID)
+        return_channel = resolver.get_channel(guild, cfg.absence_return_channel_id)
+        absent_role = resolver.get_role(guild, cfg.absent_role_id)
 
         if not return_channel or not absent_role:
-            print("ERRO: Canal de retorno ou cargo de ausente não configurado corretamente.")
-            return
+            log.error("Canal de retorno ou cargo de ausente não configurado corretamente.", extra={"guild": guild.id})
+            return due
 
-        for absence_id, user_id in expired_absences:
+        # Quem saiu do servidor só tem a ausência encerrada
+        present, departed = [], []
+        for absence_id, user_id in due:
             member = guild.get_member(user_id)
             if member:
-                try:
-                    await member.remove_roles(absent_role, reason="Fim do período de ausência")
-                    await return_channel.send(f"✅ O membro {member.mention} retornou de sua ausência e não está mais listado como ausente.")
-                    await database.deactivate_absence(absence_id)
-                except Exception as e:
-                    print(f"Falha ao processar retorno de {member.name}: {e}")
+                present.append((absence_id, member))
             else:
-                await database.deactivate_absence(absence_id)
-    
-    @check_absences.before_loop
-    async def before_check_absences(self):
-        await self.bot.wait_until_ready()
+                departed.append(absence_id)
+
+        async def remove_absent_role(item):
+            _, member = item
+            # O run_bulk cuida das novas tentativas
+            await member_mutations.apply_member_changes(member, remove=[absent_role], reason="Fim do período de ausência", retry=False)
+
+        failures = await rest_workers.run_bulk(present, remove_absent_role, priority=Priority.NORMAL)
+        for (_, member), error in failures:
+            log.warning("Falha ao processar retorno de %s: %s", member.name, error, extra={"guild": guild.id, "user": member.id})
+        failed_ids = {absence_id for (absence_id, _), _ in failures}
+        returned = [(absence_id, member) for absence_id, member in present if absence_id not in failed_ids]
+
+        await database.deactivate_absences([absence_id for absence_id, _ in returned] + departed)
+
+        try:
+            await self.announce_returns(return_channel, [member for _, member in returned])
+        except discord.HTTPException as e:
+            # Os retornos já foram aplicados; só o aviso se perde
+            log.error("Falha ao anunciar retornos: %s", e, extra={"guild": guild.id})
+
+        return [(absence_id, member.id) for absence_id, member in present if absence_id in failed_ids]
+
+    async def announce_returns(self, channel: discord.TextChannel, members: list):
+        if not members:
+            return
+        if len(members) == 1:
+            await channel.send(f"✅ O membro {members[0].mention} retornou de sua ausência e não está mais listado como ausente.")
+            return
+        content = f"✅ {len(members)} membros retornaram de suas ausências e não estão mais listados como ausentes:\n"
+        for member in members:
+            line = f"{member.mention}\n"
+            if len(content) + len(line) > MESSAGE_LIMIT:
+                await channel.send(content)
+                content = ""
+            content += line
+        await channel.send(content)
 
     @app_commands.command(name="painel_ausencia", description="Envia o painel de solicitação de ausência.")
     @app_commands.checks.has_permissions(administrator=True)
@@ -178,5 +303,4 @@ class AbsenceSystem(commands.Cog):
 
 
 async def setup(bot: commands.Bot):
-    await database.init_db()
     await bot.add_cog(AbsenceSystem(bot))
\ No newline at end of file
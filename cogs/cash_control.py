@@ -2,18 +2,14 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import json
 from datetime import datetime
 import asyncio
 import io
+import config
 import database
-
-# --- Carregar Configurações ---
-with open('config.json', 'r', encoding='utf-8') as f:
-    config = json.load(f)
-
-LOG_CHANNEL_ID = config.get('CASH_CONTROL_LOG_CHANNEL_ID')
-STAFF_ROLE_ID = config.get('STAFF_ROLE_ID')
+import log_queue
+import resolver
+import uploads
 
 # --- Formulário para Entrada/Saída ---
 class TransactionModal(discord.ui.Modal):
@@ -37,14 +33,17 @@ class TransactionModal(discord.ui.Modal):
         await interaction.response.send_message("✅ Informações recebidas. **Agora, por favor, envie a imagem/print de prova.**", ephemeral=True)
 
         try:
-            message = await self.bot.wait_for("message", timeout=180.0, check=lambda m: m.author == interaction.user and m.channel == interaction.channel and m.attachments)
+            message = await uploads.dispatcher.wait_for_upload(interaction.user.id, interaction.channel.id, timeout=180.0)
         except asyncio.TimeoutError:
             await interaction.followup.send("⏰ Tempo esgotado. Por favor, inicie a transação novamente.", ephemeral=True)
             return
+        except uploads.UploadSuperseded:
+            # O usuário iniciou outro envio neste canal; este fluxo é descartado
+            return
 
         # --- LÓGICA DE IMAGEM CORRIGIDA ---
         try:
-            log_channel = await interaction.guild.fetch_channel(LOG_CHANNEL_ID)
+            log_channel = await resolver.fetch_channel(interaction.guild, config.current().cash_control_log_channel_id)
         except (discord.NotFound, ValueError):
             await interaction.followup.send(f"🚨 **Erro de Configuração**: O canal de logs do caixa não foi encontrado.", ephemeral=True)
             return
@@ -57,13 +56,13 @@ class TransactionModal(discord.ui.Modal):
         # Prepara o arquivo para ser enviado
         image_file = discord.File(io.BytesIO(image_data), filename=f"prova_{interaction.id}_{attachment.filename}")
 
-        saldo_inicial = await database.get_current_balance()
+        # O saldo é calculado no momento do registro, e não antes do envio da imagem,
+        # para que lançamentos simultâneos não usem o mesmo saldo anterior
+        transaction_id, saldo_inicial, saldo_final = await database.record_cash_transaction(self.transaction_type, amount, self.motivo.value, interaction.user.id)
         if self.transaction_type == 'entrada':
-            saldo_final = saldo_inicial + amount
             titulo_resumo = "✅ Entrada Registrada no Caixa"
             cor = discord.Color.green()
         else:
-            saldo_final = saldo_inicial - amount
             titulo_resumo = "❌ Saída Registrada do Caixa"
             cor = discord.Color.red()
         
@@ -76,12 +75,9 @@ class TransactionModal(discord.ui.Modal):
         embed.add_field(name="Motivo", value=self.motivo.value, inline=False)
         embed.set_image(url=f"attachment://{image_file.filename}")
 
-        # Envia o embed E o arquivo da imagem na mesma mensagem para obter o link permanente
-        final_log_message = await log_channel.send(embed=embed, file=image_file)
-        permanent_image_url = final_log_message.attachments[0].url
-
-        # Salva a transação no DB com o link permanente
-        await database.add_cash_transaction(self.transaction_type, amount, self.motivo.value, permanent_image_url, saldo_inicial, saldo_final, interaction.user.id)
+        # Envia o embed E o arquivo da imagem na mesma mensagem para obter o link permanente.
+        # O envio é agrupado com outros registros do canal, então a resposta não espera por ele.
+        sent_log = log_queue.enqueue(log_channel, embed=embed, file=image_file)
         
         await interaction.followup.send("✅ Transação registrada com sucesso!", ephemeral=True)
         try:
@@ -89,6 +85,19 @@ class TransactionModal(discord.ui.Modal):
         except discord.Forbidden:
             pass
 
+        try:
+            final_log_message = await sent_log
+        except discord.HTTPException:
+            return # A falha já foi registrada pela fila; a transação fica sem link da prova
+        # A mensagem pode conter anexos de outros registros: o da transação é achado pelo prefixo único
+        prefix = f"prova_{interaction.id}_"
+        permanent_image_url = next((a.url for a in final_log_message.attachments if a.filename.startswith(prefix)), None)
+        if not permanent_image_url:
+            return
+
+        # Associa o link permanente à transação já registrada
+        await database.set_cash_transaction_image(transaction_id, permanent_image_url)
+
 # --- Painel de Caixa ---
 class CashControlPanelView(discord.ui.View):
     def __init__(self, bot: commands.Bot):
@@ -96,7 +105,7 @@ class CashControlPanelView(discord.ui.View):
         self.bot = bot
 
     async def check_permissions(self, interaction: discord.Interaction):
-        staff_role = interaction.guild.get_role(int(STAFF_ROLE_ID))
+        staff_role = resolver.get_role(interaction.guild, config.current().staff_role_id)
         if staff_role and staff_role in interaction.user.roles or interaction.user.guild_permissions.administrator:
             return True
         await interaction.response.send_message("❌ Apenas membros da Staff podem registrar transações.", ephemeral=True)
@@ -142,14 +151,26 @@ class CashControl(commands.Cog):
         
         view = CashControlPanelView(bot=self.bot)
 
-        history = interaction.channel.history(limit=100)
-        async for msg in history:
-            if msg.author == self.bot.user and msg.embeds and msg.embeds[0].title == "💰 Controle de Caixa":
-                await msg.edit(embed=embed, view=view)
+        # Usa a mensagem do painel salva nas configurações; o histórico só é varrido para painéis antigos
+        location = await database.get_setting("cash_panel_message")
+        if location and location["channel_id"] == interaction.channel.id:
+            try:
+                await interaction.channel.get_partial_message(location["message_id"]).edit(embed=embed, view=view)
                 await interaction.followup.send("✅ Painel de caixa atualizado com o novo layout e saldo!", ephemeral=True)
                 return
+            except discord.NotFound:
+                pass
+        else:
+            history = interaction.channel.history(limit=100)
+            async for msg in history:
+                if msg.author == self.bot.user and msg.embeds and msg.embeds[0].title == "💰 Controle de Caixa":
+                    await msg.edit(embed=embed, view=view)
+                    await database.set_setting("cash_panel_message", {"channel_id": msg.channel.id, "message_id": msg.id})
+                    await interaction.followup.send("✅ Painel de caixa atualizado com o novo layout e saldo!", ephemeral=True)
+                    return
         
-        await interaction.channel.send(embed=embed, view=view)
+        panel_message = await interaction.channel.send(embed=embed, view=view)
+        await database.set_setting("cash_panel_message", {"channel_id": panel_message.channel.id, "message_id": panel_message.id})
         await interaction.followup.send("✅ Painel de caixa com novo layout enviado!", ephemeral=True)
 
 
@@ -160,5 +181,4 @@ class CashControl(commands.Cog):
         await interaction.response.send_message(f"💰 O saldo atual do caixa é: **R$ {saldo_atual:.2f}**", ephemeral=True)
 
 async def setup(bot: commands.Bot):
-    await database.init_db()
     await bot.add_cog(CashControl(bot))
\ No newline at end of file
@@ -1,71 +1,161 @@
 # cogs/farm_system.py
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 from discord import app_commands
 import json
+import config
 import database
-from datetime import datetime
+from datetime import datetime, timedelta
 import asyncio
+import hashlib
+import logging
 import re
+import time
+import resolver
+import rest_scheduler
+import rest_workers
+import uploads
+from rest_scheduler import Priority
 
-# --- Carregar Configurações ---
-with open('config.json', 'r', encoding='utf-8') as f:
-    config = json.load(f)
+log = logging.getLogger(__name__)
 
-GUILD_ID = config.get('GUILD_ID')
-STAFF_ROLE_ID = config.get('STAFF_ROLE_ID')
-FARM_TICKET_CATEGORY_ID = config.get('FARM_TICKET_CATEGORY_ID')
-FARM_APPROVAL_CHANNEL_ID = config.get('FARM_APPROVAL_CHANNEL_ID')
+RANKING_SIZE = 10 # Posições exibidas no ranking
+RANKING_DEBOUNCE_SECONDS = 15 # Janela para agrupar várias aprovações em uma única edição
+
+# --- Aprovação de Entregas ---
+def has_staff_permission(interaction: discord.Interaction) -> bool:
+    if interaction.user.guild_permissions.administrator:
+        return True
+    staff_role = resolver.get_role(interaction.guild, config.current().staff_role_id)
+    return staff_role is not None and staff_role in interaction.user.roles
+
+async def process_farm_decision(interaction: discord.Interaction, new_status: str, delivery_id: int, ticket_channel_id: int, private_message_id: int, view: discord.ui.View):
+    """Aplica a decisão da staff sobre uma entrega e atualiza a mensagem de aprovação e a do ticket.
+
+    A mensagem de aprovação é editada como resposta da própria interação e a mensagem do
+    ticket é editada a partir dos IDs, sem buscar canal ou mensagem na API.
+    """
+    previous_status = await database.update_delivery_status(delivery_id, new_status)
+    if previous_status is None:
+        await interaction.response.send_message(f"❌ Erro Interno: entrega {delivery_id} não encontrada.", ephemeral=True)
+        return
+    if previous_status != new_status and 'aprovado' in (previous_status, new_status):
+        interaction.client.dispatch("farm_ranking_update")
+
+    original_embed = interaction.message.embeds[0]
+    image_url = original_embed.image.url if original_embed.image else None
+    mark_embed_decided(original_embed, new_status, interaction.user.display_name)
+    for item in view.children:
+        item.disabled = True
+    await interaction.response.edit_message(embed=original_embed, view=view)
+    log.info(
+        "Entrega marcada como %s.", new_status,
+        extra={
+            "guild": interaction.guild_id, "user": interaction.user.id, "delivery_id": delivery_id,
+            "latency_ms": round((discord.utils.utcnow() - interaction.created_at).total_seconds() * 1000),
+        },
+    )
+
+    if not ticket_channel_id or not private_message_id:
+        return
+    try:
+        private_message = interaction.client.get_partial_messageable(ticket_channel_id).get_partial_message(private_message_id)
+        async with rest_scheduler.slot(Priority.INTERACTION):
+            await private_message.edit(embed=build_private_decision_embed(new_status, image_url))
+    except (discord.NotFound, discord.Forbidden):
+        # O ticket pode ter sido fechado antes da análise; a decisão já foi registrada
+        pass
+
+def build_pending_embed(member: discord.abc.User, item_name: str, quantity: int, image_url: str, delivery_id: int, timestamp: datetime) -> discord.Embed:
+    embed = discord.Embed(title="⏳ Nova Entrega Pendente", color=discord.Color.orange(), timestamp=timestamp)
+    embed.set_author(name=member.display_name, icon_url=member.display_avatar.url)
+    embed.add_field(name="Item", value=item_name, inline=True)
+    embed.add_field(name="Quantidade", value=f"**{quantity:,}**".replace(",", "."), inline=True)
+    embed.set_image(url=image_url)
+    embed.set_footer(text=f"ID da Entrega: {delivery_id}")
+    return embed
+
+def mark_embed_decided(embed: discord.Embed, new_status: str, staff_name: str):
+    if new_status == 'aprovado':
+        embed.title = "✅ Entrega Aprovada!"
+        embed.color = discord.Color.green()
+        embed.set_footer(text=f"Aprovado por {staff_name}")
+    else:
+        embed.title = "❌ Entrega Negada!"
+        embed.color = discord.Color.red()
+        embed.set_footer(text=f"Negado por {staff_name}")
+
+def build_private_decision_embed(new_status: str, image_url: str) -> discord.Embed:
+    if new_status == 'aprovado':
+        embed = discord.Embed(title="✅ Sua Entrega foi APROVADA!", color=discord.Color.green())
+    else:
+        embed = discord.Embed(title="❌ Sua Entrega foi NEGADA.", color=discord.Color.red(), description="Contate um staff para mais detalhes.")
+    embed.set_image(url=image_url)
+    return embed
+
+class FarmDecisionButton(discord.ui.DynamicItem[discord.ui.Button], template=r"farm:(?P<status>aprovado|negado):(?P<delivery_id>\d+):(?P<channel_id>\d+):(?P<message_id>\d+)"):
+    """Botão de Aceitar/Negar que carrega no custom_id a entrega, o canal do ticket e a mensagem privada."""
+    def __init__(self, status: str, delivery_id: int, channel_id: int, message_id: int):
+        self.status = status
+        self.delivery_id = delivery_id
+        self.channel_id = channel_id
+        self.message_id = message_id
+        super().__init__(discord.ui.Button(
+            label="Aceitar" if status == 'aprovado' else "Negar",
+            style=discord.ButtonStyle.success if status == 'aprovado' else discord.ButtonStyle.danger,
+            custom_id=f"farm:{status}:{delivery_id}:{channel_id}:{message_id}"
+        ))
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(match["status"], int(match["delivery_id"]), int(match["channel_id"]), int(match["message_id"]))
+
+    async def callback(self, interaction: discord.Interaction):
+        if not has_staff_permission(interaction):
+            await interaction.response.send_message("❌ Você não tem permissão.", ephemeral=True)
+            return
+        try:
+            view = build_approval_view(self.delivery_id, self.channel_id, self.message_id)
+            await process_farm_decision(interaction, self.status, self.delivery_id, self.channel_id, self.message_id, view)
+        except Exception as e:
+            log.exception("Erro ao processar aprovação.", extra={"user": interaction.user.id, "delivery_id": self.delivery_id})
+            send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+            await send(f"⚠️ **Erro inesperado:**\n```\n{e}\n```", ephemeral=True)
+
+def build_approval_view(delivery_id: int, channel_id: int, message_id: int, disabled: bool = False) -> discord.ui.View:
+    view = discord.ui.View(timeout=None)
+    view.add_item(FarmDecisionButton('aprovado', delivery_id, channel_id, message_id))
+    view.add_item(FarmDecisionButton('negado', delivery_id, channel_id, message_id))
+    for item in view.children:
+        item.disabled = disabled
+    return view
 
-# --- Classes de Views e Modals (sem alterações) ---
 class FarmApprovalView(discord.ui.View):
+    """Botões antigos (custom_id fixo). Mantidos para as entregas enviadas antes dos botões dinâmicos."""
     def __init__(self):
         super().__init__(timeout=None)
     async def handle_approval(self, interaction: discord.Interaction, new_status: str):
-        if not STAFF_ROLE_ID or not str(STAFF_ROLE_ID).isdigit():
-            await interaction.response.send_message("❌ Erro de config: STAFF_ROLE_ID inválido.", ephemeral=True)
-            return
-        staff_role = interaction.guild.get_role(int(STAFF_ROLE_ID))
-        if not staff_role or (staff_role not in interaction.user.roles and not interaction.user.guild_permissions.administrator):
+        if not has_staff_permission(interaction):
             await interaction.response.send_message("❌ Você não tem permissão.", ephemeral=True)
             return
-        await interaction.response.defer()
         try:
-            original_embed = interaction.message.embeds[0]
-            footer_text = original_embed.footer.text
-            match = re.search(r"ID da Entrega: (\d+)", footer_text)
+            footer_text = interaction.message.embeds[0].footer.text
+            match = re.search(r"ID da Entrega: (\d+)", footer_text or "")
             if not match:
-                await interaction.followup.send("❌ Erro Interno: ID da entrega não encontrado.", ephemeral=True)
+                await interaction.response.send_message("❌ Erro Interno: ID da entrega não encontrado.", ephemeral=True)
                 return
             delivery_id = int(match.group(1))
-            await database.update_delivery_status(delivery_id, new_status)
+            ticket_channel_id = private_message_id = None
             delivery_info = await database.get_delivery_info(delivery_id)
             if delivery_info and delivery_info["private_message_id"] and delivery_info["user_id"]:
                 ticket_info = await database.get_user_ticket(delivery_info["user_id"])
                 if ticket_info:
-                    ticket_channel = await interaction.guild.fetch_channel(ticket_info[0])
-                    private_message = await ticket_channel.fetch_message(delivery_info["private_message_id"])
-                    old_embed = private_message.embeds[0]
-                    if new_status == 'aprovado':
-                        new_private_embed = discord.Embed(title="✅ Sua Entrega foi APROVADA!", color=discord.Color.green())
-                    else:
-                        new_private_embed = discord.Embed(title="❌ Sua Entrega foi NEGADA.", color=discord.Color.red(), description="Contate um staff para mais detalhes.")
-                    new_private_embed.set_image(url=old_embed.image.url if old_embed.image else None)
-                    await private_message.edit(embed=new_private_embed)
-            if new_status == 'aprovado':
-                original_embed.title = "✅ Entrega Aprovada!"
-                original_embed.color = discord.Color.green()
-                original_embed.set_footer(text=f"Aprovado por {interaction.user.display_name}")
-            else:
-                original_embed.title = "❌ Entrega Negada!"
-                original_embed.color = discord.Color.red()
-                original_embed.set_footer(text=f"Negado por {interaction.user.display_name}")
-            for item in self.children:
-                item.disabled = True
-            await interaction.message.edit(embed=original_embed, view=self)
+                    ticket_channel_id, private_message_id = ticket_info[0], delivery_info["private_message_id"]
+            await process_farm_decision(interaction, new_status, delivery_id, ticket_channel_id, private_message_id, self)
         except Exception as e:
-            print(f"ERRO AO PROCESSAR APROVAÇÃO: {e}")
-            await interaction.followup.send(f"⚠️ **Erro inesperado:**\n```\n{e}\n```", ephemeral=True)
+            log.exception("Erro ao processar aprovação (botão antigo).", extra={"user": interaction.user.id})
+            send = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
+            await send(f"⚠️ **Erro inesperado:**\n```\n{e}\n```", ephemeral=True)
     @discord.ui.button(label="Aceitar", style=discord.ButtonStyle.success, custom_id="accept_delivery")
     async def accept_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self.handle_approval(interaction, "aprovado")
@@ -73,6 +163,7 @@ class FarmApprovalView(discord.ui.View):
     async def deny_button(self, interaction: discord.Interaction, button: discord.ui.Button):
         await self.handle_approval(interaction, "negado")
 
+# --- Entrega de Farm ---
 class FarmDeliveryModal(discord.ui.Modal, title="Registrar Entrega de Farm - Etapa 1/2"):
     item_name = discord.ui.TextInput(label="Nome do Item", placeholder="Ex: Ouro, Madeira...", required=True)
     item_quantity = discord.ui.TextInput(label="Quantidade", placeholder="Ex: 1500", required=True)
@@ -85,10 +176,13 @@ class FarmDeliveryModal(discord.ui.Modal, title="Registrar Entrega de Farm - Eta
             return
         await interaction.response.send_message("✅ Dados recebidos. **Agora, envie a imagem da sua entrega.**", ephemeral=True)
         try:
-            message = await interaction.client.wait_for("message", timeout=120.0, check=lambda m: m.author == interaction.user and m.channel == interaction.channel and m.attachments)
+            message = await uploads.dispatcher.wait_for_upload(interaction.user.id, interaction.channel.id, timeout=120.0)
         except asyncio.TimeoutError:
             await interaction.followup.send("⏰ Tempo esgotado. Inicie o processo novamente.", ephemeral=True)
             return
+        except uploads.UploadSuperseded:
+            # O usuário iniciou outro envio neste canal; este fluxo é descartado
+            return
         image_url = message.attachments[0].url
         delivery_id = await database.add_farm_delivery(interaction.user.id, self.item_name.value, quantity, image_url)
         private_embed = discord.Embed(title="✅ Entrega Enviada para Análise!", color=discord.Color.yellow(), description="Sua entrega aguarda aprovação da staff.")
@@ -96,14 +190,11 @@ class FarmDeliveryModal(discord.ui.Modal, title="Registrar Entrega de Farm - Eta
         private_message = await interaction.channel.send(embed=private_embed)
         await database.set_private_message_id(delivery_id, private_message.id)
         try:
-            approval_channel = await interaction.guild.fetch_channel(FARM_APPROVAL_CHANNEL_ID)
-            public_embed = discord.Embed(title="⏳ Nova Entrega Pendente", color=discord.Color.orange(), timestamp=datetime.now())
-            public_embed.set_author(name=interaction.user.display_name, icon_url=interaction.user.display_avatar.url)
-            public_embed.add_field(name="Item", value=self.item_name.value, inline=True)
-            public_embed.add_field(name="Quantidade", value=f"**{quantity:,}**".replace(",", "."), inline=True)
-            public_embed.set_image(url=image_url)
-            public_embed.set_footer(text=f"ID da Entrega: {delivery_id}")
-            await approval_channel.send(embed=public_embed, view=FarmApprovalView())
+            approval_channel = await resolver.fetch_channel(interaction.guild, config.current().farm_approval_channel_id)
+            public_embed = build_pending_embed(interaction.user, self.item_name.value, quantity, image_url, delivery_id, datetime.now())
+            async with rest_scheduler.slot(Priority.INTERACTION):
+                approval_message = await approval_channel.send(embed=public_embed, view=build_approval_view(delivery_id, interaction.channel.id, private_message.id))
+            await database.set_approval_message_id(delivery_id, approval_message.id)
         except (discord.NotFound, ValueError):
             await interaction.followup.send("⚠️ Erro de Config: Canal de aprovação não encontrado.", ephemeral=True)
         except discord.Forbidden:
@@ -151,7 +242,7 @@ class FarmTicketOpenerView(discord.ui.View):
         existing_ticket = await database.get_user_ticket(interaction.user.id)
         if existing_ticket:
             channel_id = existing_ticket[0]
-            channel = interaction.guild.get_channel(channel_id)
+            channel = resolver.get_channel(interaction.guild, channel_id)
             if channel:
                 await interaction.followup.send(f"❌ Você já tem um ticket aberto em {channel.mention}!", ephemeral=True)
             else:
@@ -160,7 +251,7 @@ class FarmTicketOpenerView(discord.ui.View):
             return
         guild = interaction.guild
         try:
-            category = await guild.fetch_channel(FARM_TICKET_CATEGORY_ID)
+            category = await resolver.fetch_channel(guild, config.current().farm_ticket_category_id)
             if not isinstance(category, discord.CategoryChannel):
                 await interaction.followup.send("🚨 Erro de config: `FARM_TICKET_CATEGORY_ID` não é uma categoria.", ephemeral=True)
                 return
@@ -168,7 +259,7 @@ class FarmTicketOpenerView(discord.ui.View):
             await interaction.followup.send("🚨 Erro de config: Categoria de farm não encontrada.", ephemeral=True)
             return
         try:
-            staff_role = guild.get_role(int(STAFF_ROLE_ID))
+            staff_role = resolver.get_role(guild, config.current().staff_role_id)
             if not staff_role: raise ValueError("Cargo não encontrado")
         except (ValueError, TypeError):
             await interaction.followup.send("🚨 Erro de config: Cargo da staff não encontrado.", ephemeral=True)
@@ -193,66 +284,107 @@ class FarmTicketOpenerView(discord.ui.View):
 class FarmSystem(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
-        self.update_ranking_loop.start() # Inicia a tarefa em segundo plano
+        self.bot.add_dynamic_items(FarmDecisionButton)
+        # Registradas uma única vez por carga do cog, e não a cada reconexão no on_ready
+        self.bot.add_view(FarmTicketOpenerView())
+        self.bot.add_view(FarmTicketActionsView())
+        self.bot.add_view(FarmApprovalView())
+        # Estado da atualização do ranking (dirigida por eventos, sem loop periódico)
+        self._ranking_message = None # PartialMessage em cache, sem fetch
+        self._ranking_top = None # Último Top N publicado
+        self._ranking_hash = None # Hash do último embed publicado
+        self._ranking_dirty = False
+        self._ranking_task = None
+        self.ranking_edits = 0
+        self.ranking_skips = 0
 
     def cog_unload(self):
-        self.update_ranking_loop.cancel()
+        self.bot.remove_dynamic_items(FarmDecisionButton)
+        if self._ranking_task:
+            self._ranking_task.cancel()
 
     @commands.Cog.listener()
     async def on_ready(self):
-        self.bot.add_view(FarmTicketOpenerView())
-        self.bot.add_view(FarmTicketActionsView())
-        self.bot.add_view(FarmApprovalView())
-        await database.init_db()
-        print("Cog 'FarmSystem' carregado e Views registradas.")
+        # Sincroniza a mensagem do ranking com o banco após (re)conexões; se nada mudou, a edição é pulada
+        self.request_ranking_refresh()
 
-    # --- NOVA TAREFA DE ATUALIZAÇÃO AUTOMÁTICA ---
-    @tasks.loop(minutes=10)
-    async def update_ranking_loop(self):
-        print("RANKING LOOP: Verificando se há ranking para atualizar...")
-        try:
-            with open('ranking_config.json', 'r') as f:
-                data = json.load(f)
-            channel_id = data.get('ranking_channel_id')
-            message_id = data.get('ranking_message_id')
+    # --- ATUALIZAÇÃO DO RANKING POR EVENTOS ---
+    @commands.Cog.listener()
+    async def on_farm_ranking_update(self):
+        self.request_ranking_refresh()
 
-            if not channel_id or not message_id:
-                print("RANKING LOOP: Nenhuma mensagem de ranking configurada.")
-                return
+    def request_ranking_refresh(self):
+        """Agenda uma atualização do ranking. Pedidos dentro da janela de espera são agrupados em uma só."""
+        self._ranking_dirty = True
+        if self._ranking_task is None or self._ranking_task.done():
+            self._ranking_task = asyncio.create_task(self._ranking_refresh_worker())
 
-            channel = await self.bot.fetch_channel(channel_id)
-            message = await channel.fetch_message(message_id)
-            
-            # A mesma lógica de criação de embed do comando de ranking
-            ranking_data = await database.get_farm_ranking()
-            embed = self.build_ranking_embed(ranking_data)
-            
-            await message.edit(embed=embed)
-            print(f"RANKING LOOP: Ranking atualizado na mensagem {message_id}")
+    async def _ranking_refresh_worker(self):
+        await self.bot.wait_until_ready()
+        while self._ranking_dirty:
+            await asyncio.sleep(RANKING_DEBOUNCE_SECONDS)
+            self._ranking_dirty = False
+            try:
+                await self.refresh_ranking()
+            except Exception:
+                log.exception("Erro inesperado ao atualizar o ranking.")
+
+    async def _get_ranking_message(self):
+        if self._ranking_message is None:
+            location = await database.get_setting("ranking_message")
+            if location:
+                self._ranking_message = self.bot.get_partial_messageable(location["channel_id"]).get_partial_message(location["message_id"])
+        return self._ranking_message
 
-        except FileNotFoundError:
-            print("RANKING LOOP: Arquivo ranking_config.json não encontrado.")
+    async def _set_ranking_message(self, message):
+        self._ranking_message = message
+        self._ranking_top = None
+        self._ranking_hash = None
+        await database.set_setting("ranking_message", {"channel_id": message.channel.id, "message_id": message.id} if message else None)
+
+    async def refresh_ranking(self):
+        """Edita a mensagem do ranking apenas se o Top N ou o embed renderizado mudou."""
+        message = await self._get_ranking_message()
+        if message is None:
+            return
+        ranking_data = list(await database.get_farm_ranking(RANKING_SIZE))
+        if ranking_data == self._ranking_top:
+            self.ranking_skips += 1
+            return
+        embed = self.build_ranking_embed(ranking_data)
+        # O timestamp muda a cada renderização e não entra na comparação
+        embed_dict = embed.to_dict()
+        embed_dict.pop("timestamp", None)
+        embed_hash = hashlib.sha256(json.dumps(embed_dict, sort_keys=True).encode()).hexdigest()
+        if embed_hash == self._ranking_hash:
+            self._ranking_top = ranking_data
+            self.ranking_skips += 1
+            return
+        try:
+            async with rest_scheduler.slot(Priority.BACKGROUND, "ranking"):
+                await message.edit(embed=embed)
         except (discord.NotFound, discord.Forbidden):
-            print("RANKING LOOP: Mensagem ou canal do ranking não encontrado. Parando atualizações.")
+            log.warning("Mensagem ou canal do ranking não encontrado. Parando atualizações.")
             # Limpa a configuração para evitar erros repetidos
-            with open('ranking_config.json', 'w') as f:
-                json.dump({"ranking_channel_id": None, "ranking_message_id": None}, f)
-        except Exception as e:
-            print(f"RANKING LOOP: Erro inesperado: {e}")
-
-    @update_ranking_loop.before_loop
-    async def before_update_ranking(self):
-        await self.bot.wait_until_ready()
+            await self._set_ranking_message(None)
+            return
+        self._ranking_top = ranking_data
+        self._ranking_hash = embed_hash
+        self.ranking_edits += 1
+        log.info(
+            "Mensagem do ranking %d atualizada (%d edições, %d puladas).", message.id, self.ranking_edits, self.ranking_skips,
+            extra={"sample_key": "ranking_edit"},
+        )
 
     # Função auxiliar para construir o embed do ranking
     def build_ranking_embed(self, ranking_data):
-        embed = discord.Embed(title="🏆 Ranking Geral de Farm - Top 10 (Aprovados)", color=discord.Color.gold(), timestamp=datetime.now())
+        embed = discord.Embed(title=f"🏆 Ranking Geral de Farm - Top {RANKING_SIZE} (Aprovados)", color=discord.Color.gold(), timestamp=datetime.now())
         if not ranking_data:
             embed.description = "Nenhuma entrega aprovada foi registrada ainda para gerar um ranking."
         else:
             description_lines = []
             # Precisamos buscar os membros de forma síncrona dentro do que pudermos
-            guild = self.bot.get_guild(int(GUILD_ID))
+            guild = self.bot.get_guild(config.current().guild_id)
             for i, (user_id, total) in enumerate(ranking_data):
                 user = guild.get_member(user_id) # Tenta pegar do cache primeiro
                 user_mention = user.mention if user else f"Usuário (ID: {user_id})"
@@ -275,9 +407,7 @@ class FarmSystem(commands.Cog):
     async def ranking_iniciar(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         
-        with open('ranking_config.json', 'r') as f:
-            data = json.load(f)
-        if data.get("message_id"):
+        if await database.get_setting("ranking_message"):
             await interaction.followup.send("❌ Um ranking automático já está ativo em outro canal. Use `/ranking_parar` primeiro.", ephemeral=True)
             return
             
@@ -286,19 +416,109 @@ class FarmSystem(commands.Cog):
         
         message = await interaction.channel.send(embed=embed)
         
-        # Salva a informação no arquivo de configuração
-        with open('ranking_config.json', 'w') as f:
-            json.dump({"ranking_channel_id": message.channel.id, "ranking_message_id": message.id}, f)
+        # Salva a localização da mensagem nas configurações e a mantém em cache
+        await self._set_ranking_message(message)
             
-        await interaction.followup.send(f"✅ Ranking iniciado! Esta mensagem será atualizada a cada 10 minutos.", ephemeral=True)
+        await interaction.followup.send(f"✅ Ranking iniciado! Esta mensagem será atualizada sempre que uma aprovação mudar o Top {RANKING_SIZE}.", ephemeral=True)
 
     @app_commands.command(name="ranking_parar", description="Para a atualização automática do ranking.")
     @app_commands.checks.has_permissions(administrator=True)
     async def ranking_parar(self, interaction: discord.Interaction):
-        with open('ranking_config.json', 'w') as f:
-            json.dump({"ranking_channel_id": None, "ranking_message_id": None}, f)
+        await self._set_ranking_message(None)
         await interaction.response.send_message("✅ Atualização automática do ranking foi parada.", ephemeral=True)
 
+    @app_commands.command(name="aprovar_pendentes", description="Aprova de uma vez as entregas de farm pendentes.")
+    @app_commands.describe(
+        membro="Aprova apenas as entregas deste membro.",
+        item="Aprova apenas as entregas deste item.",
+        mais_antigas_que_horas="Aprova apenas as entregas enviadas há mais de X horas."
+    )
+    async def aprovar_pendentes(self, interaction: discord.Interaction, membro: discord.Member = None, item: str = None, mais_antigas_que_horas: app_commands.Range[int, 1] = None):
+        if not has_staff_permission(interaction):
+            await interaction.response.send_message("❌ Você não tem permissão.", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+        started = time.monotonic()
+
+        older_than = datetime.now() - timedelta(hours=mais_antigas_que_horas) if mais_antigas_que_horas else None
+        rows = await database.bulk_update_pending_deliveries('aprovado', user_id=membro.id if membro else None, item_name=item, older_than=older_than)
+        if not rows:
+            await interaction.followup.send("ℹ️ Nenhuma entrega pendente corresponde aos filtros.", ephemeral=True)
+            return
+
+        progress_message = await interaction.followup.send(f"⏳ {len(rows)} entregas aprovadas no banco. Atualizando mensagens...", ephemeral=True, wait=True)
+        guild = interaction.guild
+        staff_name = interaction.user.display_name
+        approval_channel = self.bot.get_partial_messageable(config.current().farm_approval_channel_id)
+
+        # Cada entrega gera até duas edições (aprovação e ticket), montadas a partir do banco, sem fetch
+        jobs = []
+        for row in rows:
+            if row["approval_message_id"]:
+                jobs.append(("approval", row))
+            if row["ticket_channel_id"] and row["private_message_id"]:
+                jobs.append(("ticket", row))
+
+        async def update_message(job):
+            kind, row = job
+            if kind == "approval":
+                member = guild.get_member(row["user_id"]) or await self.bot.fetch_user(row["user_id"])
+                embed = build_pending_embed(member, row["item_name"], row["item_quantity"], row["image_url"], row["id"], datetime.fromisoformat(row["timestamp"]))
+                mark_embed_decided(embed, 'aprovado', staff_name)
+                view = build_approval_view(row["id"], row["ticket_channel_id"] or 0, row["private_message_id"] or 0, disabled=True)
+                await approval_channel.get_partial_message(row["approval_message_id"]).edit(embed=embed, view=view)
+            else:
+                private_message = self.bot.get_partial_messageable(row["ticket_channel_id"]).get_partial_message(row["private_message_id"])
+                await private_message.edit(embed=build_private_decision_embed('aprovado', row["image_url"]))
+
+        async def report_progress(done, total):
+            try:
+                await progress_message.edit(content=f"⏳ {len(rows)} entregas aprovadas no banco. Mensagens atualizadas: {done}/{total}")
+            except discord.HTTPException:
+                pass # O progresso é só informativo; não interrompe a atualização das mensagens
+
+        self.bot.dispatch("farm_ranking_update")
+        # Pedido da staff, que acompanha pelo token da interação (expira em 15 min): não cede a vez como trabalho de fundo
+        failures = await rest_workers.run_bulk(jobs, update_message, on_progress=report_progress, priority=Priority.NORMAL)
+
+        embed = discord.Embed(title="✅ Aprovação em Lote Concluída", color=discord.Color.green(), timestamp=datetime.now())
+        embed.add_field(name="Entregas Aprovadas", value=str(len(rows)), inline=True)
+        embed.add_field(name="Itens Somados", value=f"{sum(row['item_quantity'] for row in rows):,}".replace(",", "."), inline=True)
+        embed.add_field(name="Mensagens Atualizadas", value=f"{len(jobs) - len(failures)}/{len(jobs)}", inline=True)
+        skipped = sum(1 for row in rows if not row["approval_message_id"])
+        if skipped:
+            embed.add_field(name="Sem Mensagem de Aprovação", value=f"{skipped} entregas antigas (atualize manualmente se necessário).", inline=False)
+        if failures:
+            details = "\n".join(f"Entrega {row['id']} ({kind}): {error}" for (kind, row), error in failures[:10])
+            embed.add_field(name="Falhas", value=details[:1024], inline=False)
+        embed.set_footer(text=f"Concluído em {time.monotonic() - started:.1f}s")
+        await progress_message.edit(content=None, embed=embed)
+
+    @app_commands.command(name="ranking_verificar", description="Recalcula o ranking a partir das entregas e mostra divergências.")
+    @app_commands.describe(corrigir="Reconstrói a tabela do ranking caso encontre divergências.")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def ranking_verificar(self, interaction: discord.Interaction, corrigir: bool = False):
+        await interaction.response.defer(ephemeral=True)
+        drift = await database.verify_farm_ranking(repair=corrigir)
+        if drift and corrigir:
+            self.bot.dispatch("farm_ranking_update")
+
+        if not drift:
+            await interaction.followup.send("✅ O ranking está consistente com as entregas aprovadas.", ephemeral=True)
+            return
+
+        embed = discord.Embed(
+            title="⚠️ Divergências no Ranking de Farm",
+            color=discord.Color.green() if corrigir else discord.Color.orange(),
+            timestamp=datetime.now()
+        )
+        lines = [f"<@{user_id}>: `{stored:,}` → `{expected:,}`".replace(",", ".") for user_id, stored, expected in drift[:20]]
+        if len(drift) > 20:
+            lines.append(f"... e mais {len(drift) - 20} outros.")
+        embed.description = "\n".join(lines)
+        embed.set_footer(text="Tabela do ranking reconstruída." if corrigir else "Use corrigir:True para reconstruir a tabela do ranking.")
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(FarmSystem(bot))
\ No newline at end of file
@@ -3,98 +3,319 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import json
-from datetime import datetime
+import hashlib
 import asyncio
+import logging
+import time
+import config
+import database
+import member_index
+import resolver
+import rest_scheduler
+from rest_scheduler import Priority
 
-# --- Carregar Configurações ---
-with open('config.json', 'r', encoding='utf-8') as f:
-    config = json.load(f)
+log = logging.getLogger(__name__)
 
-HIERARQUIA = config.get('HIERARQUIA', [])
-HIERARCHY_BULLET_EMOJI = config.get('HIERARCHY_BULLET_EMOJI', '•')
-HIERARCHY_CHANNEL_ID = config.get('HIERARCHY_CHANNEL_ID')
+MAX_DELAY_FACTOR = 4 # Limite (em períodos de silêncio) para que pedidos contínuos não adiem para sempre
+
+SEPARATOR = "━━━━━━━━━━━━━━━━━━"
+EMBED_DESCRIPTION_LIMIT = 4096
+# Blocos novos são preenchidos até CHUNK_FILL caracteres; a folga até o limite do embed absorve
+# entradas no cargo sem criar um bloco a mais (o que exigiria reescrever as mensagens seguintes)
+CHUNK_FILL = EMBED_DESCRIPTION_LIMIT - 256
+
+# --- Renderização ---
+def split_member_lines(members, bullet: str, boundaries=()) -> list:
+    """Divide a lista do cargo em blocos de até 4096 caracteres, como [(id do primeiro membro, texto)].
+
+    `boundaries` são os primeiros membros dos blocos já publicados, em ordem: os blocos seguintes
+    continuam começando neles e só crescem até o limite do embed, então a entrada ou saída de um
+    membro altera apenas o bloco dele. Sem publicação anterior, os blocos são preenchidos até CHUNK_FILL.
+    """
+    lines = [(member.id, f"{bullet} {member.mention}\n") for member in members]
+    # O primeiro bloco sempre começa no topo da lista, mesmo que alguém entre antes do antigo primeiro membro
+    anchors = set(boundaries[1:])
+    parts = []
+    current, first = "", None
+    limit = EMBED_DESCRIPTION_LIMIT if boundaries else CHUNK_FILL
+    for member_id, line in lines:
+        if current and (member_id in anchors or len(current) + len(line) > limit):
+            parts.append((first, current))
+            current = ""
+            limit = EMBED_DESCRIPTION_LIMIT if member_id in anchors else CHUNK_FILL
+        if not current:
+            first = member_id
+        current += line
+    if current:
+        parts.append((first, current))
+    return parts
+
+def render_hierarchy(guild: discord.Guild, boundaries: dict = None) -> list:
+    """Monta as seções da hierarquia, do maior para o menor cargo, como [(role_id, [mensagens])].
+
+    Cada mensagem é um dict com `content`, `embed` (dict do embed) e `first` (primeiro membro do
+    bloco, None no separador), pronta para ser comparada com o que já está publicado.
+    `boundaries` (role_id -> primeiros membros dos blocos publicados) mantém a divisão estável.
+    """
+    cfg = config.current()
+    bullet = cfg.hierarchy_bullet_emoji
+    boundaries = boundaries or {}
+    sections = []
+    for rank in reversed(cfg.hierarquia):
+        role_id = rank.role_id
+        display_name = rank.display_name
+
+        role = resolver.get_role(guild, role_id)
+        if not role:
+            log.warning("Cargo com ID %s não encontrado.", role_id, extra={"guild": guild.id})
+            continue
+
+        color = role.color.value if role.color.value != 0 else 0x2b2d31
+        if member_index.index.is_ready_for(guild):
+            members_with_role = member_index.index.members(role_id)
+        else: # Índice ainda não montado (antes do on_ready)
+            members_with_role = sorted(role.members, key=lambda m: m.display_name)
+        if not members_with_role:
+            parts = [(None, f"{bullet} *Vago*")]
+        else:
+            parts = split_member_lines(members_with_role, bullet, boundaries.get(role_id, ()))
+
+        # O primeiro embed leva o título do cargo; as continuações vão sem título
+        payloads = [
+            {"content": None, "embed": discord.Embed(title=display_name if index == 0 else None, description=text, color=color).to_dict(), "first": first}
+            for index, (first, text) in enumerate(parts)
+        ]
+        payloads.append({"content": SEPARATOR, "embed": None, "first": None})
+        sections.append((role_id, payloads))
+    return sections
+
+def payload_hash(payload: dict) -> str:
+    return hashlib.sha256(json.dumps({"content": payload["content"], "embed": payload["embed"]}, sort_keys=True).encode()).hexdigest()
+
+def payload_kwargs(payload: dict) -> dict:
+    embed = discord.Embed.from_dict(payload["embed"]) if payload["embed"] else None
+    return {"content": payload["content"], "embed": embed}
+
+# --- Agendamento ---
+class CoalescingScheduler:
+    """Agrupa os pedidos de atualização de cada servidor em uma única execução.
+
+    Um pedido inicia a espera por um período de silêncio; pedidos que chegam nesse meio-tempo
+    só a prolongam. Se chegar um pedido enquanto a execução está em andamento, ela roda de
+    novo uma única vez ao final, qualquer que seja a quantidade de pedidos.
+    """
+    def __init__(self, callback, quiet_period: float, max_delay: float):
+        self._callback = callback
+        self.quiet_period = quiet_period
+        self.max_delay = max_delay
+        self._tasks = {}
+        self._versions = {}
+        self._targets = {}
+        self.requested = 0
+        self.executed = 0
+
+    def request(self, key, target):
+        self.requested += 1
+        self._versions[key] = self._versions.get(key, 0) + 1
+        self._targets[key] = target
+        task = self._tasks.get(key)
+        if task is None or task.done():
+            self._tasks[key] = asyncio.create_task(self._run(key))
+
+    async def _wait_for_quiet(self, key):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+        while True:
+            version = self._versions[key]
+            await asyncio.sleep(max(0, min(self.quiet_period, deadline - loop.time())))
+            if self._versions[key] == version or loop.time() >= deadline:
+                return
+
+    async def _run(self, key):
+        while True:
+            await self._wait_for_quiet(key)
+            version = self._versions[key]
+            self.executed += 1
+            try:
+                await self._callback(self._targets[key])
+            except Exception:
+                log.exception("Erro inesperado na atualização agendada.")
+            # Algum pedido chegou durante a execução: o estado publicado já está velho
+            if self._versions[key] == version:
+                return
+
+    def cancel_all(self):
+        for task in self._tasks.values():
+            task.cancel()
+
+    def stats(self) -> dict:
+        return {"requested": self.requested, "executed": self.executed}
 
 # --- Cog Principal ---
 class HierarchySystem(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self._hierarchy_lock = asyncio.Lock() # Para evitar atualizações simultâneas
+        quiet_period = config.current().hierarchy_quiet_period
+        self.scheduler = CoalescingScheduler(self._scheduled_update, quiet_period, quiet_period * MAX_DELAY_FACTOR)
+
+    def cog_unload(self):
+        self.scheduler.cancel_all()
+
+    async def _scheduled_update(self, guild: discord.Guild):
+        started = time.perf_counter()
+        channel = resolver.get_channel(guild, config.current().hierarchy_channel_id)
+        if channel:
+            await self.post_hierarchy(channel)
+        stats = self.scheduler.stats()
+        log.info(
+            "Atualização agendada executada (%d execuções para %d pedidos).", stats['executed'], stats['requested'],
+            extra={"guild": guild.id, "latency_ms": round((time.perf_counter() - started) * 1000), "sample_key": "hierarchy_update"},
+        )
 
     async def post_hierarchy(self, channel: discord.TextChannel):
-        """Função que limpa o canal e posta a hierarquia em várias mensagens separadas."""
+        """Publica a hierarquia editando apenas as mensagens cujo conteúdo mudou.
+
+        As mensagens publicadas ficam na configuração 'hierarchy_messages', agrupadas por cargo.
+        Sem esse registro (primeira vez, outro canal ou mensagem apagada), o canal é limpo e tudo é reenviado.
+        """
         async with self._hierarchy_lock: # Garante que apenas uma atualização rode por vez
             if not channel:
-                print("HIERARQUIA: Canal de hierarquia não encontrado.")
+                log.warning("Canal de hierarquia não encontrado.")
                 return
 
             try:
-                # Limpa as mensagens anteriores do bot no canal
-                await channel.purge(limit=100, check=lambda m: m.author == self.bot.user)
-                
-                guild = channel.guild
-                await guild.chunk(cache=True)
-
-                # Itera na ordem inversa para mostrar do maior para o menor cargo
-                for rank_info in reversed(HIERARQUIA):
-                    role_id = int(rank_info.get("role_id"))
-                    display_name = rank_info.get("display_name", "Cargo Desconhecido")
-                    
-                    role = guild.get_role(role_id)
-                    
-                    if not role:
-                        print(f"HIERARQUIA: Cargo com ID {role_id} não encontrado.")
-                        continue
-
-                    # Cria um embed separado para cada cargo
-                    embed = discord.Embed(
-                        title=display_name,
-                        color=role.color if role.color.value != 0 else 0x2b2d31
-                    )
-                    
-                    members_with_role = sorted(role.members, key=lambda m: m.display_name)
-                    
-                    if not members_with_role:
-                        embed.description = f"{HIERARCHY_BULLET_EMOJI} *Vago*"
-                    else:
-                        # Lógica para dividir a lista de membros se ela for maior que o limite da descrição
-                        member_list_parts = []
-                        current_part = ""
-                        for member in members_with_role:
-                            mention = f"{HIERARCHY_BULLET_EMOJI} {member.mention}\n"
-                            if len(current_part) + len(mention) > 4096:
-                                member_list_parts.append(current_part)
-                                current_part = ""
-                            current_part += mention
-                        member_list_parts.append(current_part)
-                        
-                        # Envia a primeira parte na descrição do embed principal
-                        embed.description = member_list_parts[0]
-                        await channel.send(embed=embed)
-
-                        # Se houver mais partes, envia em embeds separados sem título
-                        if len(member_list_parts) > 1:
-                            for part in member_list_parts[1:]:
-                                continuation_embed = discord.Embed(description=part, color=embed.color)
-                                await channel.send(embed=continuation_embed)
-                    
-                    # Envia um separador visual
-                    await channel.send("━━━━━━━━━━━━━━━━━━")
-                    await asyncio.sleep(1) # Pequeno delay para não sobrecarregar a API
-
-                print("HIERARQUIA: Mensagens de hierarquia postadas com sucesso.")
+                state = await database.get_setting("hierarchy_messages")
+                published = None
+                if state and state["channel_id"] == channel.id and "sections" in state:
+                    published = state["sections"]
+
+                sections = None
+                if published is not None:
+                    boundaries = {
+                        role_id: tuple(first for _, _, first in messages if first is not None)
+                        for role_id, messages in published
+                    }
+                    try:
+                        sections = await self._apply_diff(channel, published, render_hierarchy(channel.guild, boundaries))
+                    except discord.NotFound:
+                        log.warning("Mensagem publicada não encontrada. Reenviando a hierarquia completa.", extra={"guild": channel.guild.id})
+                if sections is None:
+                    sections = await self._repost_all(channel, render_hierarchy(channel.guild))
+
+                await database.set_setting("hierarchy_messages", {"channel_id": channel.id, "sections": sections})
+                log.debug("Mensagens de hierarquia atualizadas com sucesso.", extra={"guild": channel.guild.id})
 
             except discord.Forbidden:
-                print(f"HIERARQUIA: ERRO - Permissão negada para limpar ou enviar mensagens no canal {channel.name}.")
-            except Exception as e:
-                print(f"HIERARQUIA: Erro inesperado ao postar: {e}")
+                log.error("Permissão negada para limpar ou enviar mensagens no canal %s.", channel.name, extra={"guild": channel.guild.id})
+            except Exception:
+                log.exception("Erro inesperado ao postar.", extra={"guild": channel.guild.id})
+
+    async def _apply_diff(self, channel: discord.TextChannel, published: list, sections: list) -> list:
+        """Compara a hierarquia cargo a cargo com o que está publicado.
+
+        Enquanto a ordem dos cargos se mantém e nenhum deles precisa de mais mensagens do que já
+        tem, cada cargo é atualizado dentro das próprias mensagens (editando as alteradas e
+        apagando as que sobraram), sem deslocar os seguintes. A partir do primeiro cargo que não
+        cabe, o restante é reaproveitado em ordem, com envios no fim e exclusão do que sobrar.
+        """
+        result = []
+        index = 0
+        keys = [role_id for role_id, _ in sections]
+        for position, (role_id, payloads) in enumerate(sections):
+            remaining = set(keys[position:])
+            # Cargos removidos da hierarquia (ou sem o cargo no servidor) saem inteiros
+            while index < len(published) and published[index][0] not in remaining:
+                for message_id, _, _ in published[index][1]:
+                    await self._delete_message(channel, message_id)
+                index += 1
+            if index >= len(published) or published[index][0] != role_id or len(payloads) > len(published[index][1]):
+                break
+            result.append([role_id, await self._update_section(channel, published[index][1], payloads)])
+            index += 1
+        else:
+            position = len(sections)
+
+        leftovers = [message for _, messages in published[index:] for message in messages]
+        for role_id, payloads in sections[position:]:
+            messages = []
+            for payload in payloads:
+                if leftovers:
+                    message_id, published_digest, _ = leftovers.pop(0)
+                    messages.append(await self._edit_message(channel, message_id, published_digest, payload))
+                else:
+                    async with rest_scheduler.slot(Priority.BACKGROUND, "hierarchy"):
+                        message = await channel.send(**payload_kwargs(payload))
+                    messages.append([message.id, payload_hash(payload), payload["first"]])
+            result.append([role_id, messages])
+        for message_id, _, _ in leftovers:
+            await self._delete_message(channel, message_id)
+        return result
+
+    async def _update_section(self, channel: discord.TextChannel, published: list, payloads: list) -> list:
+        """Atualiza um cargo que cabe nas mensagens que já tem.
+
+        Saem primeiro os blocos cujo membro inicial não abre mais nenhum bloco (os que foram
+        absorvidos pelo anterior) e, se ainda sobrar, os do fim; o separador é sempre mantido.
+        """
+        chunks, separator = published[:-1], published[-1]
+        surplus = len(chunks) - (len(payloads) - 1)
+        firsts = {payload["first"] for payload in payloads}
+        dropped = [message for message in chunks if message[2] not in firsts][:surplus]
+        dropped += [message for message in reversed(chunks) if message not in dropped][:surplus - len(dropped)]
+        kept = [message for message in chunks if message not in dropped] + [separator]
+        for message_id, _, _ in dropped:
+            await self._delete_message(channel, message_id)
+        return [
+            await self._edit_message(channel, message_id, published_digest, payload)
+            for (message_id, published_digest, _), payload in zip(kept, payloads)
+        ]
+
+    async def _edit_message(self, channel: discord.TextChannel, message_id: int, published_digest: str, payload: dict) -> list:
+        digest = payload_hash(payload)
+        if digest != published_digest:
+            async with rest_scheduler.slot(Priority.BACKGROUND, "hierarchy"):
+                await channel.get_partial_message(message_id).edit(**payload_kwargs(payload))
+        return [message_id, digest, payload["first"]]
+
+    async def _delete_message(self, channel: discord.TextChannel, message_id: int):
+        try:
+            async with rest_scheduler.slot(Priority.BACKGROUND, "hierarchy"):
+                await channel.get_partial_message(message_id).delete()
+        except discord.NotFound:
+            pass
+
+    async def _repost_all(self, channel: discord.TextChannel, sections: list) -> list:
+        # Limpa as mensagens anteriores do bot no canal
+        total = sum(len(payloads) for _, payloads in sections)
+        async with rest_scheduler.slot(Priority.BACKGROUND, "hierarchy"):
+            await channel.purge(limit=total + 100, check=lambda m: m.author == self.bot.user)
+        result = []
+        for role_id, payloads in sections:
+            messages = []
+            for payload in payloads:
+                async with rest_scheduler.slot(Priority.BACKGROUND, "hierarchy"):
+                    message = await channel.send(**payload_kwargs(payload))
+                messages.append([message.id, payload_hash(payload), payload["first"]])
+            result.append([role_id, messages])
+        return result
+
+    @commands.Cog.listener("on_config_update")
+    async def on_config_update(self, keys: set, old: config.Config, new: config.Config):
+        if "hierarchy_quiet_period" in keys:
+            self.scheduler.quiet_period = new.hierarchy_quiet_period
+            self.scheduler.max_delay = new.hierarchy_quiet_period * MAX_DELAY_FACTOR
+        # Mudanças na HIERARQUIA já chegam pelo índice de membros, que é reconstruído e pede a repintura
+        if keys & {"hierarchy_bullet_emoji", "hierarchy_channel_id"}:
+            guild = self.bot.get_guild(new.guild_id)
+            if guild:
+                self.scheduler.request(guild.id, guild)
 
     @commands.Cog.listener("on_hierarchy_update")
     async def on_hierarchy_update(self, guild: discord.Guild):
-        channel = guild.get_channel(HIERARCHY_CHANNEL_ID)
-        if channel:
-            await self.post_hierarchy(channel)
+        self.scheduler.request(guild.id, guild)
 
-    @app_commands.command(name="hierarquia", description="Limpa o canal e posta a lista hierárquica atualizada.")
+    @app_commands.command(name="hierarquia", description="Posta ou atualiza a lista hierárquica neste canal.")
     @app_commands.checks.has_permissions(administrator=True)
     async def hierarchy_command(self, interaction: discord.Interaction):
         # Usamos o canal da interação para postar
@@ -103,4 +324,4 @@ class HierarchySystem(commands.Cog):
         await self.post_hierarchy(channel)
 
 async def setup(bot: commands.Bot):
-    await bot.add_cog(HierarchySystem(bot))
\ No newline at end of file
+    await bot.add_cog(HierarchySystem(bot))
@@ -2,19 +2,72 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import json
+import io
+import time
+from dataclasses import dataclass
 from datetime import datetime
+import config
+import log_queue
+import member_index
+import member_mutations
+import resolver
+import rest_workers
+from rest_scheduler import Priority
+
+NICK_MAX_LENGTH = 32 # Limite de caracteres do Discord para apelidos
+
+# --- Reconciliação de Apelidos ---
+@dataclass
+class NicknameFix:
+    member: discord.Member
+    old_nick: str
+    new_nick: str
+
+def expected_nickname(member: discord.Member, prefix: str) -> str:
+    base_name = ""
+    if member.nick:
+        # Tenta extrair o nome base de apelidos com e sem prefixo
+        if ']' in member.nick:
+            parts = member.nick.split(']', 1)
+            base_name = parts[1].strip() if len(parts) > 1 else member.nick
+        else:
+            base_name = member.nick
+    if not base_name:
+        base_name = member.global_name or member.name
+    return f"{prefix} {base_name}"[:NICK_MAX_LENGTH]
+
+def plan_nickname_fixes(guild: discord.Guild, members) -> tuple:
+    """Calcula de uma vez todos os apelidos fora do padrão do cargo, sem chamar a API.
+
+    Retorna (membros verificados, correções possíveis, correções que o bot não tem hierarquia
+    para aplicar).
+    """
+    hierarquia = config.current().hierarquia
+    checked = 0
+    fixes, blocked = [], []
+    for member in members:
+        if member.bot:
+            continue
+        checked += 1
+        rank = member_index.index.rank_of(member)
+        if rank == -1:
+            continue
+        prefix = hierarquia[rank].prefix
+        current_nick = member.nick or member.global_name or member.name
+        if current_nick.startswith(prefix):
+            continue
+        fix = NicknameFix(member, current_nick, expected_nickname(member, prefix))
+        if member.id == guild.owner_id or member.top_role >= guild.me.top_role:
+            blocked.append(fix)
+        else:
+            fixes.append(fix)
+    return checked, fixes, blocked
 
-# --- Carregar Configurações ---
-with open('config.json', 'r', encoding='utf-8') as f:
-    config = json.load(f)
-
-STAFF_ROLE_ID = config.get('STAFF_ROLE_ID')
-HR_LOGS_CHANNEL_ID = config.get('HR_LOGS_CHANNEL_ID')
-DISMISSAL_ALERT_CHANNEL_ID = config.get('DISMISSAL_ALERT_CHANNEL_ID')
-PROMOTION_ALERT_CHANNEL_ID = config.get('PROMOTION_ALERT_CHANNEL_ID')
-DEMOTION_ALERT_CHANNEL_ID = config.get('DEMOTION_ALERT_CHANNEL_ID')
-HIERARQUIA = config.get('HIERARQUIA', [])
+def build_nickname_report(fixes: list, results: dict) -> discord.File:
+    lines = [f"Relatório de apelidos - {datetime.now().strftime('%d/%m/%Y %H:%M')}", ""]
+    for fix in fixes:
+        lines.append(f"{fix.member.name} ({fix.member.id})\t{fix.old_nick} -> {fix.new_nick}\t[{results[fix.member.id]}]")
+    return discord.File(io.BytesIO("\n".join(lines).encode("utf-8")), filename="relatorio_apelidos.txt")
 
 # --- Formulários (Modals) ---
 
@@ -26,17 +79,19 @@ class DismissalModal(discord.ui.Modal, title="Formulário de Desligamento"):
     async def on_submit(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         guild = interaction.guild
-        logs_channel = guild.get_channel(HR_LOGS_CHANNEL_ID)
-        alert_channel = guild.get_channel(DISMISSAL_ALERT_CHANNEL_ID)
+        cfg = config.current()
+        logs_channel = resolver.get_channel(guild, cfg.hr_logs_channel_id)
+        alert_channel = resolver.get_channel(guild, cfg.dismissal_alert_channel_id)
 
         try:
-            member_to_dismiss = await guild.fetch_member(int(self.membro_id.value))
+            member_id = int(self.membro_id.value)
+            member_to_dismiss = guild.get_member(member_id) or await guild.fetch_member(member_id)
         except (ValueError, discord.NotFound):
             await interaction.followup.send("❌ ID de membro inválido ou não encontrado.", ephemeral=True)
             return
 
         try:
-            await member_to_dismiss.edit(nick=None, roles=[], reason=f"Desligado por {interaction.user.name}")
+            await member_mutations.apply_member_changes(member_to_dismiss, remove=member_to_dismiss.roles, nick=None, reason=f"Desligado por {interaction.user.name}")
         except discord.Forbidden:
             await interaction.followup.send("❌ Falha ao modificar o membro. Verifique as permissões do bot.", ephemeral=True)
             return
@@ -48,7 +103,7 @@ class DismissalModal(discord.ui.Modal, title="Formulário de Desligamento"):
             log_embed.add_field(name="Motivo", value=self.motivo.value, inline=False)
             if self.provas.value:
                 log_embed.add_field(name="Provas", value=self.provas.value, inline=False)
-            await logs_channel.send(embed=log_embed)
+            log_queue.enqueue(logs_channel, embed=log_embed)
         
         if alert_channel:
             description_text = (
@@ -60,7 +115,7 @@ class DismissalModal(discord.ui.Modal, title="Formulário de Desligamento"):
             alert_embed = discord.Embed(title="❌ Demissão de Membro", description=description_text, color=discord.Color.dark_red(), timestamp=datetime.now())
             if interaction.guild.icon:
                 alert_embed.set_footer(icon_url=interaction.guild.icon.url)
-            await alert_channel.send(embed=alert_embed)
+            log_queue.enqueue(alert_channel, embed=alert_embed)
 
         interaction.client.dispatch("hierarchy_update", interaction.guild)
         await interaction.followup.send(f"✅ O membro {member_to_dismiss.display_name} foi desligado com sucesso.", ephemeral=True)
@@ -72,22 +127,20 @@ class PromotionModal(discord.ui.Modal, title="Formulário de Promoção"):
     async def on_submit(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         guild = interaction.guild
-        alert_channel = guild.get_channel(PROMOTION_ALERT_CHANNEL_ID)
+        cfg = config.current()
+        hierarquia = cfg.hierarquia
+        alert_channel = resolver.get_channel(guild, cfg.promotion_alert_channel_id)
 
         try:
-            member = await guild.fetch_member(int(self.membro_id.value))
+            member_id = int(self.membro_id.value)
+            member = guild.get_member(member_id) or await guild.fetch_member(member_id)
         except (ValueError, discord.NotFound):
             await interaction.followup.send("❌ ID de membro inválido ou não encontrado.", ephemeral=True)
             return
 
-        member_roles_ids = {role.id for role in member.roles}
-        current_rank_index = -1
-        for i in range(len(HIERARQUIA) - 1, -1, -1):
-            if int(HIERARQUIA[i]["role_id"]) in member_roles_ids:
-                current_rank_index = i
-                break
+        current_rank_index = member_index.index.rank_of(member)
         
-        if current_rank_index >= len(HIERARQUIA) - 1:
+        if current_rank_index >= len(hierarquia) - 1:
             await interaction.followup.send(f"🏆 {member.display_name} já está no cargo mais alto!", ephemeral=True)
             return
         
@@ -98,16 +151,14 @@ class PromotionModal(discord.ui.Modal, title="Formulário de Promoção"):
         if not base_name:
             base_name = member.global_name or member.name
 
-        new_prefix = HIERARQUIA[current_rank_index + 1]["prefix"]
+        new_prefix = hierarquia[current_rank_index + 1].prefix
         new_nick = f"{new_prefix} {base_name}"
         
-        current_role = guild.get_role(int(HIERARQUIA[current_rank_index]["role_id"])) if current_rank_index != -1 else None
-        next_role = guild.get_role(int(HIERARQUIA[current_rank_index + 1]["role_id"]))
+        current_role = resolver.get_role(guild, hierarquia[current_rank_index].role_id) if current_rank_index != -1 else None
+        next_role = resolver.get_role(guild, hierarquia[current_rank_index + 1].role_id)
         
         try:
-            await member.edit(nick=new_nick)
-            if current_role: await member.remove_roles(current_role, reason="Promoção")
-            await member.add_roles(next_role, reason="Promoção")
+            await member_mutations.apply_member_changes(member, add=[next_role], remove=[current_role], nick=new_nick, reason="Promoção")
         except discord.Forbidden:
              await interaction.followup.send("❌ Falha ao editar apelido/cargos.", ephemeral=True)
              return
@@ -122,7 +173,7 @@ class PromotionModal(discord.ui.Modal, title="Formulário de Promoção"):
             alert_embed = discord.Embed(title="📈 Promoção de Membro", description=description_text, color=discord.Color.green(), timestamp=datetime.now())
             if member.display_avatar:
                 alert_embed.set_thumbnail(url=member.display_avatar.url)
-            await alert_channel.send(embed=alert_embed)
+            log_queue.enqueue(alert_channel, embed=alert_embed)
 
         interaction.client.dispatch("hierarchy_update", interaction.guild)
         await interaction.followup.send(f"✅ {member.display_name} promovido para {next_role.name}!", ephemeral=True)
@@ -134,20 +185,18 @@ class DemotionModal(discord.ui.Modal, title="Formulário de Rebaixamento"):
     async def on_submit(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         guild = interaction.guild
-        alert_channel = guild.get_channel(DEMOTION_ALERT_CHANNEL_ID)
+        cfg = config.current()
+        hierarquia = cfg.hierarquia
+        alert_channel = resolver.get_channel(guild, cfg.demotion_alert_channel_id)
 
         try:
-            member = await guild.fetch_member(int(self.membro_id.value))
+            member_id = int(self.membro_id.value)
+            member = guild.get_member(member_id) or await guild.fetch_member(member_id)
         except (ValueError, discord.NotFound):
             await interaction.followup.send("❌ ID de membro inválido ou não encontrado.", ephemeral=True)
             return
 
-        member_roles_ids = {role.id for role in member.roles}
-        current_rank_index = -1
-        for i in range(len(HIERARQUIA) - 1, -1, -1):
-            if int(HIERARQUIA[i]["role_id"]) in member_roles_ids:
-                current_rank_index = i
-                break
+        current_rank_index = member_index.index.rank_of(member)
         
         if current_rank_index <= 0:
             await interaction.followup.send(f"📉 O membro {member.display_name} já está no cargo mais baixo ou não tem cargo!", ephemeral=True)
@@ -160,16 +209,14 @@ class DemotionModal(discord.ui.Modal, title="Formulário de Rebaixamento"):
         if not base_name:
             base_name = member.global_name or member.name
             
-        new_prefix = HIERARQUIA[current_rank_index - 1]["prefix"]
+        new_prefix = hierarquia[current_rank_index - 1].prefix
         new_nick = f"{new_prefix} {base_name}"
         
-        current_role = guild.get_role(int(HIERARQUIA[current_rank_index]["role_id"]))
-        previous_role = guild.get_role(int(HIERARQUIA[current_rank_index - 1]["role_id"]))
+        current_role = resolver.get_role(guild, hierarquia[current_rank_index].role_id)
+        previous_role = resolver.get_role(guild, hierarquia[current_rank_index - 1].role_id)
         
         try:
-            await member.edit(nick=new_nick)
-            await member.remove_roles(current_role, reason="Rebaixamento")
-            await member.add_roles(previous_role, reason="Rebaixamento")
+            await member_mutations.apply_member_changes(member, add=[previous_role], remove=[current_role], nick=new_nick, reason="Rebaixamento")
         except discord.Forbidden:
              await interaction.followup.send("❌ Falha ao editar apelido/cargos.", ephemeral=True)
              return
@@ -184,7 +231,7 @@ class DemotionModal(discord.ui.Modal, title="Formulário de Rebaixamento"):
             alert_embed = discord.Embed(title="📉 Rebaixamento de Membro", description=description_text, color=discord.Color.orange(), timestamp=datetime.now())
             if member.display_avatar:
                 alert_embed.set_thumbnail(url=member.display_avatar.url)
-            await alert_channel.send(embed=alert_embed)
+            log_queue.enqueue(alert_channel, embed=alert_embed)
 
         interaction.client.dispatch("hierarchy_update", interaction.guild)
         await interaction.followup.send(f"✅ {member.display_name} rebaixado para {previous_role.name}!", ephemeral=True)
@@ -194,7 +241,7 @@ class HRPanelView(discord.ui.View):
     def __init__(self):
         super().__init__(timeout=None)
     async def check_permissions(self, interaction: discord.Interaction):
-        staff_role = interaction.guild.get_role(int(STAFF_ROLE_ID))
+        staff_role = resolver.get_role(interaction.guild, config.current().staff_role_id)
         if staff_role in interaction.user.roles or interaction.user.guild_permissions.administrator:
             return True
         await interaction.response.send_message("❌ Apenas membros da Staff podem usar estas funções.", ephemeral=True)
@@ -237,74 +284,80 @@ class HRSystem(commands.Cog):
 
     # --- NOVO COMANDO PARA VERIFICAR APELIDOS ---
     @app_commands.command(name="verificar_apelidos", description="Verifica e corrige os apelidos de todos os membros com cargo na hierarquia.")
+    @app_commands.describe(simular="Apenas lista o que seria alterado, sem editar nenhum apelido.")
     @app_commands.checks.has_permissions(administrator=True)
-    async def verificar_apelidos(self, interaction: discord.Interaction):
+    async def verificar_apelidos(self, interaction: discord.Interaction, simular: bool = False):
         await interaction.response.defer(ephemeral=True, thinking=True)
-        
+        started = time.monotonic()
+
         guild = interaction.guild
-        updated_members = []
-        checked_count = 0
-        
-        async for member in guild.fetch_members(limit=None):
-            if member.bot:
-                continue
-            
-            checked_count += 1
-            member_roles_ids = {role.id for role in member.roles}
-            
-            correct_prefix = None
-            
-            for rank_info in reversed(HIERARQUIA):
-                if int(rank_info["role_id"]) in member_roles_ids:
-                    correct_prefix = rank_info["prefix"]
-                    break
-            
-            if correct_prefix:
-                current_nick = member.nick or member.global_name or member.name
-                
-                if current_nick.startswith(correct_prefix):
-                    continue
-
-                base_name = ""
-                if member.nick:
-                    # Tenta extrair o nome base de apelidos com e sem prefixo
-                    if ']' in member.nick:
-                        parts = member.nick.split(']', 1)
-                        base_name = parts[1].strip() if len(parts) > 1 else member.nick
-                    else:
-                        base_name = member.nick
-                
-                if not base_name:
-                    base_name = member.global_name or member.name
-
-                new_nick = f"{correct_prefix} {base_name}"
+        # O índice já contém só quem tem cargo na hierarquia; sem ele, usa o cache do servidor
+        index = member_index.index
+        members = index.ranked_members() if index.is_ready_for(guild) else guild.members
+        checked, fixes, blocked = plan_nickname_fixes(guild, members)
 
+        results = {fix.member.id: ("simulado" if simular else "pendente") for fix in fixes}
+        results.update({fix.member.id: "sem permissão" for fix in blocked})
+
+        if fixes and not simular:
+            progress_message = await interaction.followup.send(f"⏳ {len(fixes)} apelidos para corrigir. Corrigidos: 0/{len(fixes)}", ephemeral=True, wait=True)
+
+            async def apply_fix(fix: NicknameFix):
+                await fix.member.edit(nick=fix.new_nick, reason="Correção automática de apelido")
+                results[fix.member.id] = "corrigido"
+
+            async def report_progress(done, total):
                 try:
-                    await member.edit(nick=new_nick, reason="Correção automática de apelido")
-                    updated_members.append(f"✅ {member.mention} → `{new_nick}`")
-                except discord.Forbidden:
-                    updated_members.append(f"❌ Falha ao atualizar {member.mention} (permissão).")
-                except Exception as e:
-                    updated_members.append(f"⚠️ Erro ao atualizar {member.mention}: {e}")
+                    await progress_message.edit(content=f"⏳ {len(fixes)} apelidos para corrigir. Corrigidos: {done}/{total}")
+                except discord.HTTPException:
+                    pass # O progresso é só informativo; não interrompe as correções
+
+            failures = await rest_workers.run_bulk(fixes, apply_fix, on_progress=report_progress, priority=Priority.NORMAL)
+            for fix, error in failures:
+                results[fix.member.id] = f"falhou: {error}"
+
+        corrected = sum(1 for status in results.values() if status == "corrigido")
+        failed = sum(1 for status in results.values() if status.startswith("falhou"))
 
         embed = discord.Embed(
-            title="✅ Verificação de Apelidos Concluída",
-            color=discord.Color.green(),
+            title="🔎 Simulação de Apelidos Concluída" if simular else "✅ Verificação de Apelidos Concluída",
+            color=discord.Color.blurple() if simular else discord.Color.green(),
             timestamp=datetime.now()
         )
-        embed.add_field(name="Membros Verificados", value=str(checked_count), inline=True)
-        embed.add_field(name="Apelidos Corrigidos", value=str(len([m for m in updated_members if '✅' in m])), inline=True)
-        
-        if updated_members:
-            report_text = "\n".join(updated_members[:20])
-            if len(updated_members) > 20:
-                report_text += f"\n... e mais {len(updated_members) - 20} outros."
-            embed.add_field(name="Detalhes das Atualizações", value=report_text, inline=False)
+        embed.add_field(name="Membros Verificados", value=str(checked), inline=True)
+        if simular:
+            embed.add_field(name="Apelidos a Corrigir", value=str(len(fixes)), inline=True)
+        else:
+            embed.add_field(name="Apelidos Corrigidos", value=str(corrected), inline=True)
+            if failed:
+                embed.add_field(name="Falhas", value=str(failed), inline=True)
+        if blocked:
+            embed.add_field(name="Sem Permissão", value=f"{len(blocked)} membros acima do cargo do bot.", inline=True)
+
+        if fixes or blocked:
+            embed.description = "O relatório completo está no arquivo anexo."
         else:
             embed.description = "Nenhum apelido precisou ser corrigido. Tudo em ordem!"
-
-        await interaction.followup.send(embed=embed, ephemeral=True)
-
+        embed.set_footer(text=f"Concluído em {time.monotonic() - started:.1f}s")
+
+        def report_files():
+            # Um discord.File é consumido (e fechado) pelo envio, mesmo quando ele falha: cada tentativa usa um novo
+            return [build_nickname_report(fixes + blocked, results)] if fixes or blocked else []
+
+        if not interaction.is_expired():
+            try:
+                if fixes and not simular:
+                    await progress_message.edit(content=None, embed=embed, attachments=report_files())
+                else:
+                    await interaction.followup.send(embed=embed, files=report_files(), ephemeral=True)
+                return
+            except discord.HTTPException:
+                pass
+        # O token da interação expira em 15 minutos, o que pode acontecer em servidores muito grandes
+        try:
+            await interaction.user.send(embed=embed, files=report_files())
+        except discord.HTTPException:
+            await interaction.channel.send(content=interaction.user.mention, embed=embed, files=report_files())
 
 async def setup(bot: commands.Bot):
     await bot.add_cog(HRSystem(bot))
\ No newline at end of file
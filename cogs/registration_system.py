@@ -2,21 +2,14 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import json
+import logging
+import config
 import database
+import log_queue
+import member_mutations
+import resolver
 
-# --- Carregar Configurações ---
-with open('config.json', 'r', encoding='utf-8') as f:
-    config = json.load(f)
-
-GUILD_ID = config.get('GUILD_ID')
-UNREGISTERED_ROLE_ID = config.get('UNREGISTERED_ROLE_ID')
-REGISTERED_ROLE_ID_1 = config.get('REGISTERED_ROLE_ID_1')
-REGISTERED_ROLE_ID_2 = config.get('REGISTERED_ROLE_ID_2')
-REGISTRATION_LOGS_CHANNEL_ID = config.get('REGISTRATION_LOGS_CHANNEL_ID')
-REGISTRATION_APPROVAL_CHANNEL_ID = config.get('REGISTRATION_APPROVAL_CHANNEL_ID')
-HIERARQUIA = config.get('HIERARQUIA', [])
-PRIMEIRO_PREFIXO = HIERARQUIA[0]["prefix"] if HIERARQUIA else "[MEMBRO]"
+log = logging.getLogger(__name__)
 
 class ApprovalView(discord.ui.View):
     def __init__(self, bot: commands.Bot):
@@ -41,23 +34,28 @@ class ApprovalView(discord.ui.View):
             await interaction.followup.send("Membro não encontrado.", ephemeral=True)
             return
             
-        unregistered_role = guild.get_role(int(UNREGISTERED_ROLE_ID))
-        registered_role_1 = guild.get_role(int(REGISTERED_ROLE_ID_1))
-        registered_role_2 = guild.get_role(int(REGISTERED_ROLE_ID_2))
+        cfg = config.current()
+        unregistered_role = resolver.get_role(guild, cfg.unregistered_role_id)
+        registered_role_1 = resolver.get_role(guild, cfg.registered_role_id_1)
+        registered_role_2 = resolver.get_role(guild, cfg.registered_role_id_2)
 
         try:
-            novo_nick = f"{PRIMEIRO_PREFIXO} {nome_val} | {id_val}"
-            await member.edit(nick=novo_nick)
-            if unregistered_role: await member.remove_roles(unregistered_role, reason=f"Aprovado por {interaction.user.name}")
-            if registered_role_1: await member.add_roles(registered_role_1, reason=f"Aprovado por {interaction.user.name}")
-            if registered_role_2: await member.add_roles(registered_role_2, reason=f"Aprovado por {interaction.user.name}")
+            primeiro_prefixo = cfg.hierarquia[0].prefix if cfg.hierarquia else "[MEMBRO]"
+            novo_nick = f"{primeiro_prefixo} {nome_val} | {id_val}"
+            await member_mutations.apply_member_changes(
+                member,
+                add=[registered_role_1, registered_role_2],
+                remove=[unregistered_role],
+                nick=novo_nick,
+                reason=f"Aprovado por {interaction.user.name}"
+            )
         except discord.Forbidden:
             await interaction.followup.send(f"Falha ao editar {member.mention}.", ephemeral=True)
             return
 
-        logs_channel = guild.get_channel(REGISTRATION_LOGS_CHANNEL_ID)
+        logs_channel = resolver.get_channel(guild, cfg.registration_logs_channel_id)
         if logs_channel:
-            await logs_channel.send(embed=original_embed)
+            log_queue.enqueue(logs_channel, embed=original_embed)
 
         new_embed = original_embed
         new_embed.title = "✅ Registro Aprovado"
@@ -88,7 +86,7 @@ class RegistrationModal(discord.ui.Modal, title="Formulário de Registro"):
     async def on_submit(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         guild = interaction.guild
-        approval_channel = guild.get_channel(REGISTRATION_APPROVAL_CHANNEL_ID)
+        approval_channel = resolver.get_channel(guild, config.current().registration_approval_channel_id)
 
         if not approval_channel:
             await interaction.followup.send("🚨 Erro de config: Canal de aprovação não encontrado.", ephemeral=True)
@@ -110,7 +108,7 @@ class RegistrationPanelView(discord.ui.View):
 
     @discord.ui.button(label="Registrar", style=discord.ButtonStyle.success, custom_id="register_button")
     async def register_button_callback(self, interaction: discord.Interaction, button: discord.ui.Button):
-        unregistered_role = interaction.guild.get_role(int(UNREGISTERED_ROLE_ID))
+        unregistered_role = resolver.get_role(interaction.guild, config.current().unregistered_role_id)
         if unregistered_role and unregistered_role not in interaction.user.roles:
             await interaction.response.send_message("❌ Você já está registrado.", ephemeral=True)
             return
@@ -124,14 +122,14 @@ class RegistrationSystem(commands.Cog):
 
     @commands.Cog.listener()
     async def on_member_join(self, member: discord.Member):
-        if str(member.guild.id) != str(GUILD_ID):
+        if member.guild.id != config.current().guild_id:
             return
-        unregistered_role = member.guild.get_role(int(UNREGISTERED_ROLE_ID))
+        unregistered_role = resolver.get_role(member.guild, config.current().unregistered_role_id)
         if unregistered_role:
             try:
-                await member.add_roles(unregistered_role, reason="Novo membro")
+                await member_mutations.apply_member_changes(member, add=[unregistered_role], reason="Novo membro")
             except discord.Forbidden:
-                print(f"Falha ao atribuir cargo para {member.name}.")
+                log.warning("Falha ao atribuir cargo para %s.", member.name, extra={"guild": member.guild.id, "user": member.id})
     
     @app_commands.command(name="painel_registro", description="Envia o painel de registro de funcionários.")
     @app_commands.checks.has_permissions(administrator=True)
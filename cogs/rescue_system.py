@@ -2,15 +2,12 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import json
 from datetime import datetime
 import asyncio
-
-# --- Carregar Configurações ---
-with open('config.json', 'r', encoding='utf-8') as f:
-    config = json.load(f)
-
-RESCUE_ALERT_CHANNEL_ID = config.get('RESCUE_ALERT_CHANNEL_ID')
+import config
+import log_queue
+import resolver
+import uploads
 
 # --- Formulário de Pedido de Ajuda ---
 class RescueModal(discord.ui.Modal, title="Pedido de Ajuda"):
@@ -26,17 +23,16 @@ class RescueModal(discord.ui.Modal, title="Pedido de Ajuda"):
 
         try:
             # Espera por 2 minutos (120 segundos) pela imagem
-            message = await interaction.client.wait_for(
-                "message",
-                timeout=120.0,
-                check=lambda m: m.author == interaction.user and m.channel == interaction.channel and m.attachments
-            )
+            message = await uploads.dispatcher.wait_for_upload(interaction.user.id, interaction.channel.id, timeout=120.0)
         except asyncio.TimeoutError:
             await interaction.followup.send("⏰ Tempo esgotado. Por favor, inicie o pedido de ajuda novamente.", ephemeral=True)
             return
+        except uploads.UploadSuperseded:
+            # O usuário iniciou outro envio neste canal; este fluxo é descartado
+            return
 
         image_url = message.attachments[0].url
-        alert_channel = interaction.guild.get_channel(RESCUE_ALERT_CHANNEL_ID)
+        alert_channel = resolver.get_channel(interaction.guild, config.current().rescue_alert_channel_id)
 
         if not alert_channel:
             await interaction.followup.send("🚨 Erro de configuração: O canal de resgate não foi encontrado. Avise um administrador.", ephemeral=True)
@@ -56,10 +52,13 @@ class RescueModal(discord.ui.Modal, title="Pedido de Ajuda"):
 
         try:
             # Envia a mensagem no canal de alerta marcando @everyone
-            await alert_channel.send(
+            # Alerta urgente: não entra na janela de agrupamento dos logs
+            await log_queue.enqueue(
+                alert_channel,
                 content="@everyone",
                 embed=embed,
-                allowed_mentions=discord.AllowedMentions.all() # Permite que o @everyone funcione
+                allowed_mentions=discord.AllowedMentions.all(), # Permite que o @everyone funcione
+                urgent=True
             )
             await interaction.followup.send("✅ Seu pedido de ajuda foi enviado com sucesso!", ephemeral=True)
         except discord.Forbidden:
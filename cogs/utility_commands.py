@@ -2,16 +2,18 @@
 import discord
 from discord.ext import commands
 from discord import app_commands
-import json
 from datetime import datetime
+import config
 import database
+import log_queue
+import member_mutations
+import metrics
+import resolver
+import rest_scheduler
+import uploads
 
-# --- Carregar Configurações ---
-with open('config.json', 'r', encoding='utf-8') as f:
-    config = json.load(f)
-
-BUG_REPORT_CHANNEL_ID = config.get('BUG_REPORT_CHANNEL_ID')
 _VERSION = "1.0.0" # Versão do Bot
+METRICS_ROWS = 25 # Operações exibidas no /metricas (as que mais consumiram tempo)
 
 class BugReportModal(discord.ui.Modal, title="Relatório de Erro"):
     command_name = discord.ui.TextInput(label="Comando com Erro", placeholder="Ex: /farm_entregar", required=True)
@@ -19,10 +21,11 @@ class BugReportModal(discord.ui.Modal, title="Relatório de Erro"):
 
     async def on_submit(self, interaction: discord.Interaction):
         # --- LÓGICA DE CANAL ATUALIZADA ---
+        bug_report_channel_id = config.current().bug_report_channel_id
         try:
-            report_channel = await interaction.guild.fetch_channel(BUG_REPORT_CHANNEL_ID)
+            report_channel = await resolver.fetch_channel(interaction.guild, bug_report_channel_id)
         except (discord.NotFound, ValueError):
-            return await interaction.response.send_message(f"❌ **Erro de Configuração**: O canal para relatórios de bug (`{BUG_REPORT_CHANNEL_ID}`) não foi encontrado. Verifique o ID no `config.json`.", ephemeral=True)
+            return await interaction.response.send_message(f"❌ **Erro de Configuração**: O canal para relatórios de bug (`{bug_report_channel_id}`) não foi encontrado. Verifique o ID no `config.json`.", ephemeral=True)
         except discord.Forbidden:
             return await interaction.response.send_message("❌ **Erro de Permissão**: Não consigo 'ver' o canal de relatórios de bug. Verifique minhas permissões para ele.", ephemeral=True)
         except Exception as e:
@@ -33,7 +36,7 @@ class BugReportModal(discord.ui.Modal, title="Relatório de Erro"):
         embed.add_field(name="Comando", value=self.command_name.value, inline=False)
         embed.add_field(name="Descrição do Problema", value=self.description.value, inline=False)
         
-        await report_channel.send(embed=embed)
+        log_queue.enqueue(report_channel, embed=embed)
         await interaction.response.send_message("✅ Seu relatório de erro foi enviado com sucesso. Obrigado!", ephemeral=True)
 
 
@@ -46,7 +49,7 @@ class UtilityCommands(commands.Cog):
         embed = discord.Embed(title="📚 Central de Ajuda do Bot", description="Aqui estão os principais comandos e como usá-los.", color=discord.Color.blurple())
         embed.add_field(name="Sistemas Interativos (Painéis)", value="A maioria das funções do bot é iniciada por um **painel** enviado por um administrador. Procure pelos canais de registro, farm, ausência, etc., para interagir com os botões.", inline=False)
         embed.add_field(name="Comandos Utilitários", value="`/ajuda`, `/sobre`, `/status`, `/version`, `/erro`, `/enquete`", inline=False)
-        embed.add_field(name="Comandos de Moderação (Staff)", value="`/limpar`, `/banir`, `/desbanir`, `/notificar`, `/relatorio`", inline=False)
+        embed.add_field(name="Comandos de Moderação (Staff)", value="`/limpar`, `/banir`, `/desbanir`, `/notificar`, `/relatorio`, `/metricas`", inline=False)
         await interaction.response.send_message(embed=embed, ephemeral=True)
 
     @app_commands.command(name="sobre", description="Exibe informações sobre o bot.")
@@ -59,7 +62,36 @@ class UtilityCommands(commands.Cog):
     @app_commands.command(name="status", description="Mostra o status e a latência do bot.")
     async def status(self, interaction: discord.Interaction):
         latency = round(self.bot.latency * 1000)
-        await interaction.response.send_message(f"✅ Estou online! Latência: `{latency}ms`.", ephemeral=True)
+        pending_uploads = uploads.dispatcher.stats()["pending"]
+        mutations = member_mutations.stats.as_dict()
+        rest = rest_scheduler.scheduler.stats()
+        lookups = resolver.resolver.stats()
+        queued = ", ".join(f"{name.lower()} `{depth}`" for name, depth in rest["queued"].items())
+        await interaction.response.send_message(
+            f"✅ Estou online! Latência: `{latency}ms`. Envios aguardando imagem: `{pending_uploads}`.\n"
+            f"Edições de membro: `{mutations['requests']}` chamadas (o fluxo antigo faria `{mutations['legacy_requests']}`), "
+            f"`{mutations['retries']}` repetidas, `{mutations['rollbacks']}` desfeitas.\n"
+            f"Fila da API: `{rest['in_flight']}` em andamento, aguardando {queued}.\n"
+            f"Cache de canais e cargos: `{lookups['hits']}` acertos, `{lookups['misses']}` falhas, `{lookups['fetches']}` buscas na API.",
+            ephemeral=True
+        )
+
+    @app_commands.command(name="metricas", description="Mostra a latência (p50/p95/p99) de comandos, botões e consultas.")
+    @app_commands.checks.has_permissions(administrator=True)
+    async def metricas(self, interaction: discord.Interaction):
+        rows = metrics.registry.summary()
+        if not rows:
+            return await interaction.response.send_message("Nenhuma operação medida ainda.", ephemeral=True)
+
+        def ms(seconds: float) -> str:
+            return f"{seconds * 1000:.1f}"
+        lines = [f"{'operação':<38} {'n':>6} {'p50':>7} {'p95':>7} {'p99':>7} {'máx':>7}"]
+        for operation, count, p50, p95, p99, worst in rows[:METRICS_ROWS]:
+            lines.append(f"{operation[:38]:<38} {count:>6} {ms(p50):>7} {ms(p95):>7} {ms(p99):>7} {ms(worst):>7}")
+        embed = discord.Embed(title="⏱️ Latência por Operação (ms)", description="```\n" + "\n".join(lines) + "\n```", color=0x2b2d31)
+        errors = sum(metrics.registry.errors.values())
+        embed.set_footer(text=f"{len(rows)} operações medidas, {errors} erros desde a inicialização.")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
 
     @app_commands.command(name="version", description="Mostra a versão atual do bot.")
     async def version(self, interaction: discord.Interaction):
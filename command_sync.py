@@ -0,0 +1,47 @@
+# command_sync.py
+import hashlib
+import json
+import logging
+import time
+import discord
+from discord import app_commands
+import database
+
+log = logging.getLogger(__name__)
+
+SETTING_KEY = "command_tree_hash"
+
+def tree_hash(tree: app_commands.CommandTree, guild: discord.abc.Snowflake) -> str:
+    """Hash estável dos comandos que seriam enviados ao Discord para o servidor.
+
+    Usa o mesmo payload do `tree.sync` (nomes, descrições, opções, permissões), ordenado por
+    tipo e nome para não depender da ordem em que os cogs foram carregados.
+    """
+    payload = sorted(
+        (command.to_dict(tree) for command in tree.get_commands(guild=guild)),
+        key=lambda data: (data.get("type", 1), data["name"]),
+    )
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+async def sync_if_changed(bot: discord.Client, guild_id: int) -> bool:
+    """Sincroniza os comandos com o servidor apenas se mudaram desde a última sincronização.
+
+    O hash fica na configuração 'command_tree_hash' junto com o aplicativo e o servidor, então
+    trocar de bot ou de servidor também força uma nova sincronização. Retorna True se sincronizou.
+    """
+    guild = discord.Object(id=guild_id)
+    bot.tree.copy_global_to(guild=guild)
+    digest = tree_hash(bot.tree, guild)
+    state = {"application_id": bot.application_id, "guild_id": guild_id, "hash": digest}
+
+    if await database.get_setting(SETTING_KEY) == state:
+        log.info("Comandos inalterados. Sincronização ignorada.", extra={"guild": guild_id})
+        return False
+
+    started = time.perf_counter()
+    synced = await bot.tree.sync(guild=guild)
+    latency_ms = round((time.perf_counter() - started) * 1000)
+    # Só grava depois do sucesso: uma falha faz a próxima inicialização tentar de novo
+    await database.set_setting(SETTING_KEY, state)
+    log.info("Sincronizados %d comandos.", len(synced), extra={"guild": guild_id, "latency_ms": latency_ms})
+    return True
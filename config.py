@@ -0,0 +1,187 @@
+# config.py
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+CONFIG_FILE = 'config.json'
+CONFIG_POLL_INTERVAL = 5 # Segundos entre verificações de alteração do arquivo
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+ID_FIELD = re.compile(r"_id(_\d+)?$") # Ex.: staff_role_id, registered_role_id_1
+
+log = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class Rank:
+    role_id: int
+    prefix: str
+    display_name: str
+
+@dataclass(frozen=True)
+class Config:
+    """Configuração do bot já validada: IDs como int (None se ausentes ou inválidos).
+
+    Os campos têm o nome das chaves do config.json em minúsculas. O objeto é imutável; um
+    recarregamento cria outro e troca a referência devolvida por `current()`.
+    """
+    guild_id: int = None
+    staff_role_id: int = None
+
+    registration_panel_channel_id: int = None
+    registration_logs_channel_id: int = None
+    registration_approval_channel_id: int = None
+    unregistered_role_id: int = None
+    registered_role_id_1: int = None
+    registered_role_id_2: int = None
+
+    absence_panel_channel_id: int = None
+    absence_logs_channel_id: int = None
+    absence_return_channel_id: int = None
+    absent_role_id: int = None
+
+    farm_panel_channel_id: int = None
+    farm_ticket_category_id: int = None
+    farm_approval_channel_id: int = None
+
+    hr_panel_channel_id: int = None
+    hr_logs_channel_id: int = None
+    dismissal_alert_channel_id: int = None
+    promotion_alert_channel_id: int = None
+    demotion_alert_channel_id: int = None
+
+    rescue_panel_channel_id: int = None
+    rescue_alert_channel_id: int = None
+    hierarchy_channel_id: int = None
+    hierarchy_bullet_emoji: str = '•'
+    hierarchy_quiet_period: float = 5.0 # Segundos sem novos pedidos antes de redesenhar a hierarquia
+
+    cash_control_log_channel_id: int = None
+    cash_control_panel_channel_id: int = None
+    bug_report_channel_id: int = None
+
+    log_flush_window: float = 2.0 # Segundos acumulando embeds antes de enviar
+    log_urgent_channel_ids: frozenset = frozenset() # Padrão: o canal de alertas de resgate
+    rest_concurrency: int = 8 # Chamadas simultâneas à API no total
+    log_level: str = "INFO"
+    log_sample_every: int = 10 # Laços ruidosos registram 1 a cada N mensagens
+    metrics_file: str = "logs/metrics.prom" # Exportação OpenMetrics; vazio desativa
+    metrics_export_interval: float = 15.0
+
+    hierarquia: tuple = () # Ranks do mais baixo para o mais alto
+    rank_by_role: MappingProxyType = field(default_factory=lambda: MappingProxyType({}))
+
+def _parse_id(key: str, value):
+    if value is None or value == "":
+        return None
+    try:
+        parsed = int(str(value).strip())
+    except ValueError:
+        log.warning("Valor inválido para %s: %r. Ignorado.", key, value)
+        return None
+    return parsed if parsed > 0 else None
+
+def _parse_number(key: str, value, kind: type):
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError(f"{key} deve ser um número, recebido {value!r}.")
+    try:
+        return kind(value)
+    except ValueError:
+        raise ValueError(f"{key} deve ser um número, recebido {value!r}.") from None
+
+def parse(data: dict) -> Config:
+    """Converte o JSON bruto em Config.
+
+    Levanta ValueError, citando a chave, se algum campo tiver o tipo errado ou se a HIERARQUIA
+    estiver malformada.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("O arquivo de configuração deve conter um objeto JSON.")
+    values = {}
+    for config_field in dataclasses.fields(Config):
+        key = config_field.name.upper()
+        if key not in data:
+            continue
+        if ID_FIELD.search(config_field.name):
+            values[config_field.name] = _parse_id(key, data[key])
+        elif config_field.type in (float, int):
+            values[config_field.name] = _parse_number(key, data[key], config_field.type)
+        elif config_field.type is str:
+            if not isinstance(data[key], str):
+                raise ValueError(f"{key} deve ser um texto, recebido {data[key]!r}.")
+            values[config_field.name] = data[key]
+
+    if "log_level" in values:
+        values["log_level"] = values["log_level"].upper()
+        if values["log_level"] not in LOG_LEVELS:
+            raise ValueError(f"LOG_LEVEL inválido: {data['LOG_LEVEL']!r}.")
+
+    hierarchy = data.get('HIERARQUIA', [])
+    if not isinstance(hierarchy, list):
+        raise ValueError("HIERARQUIA deve ser uma lista.")
+    ranks = []
+    for position, rank_info in enumerate(hierarchy):
+        if not isinstance(rank_info, dict):
+            raise ValueError(f"HIERARQUIA[{position}] deve ser um objeto, recebido {rank_info!r}.")
+        role_id = _parse_id(f"HIERARQUIA[{position}].role_id", rank_info.get("role_id"))
+        if role_id is None:
+            raise ValueError(f"HIERARQUIA[{position}] sem role_id válido.")
+        ranks.append(Rank(role_id, rank_info.get("prefix", ""), rank_info.get("display_name", "Cargo Desconhecido")))
+    values["hierarquia"] = tuple(ranks)
+    values["rank_by_role"] = MappingProxyType({rank.role_id: position for position, rank in enumerate(ranks)})
+
+    urgent = data.get('LOG_URGENT_CHANNEL_IDS', [data.get('RESCUE_ALERT_CHANNEL_ID')])
+    if not isinstance(urgent, list):
+        raise ValueError("LOG_URGENT_CHANNEL_IDS deve ser uma lista.")
+    values["log_urgent_channel_ids"] = frozenset(
+        channel_id for channel_id in (_parse_id('LOG_URGENT_CHANNEL_IDS', value) for value in urgent) if channel_id
+    )
+    return Config(**values)
+
+def load(path: str = CONFIG_FILE) -> Config:
+    with open(path, 'r', encoding='utf-8') as f:
+        return parse(json.load(f))
+
+def changed_keys(old: Config, new: Config) -> set:
+    return {config_field.name for config_field in dataclasses.fields(Config) if getattr(old, config_field.name) != getattr(new, config_field.name)}
+
+_current = load()
+
+def current() -> Config:
+    return _current
+
+async def watch(bot, path: str = CONFIG_FILE, interval: float = CONFIG_POLL_INTERVAL):
+    """Recarrega o arquivo quando ele muda e dispara `config_update(chaves, antiga, nova)`.
+
+    Um arquivo inválido (JSON quebrado, campo com tipo errado, HIERARQUIA malformada) é ignorado
+    e a configuração anterior continua valendo; o laço segue vigiando o arquivo.
+    """
+    global _current
+    last_mtime = os.path.getmtime(path)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            continue
+        if mtime == last_mtime:
+            continue
+        last_mtime = mtime
+        try:
+            new = load(path)
+        except (OSError, ValueError) as e: # json.JSONDecodeError é um ValueError
+            log.error("Falha ao recarregar %s, mantendo a configuração anterior: %s", path, e)
+            continue
+        except Exception: # Qualquer outro erro de validação não pode desligar o recarregamento
+            log.exception("Erro inesperado ao recarregar %s, mantendo a configuração anterior.", path)
+            continue
+        old = _current
+        keys = changed_keys(old, new)
+        if not keys:
+            continue
+        _current = new # Troca atômica: quem já pegou a configuração antiga termina com ela
+        log.info("Configuração recarregada. Chaves alteradas: %s", ", ".join(sorted(keys)))
+        bot.dispatch("config_update", keys, old, new)
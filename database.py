@@ -1,136 +1,529 @@
 # database.py
+import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
 import aiosqlite
+import json
+import logging
 from datetime import datetime
 
+log = logging.getLogger(__name__)
+
 DATABASE_FILE = "oasis_custom_data.db"
+READER_CONNECTIONS = 4 # Conexões de leitura mantidas abertas no pool
+STATEMENT_CACHE_SIZE = 128 # Statements preparados reaproveitados por conexão
+LEGACY_RANKING_CONFIG_FILE = "ranking_config.json" # Importado para a tabela settings na migração 5
 
-async def init_db():
-    """Inicializa o banco de dados e cria todas as tabelas necessárias se não existirem."""
-    async with aiosqlite.connect(DATABASE_FILE) as db:
+# --- Pool de Conexões ---
+class ConnectionPool:
+    """Mantém uma conexão de escrita e N conexões de leitura abertas durante toda a vida do bot.
+
+    Com o WAL ativo, as leituras não bloqueiam a escrita (e vice-versa). As escritas passam
+    por um único lock, o que serializa as transações e evita o erro 'database is locked'.
+    """
+    def __init__(self, path: str, readers: int = READER_CONNECTIONS):
+        self.path = path
+        self.readers = readers
+        self._writer = None
+        self._write_lock = asyncio.Lock()
+        self._idle_readers = deque()
+        self._reader_waiters = deque() # Futures de quem espera uma leitura, do mais antigo ao mais novo
+        self._connections = []
+
+    async def _connect(self, read_only: bool = False) -> aiosqlite.Connection:
+        db = await aiosqlite.connect(self.path, cached_statements=STATEMENT_CACHE_SIZE)
         await db.execute('PRAGMA journal_mode=WAL;')
+        await db.execute('PRAGMA synchronous=NORMAL;')
+        await db.execute('PRAGMA busy_timeout=5000;')
+        if read_only:
+            await db.execute('PRAGMA query_only=ON;')
+        self._connections.append(db)
+        return db
+
+    async def open(self):
+        # A conexão de escrita é aberta primeiro para que o WAL seja ativado antes das leituras
+        self._writer = await self._connect()
+        for _ in range(self.readers):
+            self._idle_readers.append(await self._connect(read_only=True))
+
+    async def close(self):
+        for db in self._connections:
+            await db.close()
+        self._connections.clear()
+        self._writer = None
+
+    @asynccontextmanager
+    async def writer(self):
+        """Empresta a conexão de escrita. Em caso de erro, a transação em aberto é desfeita."""
+        async with self._write_lock:
+            try:
+                yield self._writer
+            except BaseException:
+                await self._writer.rollback()
+                raise
+
+    @asynccontextmanager
+    async def reader(self):
+        """Empresta uma conexão de leitura livre, esperando caso todas estejam em uso.
+
+        A espera é em ordem de chegada: quem devolve uma conexão a entrega direto ao mais antigo
+        da fila, então um chamador em laço não consegue retomá-la na frente de quem já esperava.
+        """
+        if self._idle_readers and not self._reader_waiters:
+            db = self._idle_readers.popleft()
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._reader_waiters.append(waiter)
+            try:
+                db = await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._release_reader(waiter.result()) # Cancelado depois de receber: repassa a conexão
+                elif waiter in self._reader_waiters: # Pode já ter sido descartado por _release_reader
+                    self._reader_waiters.remove(waiter)
+                raise
+        try:
+            yield db
+        finally:
+            self._release_reader(db)
+
+    def _release_reader(self, db: aiosqlite.Connection):
+        while self._reader_waiters:
+            waiter = self._reader_waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(db)
+                return
+        self._idle_readers.append(db)
+
+_pool: ConnectionPool | None = None
+_pool_lock = asyncio.Lock()
+
+async def open_pool():
+    """Abre o pool de conexões. Deve ser chamado uma vez na inicialização do bot."""
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            pool = ConnectionPool(DATABASE_FILE)
+            await pool.open()
+            _pool = pool
+
+async def close_pool():
+    """Fecha todas as conexões do pool. Chamado no desligamento do bot."""
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+
+async def _get_pool() -> ConnectionPool:
+    # Abre o pool sob demanda caso alguma função seja usada antes da inicialização
+    if _pool is None:
+        await open_pool()
+    return _pool
+
+@asynccontextmanager
+async def _writer():
+    pool = await _get_pool()
+    async with pool.writer() as db:
+        yield db
+
+@asynccontextmanager
+async def _reader():
+    pool = await _get_pool()
+    async with pool.reader() as db:
+        yield db
+
+async def _fetchone(query: str, params: tuple = (), row_factory=None):
+    async with _reader() as db:
+        async with db.execute(query, params) as cursor:
+            cursor.row_factory = row_factory
+            return await cursor.fetchone()
+
+async def _fetchall(query: str, params: tuple = (), row_factory=None):
+    async with _reader() as db:
+        async with db.execute(query, params) as cursor:
+            cursor.row_factory = row_factory
+            return await cursor.fetchall()
+
+_RANKING_UPSERT_SQL = "INSERT INTO farm_ranking_totals (user_id, total) VALUES (?, ?) ON CONFLICT(user_id) DO UPDATE SET total = total + excluded.total"
+_RANKING_REBUILD_SQL = "INSERT INTO farm_ranking_totals (user_id, total) SELECT user_id, SUM(item_quantity) FROM farm_deliveries WHERE status = 'aprovado' GROUP BY user_id"
+
+# --- Migrações de Esquema ---
+# Cada migração é aplicada uma única vez, em ordem, e a versão atual fica gravada no
+# cabeçalho do banco (PRAGMA user_version). Os passos usam IF NOT EXISTS para que
+# rodar de novo sobre um banco antigo (criado antes das migrações) seja seguro.
+async def _migration_1_base_tables(db: aiosqlite.Connection):
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS absences (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, reason TEXT NOT NULL,
+            return_date TEXT NOT NULL, submitted_at TEXT NOT NULL, is_active INTEGER DEFAULT 1
+        )
+    ''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS farm_tickets (user_id INTEGER PRIMARY KEY, channel_id INTEGER NOT NULL)
+    ''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS farm_deliveries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, item_name TEXT NOT NULL,
+            item_quantity INTEGER NOT NULL, image_url TEXT, private_message_id INTEGER,
+            timestamp TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'pendente'
+        )
+    ''')
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS cash_control (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, type TEXT NOT NULL, amount REAL NOT NULL,
+            reason TEXT NOT NULL, image_url TEXT, balance_before REAL NOT NULL,
+            balance_after REAL NOT NULL, user_id INTEGER NOT NULL, timestamp TEXT NOT NULL
+        )
+    ''')
+
+async def _migration_2_hot_indexes(db: aiosqlite.Connection):
+    # Ranking e relatório: filtra por status e agrupa por usuário lendo apenas o índice
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_farm_deliveries_status_user ON farm_deliveries (status, user_id, item_quantity)")
+    # Últimas entregas do usuário: o rowid (id) já vem ordenado dentro de cada user_id
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_farm_deliveries_user ON farm_deliveries (user_id)")
+    # Ausências vencidas: igualdade em is_active e intervalo em return_date
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_absences_active_return ON absences (is_active, return_date)")
+    # farm_tickets já é buscada pela chave primária (user_id) e cash_control pelo rowid
+
+async def _migration_3_farm_ranking_totals(db: aiosqlite.Connection):
+    # Totais aprovados por usuário, mantidos por update_delivery_status()
+    await db.execute('''
+        CREATE TABLE IF NOT EXISTS farm_ranking_totals (user_id INTEGER PRIMARY KEY, total INTEGER NOT NULL DEFAULT 0)
+    ''')
+    await db.execute("CREATE INDEX IF NOT EXISTS idx_farm_ranking_totals_total ON farm_ranking_totals (total DESC, user_id)")
+    await db.execute("DELETE FROM farm_ranking_totals")
+    await db.execute(_RANKING_REBUILD_SQL)
+
+async def _migration_4_approval_message_id(db: aiosqlite.Connection):
+    # ID da mensagem no canal de aprovação, usado para atualizá-la sem buscar o histórico
+    async with db.execute("PRAGMA table_info(farm_deliveries)") as cursor:
+        columns = {row[1] for row in await cursor.fetchall()}
+    if "approval_message_id" not in columns:
+        await db.execute("ALTER TABLE farm_deliveries ADD COLUMN approval_message_id INTEGER")
+
+async def _migration_5_settings(db: aiosqlite.Connection):
+    # Estado de execução (IDs de mensagens etc.) guardado como JSON por chave
+    await db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    # Importação única do antigo ranking_config.json
+    try:
+        with open(LEGACY_RANKING_CONFIG_FILE, 'r', encoding='utf-8') as f:
+            legacy = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return
+    if legacy.get('ranking_channel_id') and legacy.get('ranking_message_id'):
+        value = {"channel_id": legacy['ranking_channel_id'], "message_id": legacy['ranking_message_id']}
+        await db.execute("INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)", ("ranking_message", json.dumps(value)))
+
+MIGRATIONS = [
+    (1, _migration_1_base_tables),
+    (2, _migration_2_hot_indexes),
+    (3, _migration_3_farm_ranking_totals),
+    (4, _migration_4_approval_message_id),
+    (5, _migration_5_settings),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+async def get_schema_version(db: aiosqlite.Connection) -> int:
+    async with db.execute("PRAGMA user_version") as cursor:
+        return (await cursor.fetchone())[0]
+
+async def apply_migrations(db: aiosqlite.Connection, target: int = SCHEMA_VERSION) -> list:
+    """Aplica, em ordem e cada uma em sua própria transação, as migrações pendentes até `target`.
+
+    Retorna a lista das versões aplicadas.
+    """
+    current = await get_schema_version(db)
+    applied = []
+    for version, migration in MIGRATIONS:
+        if version <= current or version > target:
+            continue
+        await db.execute("BEGIN")
+        try:
+            await migration(db)
+            await db.execute(f"PRAGMA user_version = {version}")
+            await db.commit()
+        except BaseException:
+            await db.rollback()
+            raise
+        applied.append(version)
+    return applied
+
+async def init_db():
+    """Inicializa o banco de dados e aplica as migrações de esquema pendentes."""
+    async with _writer() as db:
+        applied = await apply_migrations(db)
+        version = await get_schema_version(db)
+        await _ledger.load(db)
+        await _load_settings(db)
+    if applied:
+        log.info("Banco de dados migrado para a versão %d (aplicadas: %s).", version, applied)
+    log.info("Banco de dados consolidado inicializado com sucesso (esquema v%d).", version)
+
+# --- Configurações de Execução (chave/valor) ---
+# Lidas do banco uma única vez; depois disso as leituras vêm do cache em memória e
+# as escritas atualizam o cache e o banco juntos (write-through).
+_settings_cache: dict | None = None
 
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS absences (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, reason TEXT NOT NULL,
-                return_date TEXT NOT NULL, submitted_at TEXT NOT NULL, is_active INTEGER DEFAULT 1
-            )
-        ''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS farm_tickets (user_id INTEGER PRIMARY KEY, channel_id INTEGER NOT NULL)
-        ''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS farm_deliveries (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, item_name TEXT NOT NULL,
-                item_quantity INTEGER NOT NULL, image_url TEXT, private_message_id INTEGER,
-                timestamp TEXT NOT NULL, status TEXT NOT NULL DEFAULT 'pendente'
-            )
-        ''')
-        await db.execute('''
-            CREATE TABLE IF NOT EXISTS cash_control (
-                id INTEGER PRIMARY KEY AUTOINCREMENT, type TEXT NOT NULL, amount REAL NOT NULL,
-                reason TEXT NOT NULL, image_url TEXT, balance_before REAL NOT NULL,
-                balance_after REAL NOT NULL, user_id INTEGER NOT NULL, timestamp TEXT NOT NULL
-            )
-        ''')
+async def _load_settings(db: aiosqlite.Connection):
+    global _settings_cache
+    async with db.execute("SELECT key, value FROM settings") as cursor:
+        _settings_cache = {key: json.loads(value) for key, value in await cursor.fetchall()}
+
+async def get_setting(key: str, default=None):
+    if _settings_cache is None:
+        async with _writer() as db:
+            if _settings_cache is None:
+                await _load_settings(db)
+    return _settings_cache.get(key, default)
+
+async def set_setting(key: str, value):
+    """Grava uma configuração (qualquer valor serializável em JSON). `None` remove a chave."""
+    async with _writer() as db:
+        if _settings_cache is None:
+            await _load_settings(db)
+        if value is None:
+            await db.execute("DELETE FROM settings WHERE key = ?", (key,))
+        else:
+            await db.execute("INSERT INTO settings (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, json.dumps(value)))
         await db.commit()
-    print("Banco de dados consolidado inicializado com sucesso.")
+        if value is None:
+            _settings_cache.pop(key, None)
+        else:
+            _settings_cache[key] = value
 
 # --- Funções do Sistema de Ausência ---
-async def add_absence(user_id: int, reason: str, return_date: str):
-    async with aiosqlite.connect(DATABASE_FILE) as db:
-        await db.execute("INSERT INTO absences (user_id, reason, return_date, submitted_at) VALUES (?, ?, ?, ?)", (user_id, reason, return_date, datetime.now().isoformat()))
+async def add_absence(user_id: int, reason: str, return_date: str) -> int:
+    async with _writer() as db:
+        cursor = await db.execute("INSERT INTO absences (user_id, reason, return_date, submitted_at) VALUES (?, ?, ?, ?)", (user_id, reason, return_date, datetime.now().isoformat()))
         await db.commit()
+        return cursor.lastrowid
+
+async def get_active_absences():
+    """Todas as ausências ativas como (id, user_id, return_date), para montar o agendador de retornos."""
+    return await _fetchall("SELECT id, user_id, return_date FROM absences WHERE is_active = 1")
 
 async def get_expired_absences():
     today_str = datetime.now().strftime('%Y-%m-%d')
-    async with aiosqlite.connect(DATABASE_FILE) as db:
-        cursor = await db.execute("SELECT id, user_id FROM absences WHERE return_date <= ? AND is_active = 1", (today_str,))
-        return await cursor.fetchall()
+    return await _fetchall("SELECT id, user_id FROM absences WHERE return_date <= ? AND is_active = 1", (today_str,))
 
 async def deactivate_absence(absence_id: int):
-    async with aiosqlite.connect(DATABASE_FILE) as db:
+    async with _writer() as db:
         await db.execute("UPDATE absences SET is_active = 0 WHERE id = ?", (absence_id,))
         await db.commit()
 
+async def deactivate_absences(absence_ids: list):
+    async with _writer() as db:
+        await db.executemany("UPDATE absences SET is_active = 0 WHERE id = ?", [(absence_id,) for absence_id in absence_ids])
+        await db.commit()
+
 # --- Funções do Sistema de Farm ---
 async def get_user_ticket(user_id: int):
-    async with aiosqlite.connect(DATABASE_FILE) as db:
-        cursor = await db.execute("SELECT channel_id FROM farm_tickets WHERE user_id = ?", (user_id,))
-        return await cursor.fetchone()
+    return await _fetchone("SELECT channel_id FROM farm_tickets WHERE user_id = ?", (user_id,))
 
 async def create_farm_ticket(user_id: int, channel_id: int):
-    async with aiosqlite.connect(DATABASE_FILE) as db:
+    async with _writer() as db:
         await db.execute("INSERT INTO farm_tickets (user_id, channel_id) VALUES (?, ?)", (user_id, channel_id))
         await db.commit()
 
 async def delete_farm_ticket(user_id: int):
-    async with aiosqlite.connect(DATABASE_FILE) as db:
+    async with _writer() as db:
         await db.execute("DELETE FROM farm_tickets WHERE user_id = ?", (user_id,))
         await db.commit()
 
 async def add_farm_delivery(user_id: int, item_name: str, quantity: int, image_url: str):
-    async with aiosqlite.connect(DATABASE_FILE) as db:
+    async with _writer() as db:
         cursor = await db.execute("INSERT INTO farm_deliveries (user_id, item_name, item_quantity, image_url, timestamp) VALUES (?, ?, ?, ?, ?)", (user_id, item_name, quantity, image_url, datetime.now().isoformat()))
         await db.commit()
         return cursor.lastrowid
 
 async def set_private_message_id(delivery_id: int, message_id: int):
-    async with aiosqlite.connect(DATABASE_FILE) as db:
+    async with _writer() as db:
         await db.execute("UPDATE farm_deliveries SET private_message_id = ? WHERE id = ?", (message_id, delivery_id))
         await db.commit()
 
+async def set_approval_message_id(delivery_id: int, message_id: int):
+    async with _writer() as db:
+        await db.execute("UPDATE farm_deliveries SET approval_message_id = ? WHERE id = ?", (message_id, delivery_id))
+        await db.commit()
+
 async def get_delivery_info(delivery_id: int):
-    async with aiosqlite.connect(DATABASE_FILE) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT user_id, private_message_id FROM farm_deliveries WHERE id = ?", (delivery_id,))
-        return await cursor.fetchone()
+    return await _fetchone("SELECT user_id, private_message_id FROM farm_deliveries WHERE id = ?", (delivery_id,), row_factory=aiosqlite.Row)
 
 async def update_delivery_status(delivery_id: int, new_status: str):
-    async with aiosqlite.connect(DATABASE_FILE) as db:
+    """Atualiza o status da entrega e retorna o status anterior (None se a entrega não existir)."""
+    async with _writer() as db:
+        async with db.execute("SELECT user_id, item_quantity, status FROM farm_deliveries WHERE id = ?", (delivery_id,)) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return
+        user_id, quantity, old_status = row
         await db.execute("UPDATE farm_deliveries SET status = ? WHERE id = ?", (new_status, delivery_id))
+        # O total do ranking só muda quando a entrega entra ou sai do status 'aprovado'
+        delta = (quantity if new_status == 'aprovado' else 0) - (quantity if old_status == 'aprovado' else 0)
+        if delta:
+            await db.execute(_RANKING_UPSERT_SQL, (user_id, delta))
         await db.commit()
+        return old_status
+
+async def bulk_update_pending_deliveries(new_status: str, user_id: int = None, item_name: str = None, older_than: datetime = None):
+    """Muda o status de todas as entregas pendentes que atendem aos filtros em uma única transação.
+
+    Retorna as linhas alteradas, já com o canal do ticket do usuário (ticket_channel_id),
+    para que as mensagens possam ser atualizadas depois, fora da transação.
+    """
+    conditions, params = ["d.status = 'pendente'"], []
+    if user_id is not None:
+        conditions.append("d.user_id = ?")
+        params.append(user_id)
+    if item_name:
+        conditions.append("d.item_name = ? COLLATE NOCASE")
+        params.append(item_name)
+    if older_than is not None:
+        conditions.append("d.timestamp <= ?")
+        params.append(older_than.isoformat())
+    query = (
+        "SELECT d.id, d.user_id, d.item_name, d.item_quantity, d.image_url, d.timestamp, d.private_message_id, "
+        "d.approval_message_id, t.channel_id AS ticket_channel_id "
+        "FROM farm_deliveries d LEFT JOIN farm_tickets t ON t.user_id = d.user_id "
+        f"WHERE {' AND '.join(conditions)} ORDER BY d.id"
+    )
+    async with _writer() as db:
+        async with db.execute(query, params) as cursor:
+            cursor.row_factory = aiosqlite.Row
+            rows = await cursor.fetchall()
+        if not rows:
+            return []
+        await db.executemany("UPDATE farm_deliveries SET status = ? WHERE id = ?", [(new_status, row["id"]) for row in rows])
+        if new_status == 'aprovado':
+            totals = {}
+            for row in rows:
+                totals[row["user_id"]] = totals.get(row["user_id"], 0) + row["item_quantity"]
+            await db.executemany(_RANKING_UPSERT_SQL, list(totals.items()))
+        await db.commit()
+        return rows
 
 async def get_user_deliveries(user_id: int, limit: int = 10):
-    async with aiosqlite.connect(DATABASE_FILE) as db:
-        cursor = await db.execute("SELECT item_name, item_quantity, image_url, status, timestamp FROM farm_deliveries WHERE user_id = ? ORDER BY id DESC LIMIT ?", (user_id, limit))
-        return await cursor.fetchall()
+    return await _fetchall("SELECT item_name, item_quantity, image_url, status, timestamp FROM farm_deliveries WHERE user_id = ? ORDER BY id DESC LIMIT ?", (user_id, limit))
 
 async def get_farm_ranking(limit: int = 10):
-    async with aiosqlite.connect(DATABASE_FILE) as db:
-        cursor = await db.execute("SELECT user_id, SUM(item_quantity) as total FROM farm_deliveries WHERE status = 'aprovado' GROUP BY user_id ORDER BY total DESC LIMIT ?", (limit,))
-        return await cursor.fetchall()
+    return await _fetchall("SELECT user_id, total FROM farm_ranking_totals WHERE total > 0 ORDER BY total DESC, user_id LIMIT ?", (limit,))
+
+async def verify_farm_ranking(repair: bool = False):
+    """Recalcula os totais do ranking a partir de farm_deliveries e compara com a tabela agregada.
+
+    Retorna uma lista de (user_id, total_armazenado, total_correto) para cada divergência.
+    Com `repair=True`, a tabela agregada é reconstruída na mesma transação.
+    """
+    async with _writer() as db:
+        async with db.execute("SELECT user_id, SUM(item_quantity) FROM farm_deliveries WHERE status = 'aprovado' GROUP BY user_id") as cursor:
+            expected = dict(await cursor.fetchall())
+        async with db.execute("SELECT user_id, total FROM farm_ranking_totals WHERE total != 0") as cursor:
+            stored = dict(await cursor.fetchall())
+        drift = [
+            (user_id, stored.get(user_id, 0), expected.get(user_id, 0))
+            for user_id in sorted(expected.keys() | stored.keys())
+            if stored.get(user_id, 0) != expected.get(user_id, 0)
+        ]
+        if drift and repair:
+            await db.execute("DELETE FROM farm_ranking_totals")
+            await db.execute(_RANKING_REBUILD_SQL)
+            await db.commit()
+        return drift
 
 # --- Funções do Sistema de Controle de Caixa ---
+class CashLedger:
+    """Mantém em memória o saldo atual e os totais do caixa.
+
+    O estado é lido do banco uma única vez. Depois disso, cada lançamento calcula
+    balance_before/balance_after dentro do lock de escrita, no momento do commit, então
+    dois depósitos simultâneos nunca usam o mesmo saldo anterior.
+    """
+    def __init__(self):
+        self.balance = 0.0
+        self.total_in = 0.0
+        self.total_out = 0.0
+        self.transactions = 0
+        self.loaded = False
+
+    async def load(self, db: aiosqlite.Connection):
+        async with db.execute("SELECT balance_after FROM cash_control ORDER BY id DESC LIMIT 1") as cursor:
+            head = await cursor.fetchone()
+        async with db.execute(
+            """
+            SELECT
+                SUM(CASE WHEN type = 'entrada' THEN amount ELSE 0 END),
+                SUM(CASE WHEN type = 'saida' THEN amount ELSE 0 END),
+                COUNT(id)
+            FROM cash_control
+            """
+        ) as cursor:
+            total_in, total_out, count = await cursor.fetchone()
+        self.balance = float(head[0]) if head else 0.0
+        self.total_in = float(total_in or 0)
+        self.total_out = float(total_out or 0)
+        self.transactions = count
+        self.loaded = True
+
+    async def ensure_loaded(self):
+        if not self.loaded:
+            async with _writer() as db:
+                if not self.loaded:
+                    await self.load(db)
+
+    def apply(self, type: str, amount: float, balance_after: float):
+        self.balance = balance_after
+        self.transactions += 1
+        if type == 'entrada':
+            self.total_in += amount
+        elif type == 'saida':
+            self.total_out += amount
+
+_ledger = CashLedger()
+
 async def get_current_balance() -> float:
-    async with aiosqlite.connect(DATABASE_FILE) as db:
-        cursor = await db.execute("SELECT balance_after FROM cash_control ORDER BY id DESC LIMIT 1")
-        result = await cursor.fetchone()
-        return float(result[0]) if result else 0.0
+    await _ledger.ensure_loaded()
+    return _ledger.balance
+
+async def record_cash_transaction(type: str, amount: float, reason: str, user_id: int, image_url: str = None):
+    """Registra uma entrada/saída calculando o saldo a partir do topo do livro-caixa.
+
+    Retorna (transaction_id, balance_before, balance_after).
+    """
+    async with _writer() as db:
+        if not _ledger.loaded:
+            await _ledger.load(db)
+        balance_before = _ledger.balance
+        balance_after = round(balance_before + amount if type == 'entrada' else balance_before - amount, 2)
+        cursor = await db.execute("INSERT INTO cash_control (type, amount, reason, image_url, balance_before, balance_after, user_id, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (type, amount, reason, image_url, balance_before, balance_after, user_id, datetime.now().isoformat()))
+        await db.commit()
+        # O estado em memória só avança depois do commit
+        _ledger.apply(type, amount, balance_after)
+        return cursor.lastrowid, balance_before, balance_after
+
+async def set_cash_transaction_image(transaction_id: int, image_url: str):
+    async with _writer() as db:
+        await db.execute("UPDATE cash_control SET image_url = ? WHERE id = ?", (image_url, transaction_id))
+        await db.commit()
 
 async def add_cash_transaction(type: str, amount: float, reason: str, image_url: str, balance_before: float, balance_after: float, user_id: int):
-    async with aiosqlite.connect(DATABASE_FILE) as db:
+    async with _writer() as db:
+        if not _ledger.loaded:
+            await _ledger.load(db)
         await db.execute("INSERT INTO cash_control (type, amount, reason, image_url, balance_before, balance_after, user_id, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (type, amount, reason, image_url, balance_before, balance_after, user_id, datetime.now().isoformat()))
         await db.commit()
+        _ledger.apply(type, amount, balance_after)
 
 # --- Funções para o Comando de Relatório ---
 async def get_farm_report_stats():
     """Retorna estatísticas do sistema de farm para o relatório."""
-    async with aiosqlite.connect(DATABASE_FILE) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute("SELECT COUNT(id) as total_deliveries, COUNT(DISTINCT user_id) as unique_farmers FROM farm_deliveries WHERE status = 'aprovado'")
-        return await cursor.fetchone()
+    return await _fetchone("SELECT COUNT(id) as total_deliveries, COUNT(DISTINCT user_id) as unique_farmers FROM farm_deliveries WHERE status = 'aprovado'", row_factory=aiosqlite.Row)
 
 async def get_cash_control_report_stats():
-    """Retorna estatísticas do controle de caixa para o relatório."""
-    async with aiosqlite.connect(DATABASE_FILE) as db:
-        db.row_factory = aiosqlite.Row
-        cursor = await db.execute(
-            """
-            SELECT
-                SUM(CASE WHEN type = 'entrada' THEN amount ELSE 0 END) as total_in,
-                SUM(CASE WHEN type = 'saida' THEN amount ELSE 0 END) as total_out,
-                COUNT(id) as total_transactions
-            FROM cash_control
-            """
-        )
-        return await cursor.fetchone()
\ No newline at end of file
+    """Retorna estatísticas do controle de caixa para o relatório (servidas da memória)."""
+    await _ledger.ensure_loaded()
+    return {
+        "total_in": _ledger.total_in,
+        "total_out": _ledger.total_out,
+        "total_transactions": _ledger.transactions,
+    }
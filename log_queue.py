@@ -0,0 +1,158 @@
+# log_queue.py
+import asyncio
+import logging
+import discord
+import config
+import rest_scheduler
+from rest_scheduler import Priority
+
+log = logging.getLogger(__name__)
+
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000 # Limite do Discord somando todos os embeds da mensagem
+MAX_FILES_PER_MESSAGE = 10
+MAX_FILE_BYTES_PER_MESSAGE = 8 * 1024 * 1024
+
+class _LogEntry:
+    def __init__(self, embed: discord.Embed, file: discord.File, content: str, allowed_mentions, future: asyncio.Future):
+        self.embed = embed
+        self.file = file
+        self.content = content
+        self.allowed_mentions = allowed_mentions
+        self.future = future
+        self.size = len(embed) if embed else 0
+        self.file_bytes = _file_size(file) if file else 0
+
+def _file_size(file: discord.File) -> int:
+    try:
+        position = file.fp.tell()
+        size = file.fp.seek(0, 2)
+        file.fp.seek(position)
+        return size
+    except (AttributeError, OSError):
+        return 0
+
+def _mark_retrieved(future: asyncio.Future):
+    # A falha já é registrada no console; quem não aguarda o envio não gera aviso de exceção perdida
+    if not future.cancelled():
+        future.exception()
+
+class LogQueue:
+    """Fila de saída por canal que junta até 10 embeds em uma única mensagem.
+
+    `enqueue` não espera o envio: devolve um future com a mensagem publicada, para quem precisa
+    dela (ex.: o link do anexo do caixa). Entradas com texto são enviadas sozinhas, e canais
+    urgentes ou entradas marcadas como urgentes não esperam a janela.
+    """
+    def __init__(self, flush_window: float = None):
+        self._flush_window = flush_window # None: usa LOG_FLUSH_WINDOW da configuração atual
+        self._pending = {} # channel_id -> [_LogEntry]
+        self._channels = {}
+        self._tasks = {}
+        self._urgent_tasks = set()
+        self._flush_now = asyncio.Event()
+        self.enqueued = 0
+        self.messages_sent = 0
+
+    @property
+    def flush_window(self) -> float:
+        return config.current().log_flush_window if self._flush_window is None else self._flush_window
+
+    def enqueue(self, channel: discord.abc.Messageable, *, embed: discord.Embed = None, file: discord.File = None,
+                content: str = None, allowed_mentions: discord.AllowedMentions = None, urgent: bool = False) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_mark_retrieved)
+        # Copia o embed: o chamador pode continuar alterando o original depois de enfileirar
+        entry = _LogEntry(embed.copy() if embed else None, file, content, allowed_mentions, future)
+        self.enqueued += 1
+
+        if urgent or channel.id in config.current().log_urgent_channel_ids:
+            task = asyncio.create_task(self._send(channel, [entry], Priority.URGENT))
+            self._urgent_tasks.add(task)
+            task.add_done_callback(self._urgent_tasks.discard)
+            return future
+
+        self._channels[channel.id] = channel
+        self._pending.setdefault(channel.id, []).append(entry)
+        task = self._tasks.get(channel.id)
+        if task is None or task.done():
+            self._tasks[channel.id] = asyncio.create_task(self._flush_later(channel.id))
+        return future
+
+    async def _flush_later(self, channel_id: int):
+        try:
+            await asyncio.wait_for(self._flush_now.wait(), timeout=self.flush_window)
+        except asyncio.TimeoutError:
+            pass
+        await self._flush_channel(channel_id)
+
+    async def _flush_channel(self, channel_id: int):
+        channel = self._channels[channel_id]
+        entries = self._pending.get(channel_id)
+        while entries:
+            batch = self._take_batch(entries)
+            await self._send(channel, batch)
+        self._pending.pop(channel_id, None)
+
+    def _take_batch(self, entries: list) -> list:
+        batch = [entries.pop(0)]
+        if batch[0].content is not None:
+            return batch
+        chars, files, file_bytes = batch[0].size, int(batch[0].file is not None), batch[0].file_bytes
+        while entries and len(batch) < MAX_EMBEDS_PER_MESSAGE:
+            entry = entries[0]
+            if entry.content is not None or chars + entry.size > MAX_EMBED_CHARS_PER_MESSAGE:
+                break
+            if entry.file and (files + 1 > MAX_FILES_PER_MESSAGE or file_bytes + entry.file_bytes > MAX_FILE_BYTES_PER_MESSAGE):
+                break
+            batch.append(entries.pop(0))
+            chars += entry.size
+            files += int(entry.file is not None)
+            file_bytes += entry.file_bytes
+        return batch
+
+    async def _send(self, channel: discord.abc.Messageable, batch: list, priority: Priority = Priority.NORMAL):
+        kwargs = {"embeds": [entry.embed for entry in batch if entry.embed]}
+        files = [entry.file for entry in batch if entry.file]
+        if files:
+            kwargs["files"] = files
+        if batch[0].content is not None:
+            kwargs["content"] = batch[0].content
+        if batch[0].allowed_mentions is not None:
+            kwargs["allowed_mentions"] = batch[0].allowed_mentions
+        try:
+            async with rest_scheduler.slot(priority):
+                message = await channel.send(**kwargs)
+        except Exception as e:
+            log.error("Falha ao enviar %d registros para o canal %s: %s", len(batch), channel.id, e)
+            for entry in batch:
+                if not entry.future.done():
+                    entry.future.set_exception(e)
+            return
+        self.messages_sent += 1
+        for entry in batch:
+            if not entry.future.done():
+                entry.future.set_result(message)
+
+    async def flush(self):
+        """Envia imediatamente tudo o que está na fila (usado no desligamento)."""
+        self._flush_now.set()
+        try:
+            await asyncio.gather(*self._tasks.values(), *self._urgent_tasks, return_exceptions=True)
+        finally:
+            self._flush_now.clear()
+
+    def stats(self) -> dict:
+        return {
+            "pending": sum(len(entries) for entries in self._pending.values()),
+            "enqueued": self.enqueued,
+            "messages_sent": self.messages_sent,
+        }
+
+log_queue = LogQueue()
+
+def enqueue(channel: discord.abc.Messageable, **kwargs) -> asyncio.Future:
+    return log_queue.enqueue(channel, **kwargs)
+
+async def flush():
+    await log_queue.flush()
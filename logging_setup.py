@@ -0,0 +1,117 @@
+# logging_setup.py
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import config
+
+LOG_DIR = 'logs'
+LOG_FILE = os.path.join(LOG_DIR, 'oasis.log')
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+# Campos estruturados aceitos em `extra=` e anexados a cada linha quando presentes
+STRUCTURED_FIELDS = ("guild", "user", "delivery_id", "latency_ms")
+
+class ConsoleFormatter(logging.Formatter):
+    """Linha legível para o terminal, com os campos estruturados no fim (`chave=valor`)."""
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s", "%Y-%m-%d %H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = [f"{name}={getattr(record, name)}" for name in STRUCTURED_FIELDS if getattr(record, name, None) is not None]
+        return f"{line} [{' '.join(fields)}]" if fields else line
+
+class JsonFormatter(logging.Formatter):
+    """Um objeto JSON por linha no arquivo, para filtrar e agregar sem parsear texto livre."""
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for name in STRUCTURED_FIELDS + ("suppressed",):
+            value = getattr(record, name, None)
+            if value is not None:
+                data[name] = value
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Deixa passar 1 a cada `every` registros de laços ruidosos.
+
+    Só afeta registros que trazem `extra={"sample_key": ...}` e de nível INFO ou abaixo; avisos
+    e erros sempre passam. O registro que passa leva em `suppressed` quantos foram descartados
+    desde o anterior com a mesma chave.
+    """
+    def __init__(self, every: int):
+        super().__init__()
+        self.every = max(1, every)
+        self._counts = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample_key", None)
+        if key is None or record.levelno > logging.INFO:
+            return True
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        if count % self.every:
+            return False
+        if count:
+            record.suppressed = self.every - 1
+        return True
+
+_listener = None
+_sampler = None
+
+def setup(log_dir: str = LOG_DIR) -> logging.handlers.QueueListener:
+    """Direciona todos os loggers para uma fila; uma thread de fundo grava no console e no arquivo.
+
+    O laço de eventos só enfileira o registro, então escrever no disco ou no terminal nunca
+    bloqueia o bot.
+    """
+    global _listener, _sampler
+    if _listener:
+        return _listener
+    cfg = config.current()
+    os.makedirs(log_dir, exist_ok=True)
+
+    console = logging.StreamHandler()
+    console.setFormatter(ConsoleFormatter())
+    file_handler = logging.handlers.RotatingFileHandler(
+        os.path.join(log_dir, os.path.basename(LOG_FILE)), maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8'
+    )
+    file_handler.setFormatter(JsonFormatter())
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    # A amostragem roda antes de enfileirar: registros descartados não custam nada à thread
+    _sampler = SamplingFilter(cfg.log_sample_every)
+    queue_handler.addFilter(_sampler)
+
+    root = logging.getLogger()
+    root.addHandler(queue_handler)
+    root.setLevel(cfg.log_level)
+
+    _listener = logging.handlers.QueueListener(log_queue, console, file_handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+def shutdown():
+    """Grava o que ainda está na fila e para a thread de fundo."""
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+def attach(bot):
+    """Aplica LOG_LEVEL e LOG_SAMPLE_EVERY quando o config.json é recarregado."""
+    async def on_config_update(keys, old, new):
+        if "log_level" in keys:
+            logging.getLogger().setLevel(new.log_level)
+        if "log_sample_every" in keys and _sampler:
+            _sampler.every = max(1, new.log_sample_every)
+    bot.add_listener(on_config_update)
@@ -1,10 +1,12 @@
 # main.py
+from startup import timer # Primeiro import: o relógio da inicialização começa aqui
 import discord
 from discord.ext import commands
 import os
 from dotenv import load_dotenv
 import asyncio
-import json
+import logging
+import time
 
 # --- NOVO CÓDIGO PARA CORRIGIR O ModuleNotFoundError ---
 import sys
@@ -12,6 +14,20 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 # --- FIM DA CORREÇÃO ---
 
+import command_sync
+import config
+import database
+import log_queue
+import logging_setup
+import member_index
+import member_mutations
+import metrics
+import resolver
+import rest_scheduler
+import uploads
+
+log = logging.getLogger("main")
+
 load_dotenv()
 TOKEN = os.getenv("TOKEN")
 
@@ -21,40 +37,97 @@ intents.members = True
 intents.messages = True
 intents.message_content = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+class OasisBot(commands.Bot):
+    async def setup_hook(self):
+        # Recarrega o config.json quando ele muda, sem reiniciar o bot
+        self._config_watcher = asyncio.create_task(config.watch(self))
+        self._metrics_exporter = asyncio.create_task(metrics.export_loop())
+
+    async def close(self):
+        # Registros ainda na janela de agrupamento são enviados antes de desconectar
+        await log_queue.flush()
+        await super().close()
+
+bot = OasisBot(command_prefix="!", intents=intents)
+# Um único listener entrega as imagens aguardadas pelos formulários (farm, caixa, resgate)
+bot.add_listener(uploads.dispatcher.on_message, "on_message")
+# Índice cargo → membros da hierarquia, montado no on_ready e mantido pelos eventos de membro
+member_index.attach(bot)
+# Trabalhos de fundo (hierarquia, ranking, lotes) cedem a vez enquanto há interações em andamento
+rest_scheduler.attach(bot)
+# Canais buscados pela API ficam em cache até serem apagados ou alterados
+resolver.attach(bot)
+# LOG_LEVEL e LOG_SAMPLE_EVERY acompanham o config.json recarregado
+logging_setup.attach(bot)
+# Latência de todo comando, botão, modal e consulta ao banco, exposta no /metricas e em arquivo
+metrics.instrument_discord()
+metrics.instrument_module(database, "db")
+metrics.register_gauge("gateway_latency_seconds", lambda: bot.latency if bot.latency == bot.latency else 0) # NaN antes de conectar
+metrics.register_gauge("uploads_pending", lambda: uploads.dispatcher.stats()["pending"])
+metrics.register_gauge("log_queue_pending", lambda: log_queue.log_queue.stats()["pending"])
+metrics.register_gauge("rest_in_flight", lambda: rest_scheduler.scheduler.stats()["in_flight"])
+metrics.register_gauge("rest_queued", lambda: sum(rest_scheduler.scheduler.stats()["queued"].values()))
+metrics.register_gauge("resolver_misses", lambda: resolver.resolver.stats()["misses"])
+metrics.register_gauge("member_edit_requests", lambda: member_mutations.stats.as_dict()["requests"])
+metrics.register_gauge("member_edit_retries", lambda: member_mutations.stats.as_dict()["retries"])
 
 @bot.event
 async def on_ready():
-    print(f'Bot conectado como {bot.user}!')
+    log.info("Bot conectado como %s!", bot.user)
+    # O on_ready se repete a cada reconexão; o relatório é só da primeira
+    if not timer.reported:
+        timer.lap("gateway")
+        timer.reported = True
+        log.info(timer.report())
+
+async def load_cog(filename: str):
+    started = time.perf_counter()
     try:
-        with open('config.json', 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        guild_id = config.get('GUILD_ID')
-        if guild_id:
-            guild = discord.Object(id=guild_id)
-            bot.tree.copy_global_to(guild=guild)
-            synced = await bot.tree.sync(guild=guild)
-            print(f"Sincronizados {len(synced)} comandos para o servidor {guild_id}.")
-    except Exception as e:
-        print(f"Falha ao sincronizar comandos: {e}")
+        await bot.load_extension(f'cogs.{filename[:-3]}')
+        log.info("Carregado com sucesso: %s", filename, extra={"latency_ms": round((time.perf_counter() - started) * 1000)})
+    except Exception:
+        log.exception("Falha ao carregar %s.", filename)
 
 async def load_cogs():
-    for filename in os.listdir('./cogs'):
-        if filename.endswith('.py'):
-            try:
-                await bot.load_extension(f'cogs.{filename[:-3]}')
-                print(f"Carregado com sucesso: {filename}")
-            except Exception as e:
-                print(f"--- FALHA AO CARREGAR: {filename} ---")
-                print(f"ERRO: {e}\n")
+    # Os cogs não dependem uns dos outros: o setup de cada um roda em paralelo
+    filenames = sorted(filename for filename in os.listdir('./cogs') if filename.endswith('.py'))
+    await asyncio.gather(*(load_cog(filename) for filename in filenames))
+
+async def sync_commands():
+    # Uma única vez por processo, e só se a árvore mudou; o on_ready roda de novo a cada
+    # reconexão e não deve gastar essa chamada
+    guild_id = config.current().guild_id
+    if not guild_id:
+        return
+    try:
+        await command_sync.sync_if_changed(bot, guild_id)
+    except Exception:
+        log.exception("Falha ao sincronizar comandos.")
 
 async def main():
+    timer.lap("importações")
+    # Os registros saem por uma thread de fundo; o laço de eventos só os enfileira
+    logging_setup.setup()
     if not TOKEN:
-        print("ERRO: O TOKEN do bot não foi encontrado no arquivo '.env'.")
+        log.error("O TOKEN do bot não foi encontrado no arquivo '.env'.")
+        logging_setup.shutdown()
         return
-    async with bot:
-        await load_cogs()
-        await bot.start(TOKEN)
+    # O pool de conexões é criado uma única vez e fechado no desligamento
+    with timer.phase("banco de dados"):
+        await database.open_pool()
+        await database.init_db() # Esquema e migrações, antes de qualquer cog usar o banco
+    try:
+        async with bot:
+            with timer.phase("setup dos cogs"):
+                await load_cogs()
+            with timer.phase("login"):
+                await bot.login(TOKEN)
+            with timer.phase("sincronização"):
+                await sync_commands()
+            await bot.connect() # A fase "gateway" termina no primeiro on_ready
+    finally:
+        await database.close_pool()
+        logging_setup.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
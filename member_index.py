@@ -0,0 +1,128 @@
+# member_index.py
+import bisect
+import logging
+import discord
+import config
+
+log = logging.getLogger(__name__)
+
+class HierarchyIndex:
+    """Índice em memória de cargo da hierarquia → membros ordenados pelo nome de exibição.
+
+    É montado uma vez a partir do cache do servidor quando o bot fica pronto e mantido pelos
+    eventos de membro, então quem precisa da lista não baixa nem reordena os membros de novo.
+    """
+    def __init__(self):
+        self.rank_of_role = dict(config.current().rank_by_role)
+        self.guild_id = None
+        self._clear()
+
+    def _clear(self):
+        self._sorted = {role_id: [] for role_id in self.rank_of_role} # [(display_name, member_id)]
+        self._entries = {} # member_id -> (chave de ordenação, cargos da hierarquia)
+        self._members = {} # member_id -> discord.Member mais recente
+
+    def build(self, guild: discord.Guild, rank_by_role=None):
+        """Monta o índice do zero; os cargos vêm da HIERARQUIA da configuração atual."""
+        self.rank_of_role = dict(config.current().rank_by_role if rank_by_role is None else rank_by_role)
+        self._clear()
+        for member in guild.members:
+            self._add(member)
+        self.guild_id = guild.id
+
+    def is_ready_for(self, guild) -> bool:
+        return self.guild_id is not None and self.guild_id == getattr(guild, "id", None)
+
+    def _add(self, member: discord.Member):
+        roles = frozenset(role.id for role in member.roles if role.id in self.rank_of_role)
+        if not roles:
+            return
+        key = (member.display_name, member.id)
+        for role_id in roles:
+            bisect.insort(self._sorted[role_id], key)
+        self._entries[member.id] = (key, roles)
+        self._members[member.id] = member
+
+    def _remove(self, member_id: int):
+        entry = self._entries.pop(member_id, None)
+        self._members.pop(member_id, None)
+        if entry is None:
+            return
+        key, roles = entry
+        for role_id in roles:
+            members = self._sorted[role_id]
+            position = bisect.bisect_left(members, key)
+            if position < len(members) and members[position] == key:
+                del members[position]
+
+    def update(self, member: discord.Member) -> bool:
+        """Reindexa o membro. Retorna True se o cargo ou o nome exibido na hierarquia mudou."""
+        previous = self._entries.get(member.id)
+        self._remove(member.id)
+        self._add(member)
+        return previous != self._entries.get(member.id)
+
+    def remove(self, member: discord.Member) -> bool:
+        indexed = member.id in self._entries
+        self._remove(member.id)
+        return indexed
+
+    def members(self, role_id: int) -> list:
+        return [self._members[member_id] for _, member_id in self._sorted.get(role_id, [])]
+
+    def ranked_members(self) -> list:
+        return list(self._members.values())
+
+    def rank_of(self, member: discord.Member) -> int:
+        """Índice do cargo mais alto do membro na HIERARQUIA (-1 se não tiver nenhum)."""
+        return max((self.rank_of_role[role.id] for role in member.roles if role.id in self.rank_of_role), default=-1)
+
+index = HierarchyIndex()
+
+def attach(bot: discord.Client):
+    """Registra os listeners que montam e mantêm o índice atualizado."""
+    def is_main_guild(guild: discord.Guild) -> bool:
+        return guild.id == config.current().guild_id
+
+    def rebuild():
+        guild = bot.get_guild(config.current().guild_id)
+        if guild:
+            index.build(guild)
+            log.info("%d membros da hierarquia indexados.", len(index.ranked_members()), extra={"guild": guild.id})
+        return guild
+
+    async def on_ready():
+        # Reconstruído a cada on_ready para absorver eventos perdidos durante uma reconexão
+        rebuild()
+
+    async def on_config_update(keys: set, old, new):
+        if keys & {"hierarquia", "guild_id"}:
+            guild = rebuild()
+            if guild:
+                bot.dispatch("hierarchy_update", guild)
+
+    async def on_member_update(before: discord.Member, after: discord.Member):
+        if is_main_guild(after.guild) and index.update(after):
+            bot.dispatch("hierarchy_update", after.guild)
+
+    async def on_member_join(member: discord.Member):
+        if is_main_guild(member.guild) and index.update(member):
+            bot.dispatch("hierarchy_update", member.guild)
+
+    async def on_member_remove(member: discord.Member):
+        if is_main_guild(member.guild) and index.remove(member):
+            bot.dispatch("hierarchy_update", member.guild)
+
+    async def on_user_update(before: discord.User, after: discord.User):
+        # Troca de nome global muda o display_name de quem não tem apelido
+        guild = bot.get_guild(config.current().guild_id)
+        member = guild.get_member(after.id) if guild else None
+        if member and index.update(member):
+            bot.dispatch("hierarchy_update", guild)
+
+    bot.add_listener(on_ready)
+    bot.add_listener(on_member_update)
+    bot.add_listener(on_member_join)
+    bot.add_listener(on_member_remove)
+    bot.add_listener(on_user_update)
+    bot.add_listener(on_config_update)
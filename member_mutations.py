@@ -0,0 +1,94 @@
+# member_mutations.py
+import asyncio
+import discord
+import rest_workers
+
+class MemberChange:
+    """Resultado de uma edição de membro, com o estado anterior guardado para desfazê-la."""
+    def __init__(self, member: discord.Member, previous_roles: list, previous_nick, applied: bool):
+        self.member = member
+        self.previous_roles = previous_roles
+        self.previous_nick = previous_nick
+        self.applied = applied
+
+class MutationStats:
+    def __init__(self):
+        self.requests = 0 # Chamadas PATCH efetivamente feitas (incluindo novas tentativas)
+        self.legacy_requests = 0 # Chamadas que o fluxo antigo (apelido + um add/remove por cargo) faria
+        self.retries = 0
+        self.rollbacks = 0
+        self.failures = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "legacy_requests": self.legacy_requests,
+            "retries": self.retries,
+            "rollbacks": self.rollbacks,
+            "failures": self.failures,
+        }
+
+stats = MutationStats()
+
+def _editable_roles(member: discord.Member) -> list:
+    return [role for role in member.roles if not role.is_default()]
+
+async def _patch(member: discord.Member, reason: str, retry: bool, **fields):
+    attempts = rest_workers.MAX_RETRIES + 1 if retry else 1
+    for attempt in range(attempts):
+        stats.requests += 1
+        try:
+            return await member.edit(reason=reason, **fields)
+        except discord.HTTPException as e:
+            if (e.status == 429 or e.status >= 500) and attempt < attempts - 1:
+                stats.retries += 1
+                await asyncio.sleep(rest_workers.retry_delay(e, attempt))
+                continue
+            stats.failures += 1
+            raise
+
+async def apply_member_changes(member: discord.Member, *, add=(), remove=(), nick=discord.utils.MISSING, reason: str = None, retry: bool = True) -> MemberChange:
+    """Aplica cargos e apelido finais do membro em uma única requisição.
+
+    O conjunto final de cargos é calculado a partir do cache; cargos gerenciados (bots, boost)
+    são mantidos, pois o Discord não permite removê-los. Como a edição é um único PATCH, ou tudo
+    é aplicado ou nada muda. Erros 429/5xx são repetidos; os demais são propagados.
+
+    Dentro de rest_workers.run_bulk, passe `retry=False`: o lote já repete com backoff, fora da
+    vaga do rest_scheduler, e repetir aqui também multiplicaria as tentativas segurando a vaga.
+    """
+    previous_roles = _editable_roles(member)
+    remove_ids = {role.id for role in remove if role}
+    add_roles = [role for role in add if role]
+
+    final_roles = [role for role in previous_roles if role.id not in remove_ids or role.managed]
+    final_ids = {role.id for role in final_roles}
+    for role in add_roles:
+        if role.id not in final_ids:
+            final_roles.append(role)
+            final_ids.add(role.id)
+
+    fields = {}
+    if final_ids != {role.id for role in previous_roles}:
+        fields["roles"] = final_roles
+    if nick is not discord.utils.MISSING and nick != member.nick:
+        fields["nick"] = nick
+
+    change = MemberChange(member, previous_roles, member.nick, applied=bool(fields))
+    if not fields:
+        return change
+
+    changed_roles = len(final_ids ^ {role.id for role in previous_roles})
+    stats.legacy_requests += changed_roles + (1 if "nick" in fields else 0)
+    updated = await _patch(member, reason, retry, **fields)
+    if updated is not None:
+        change.member = updated
+    return change
+
+async def revert(change: MemberChange, reason: str = None):
+    """Desfaz uma edição aplicada, quando um passo posterior do fluxo falhou."""
+    if not change.applied:
+        return
+    stats.rollbacks += 1
+    await _patch(change.member, reason, True, roles=change.previous_roles, nick=change.previous_nick)
+    change.applied = False
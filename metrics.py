@@ -0,0 +1,237 @@
+# metrics.py
+import asyncio
+import functools
+import inspect
+import logging
+import math
+import os
+import time
+from contextlib import contextmanager
+import discord
+from discord import app_commands
+import config
+
+log = logging.getLogger(__name__)
+
+SUB_BUCKET_BITS = 5 # 32 sub-faixas por potência de 2: erro relativo de no máximo ~3%
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+QUANTILES = (0.5, 0.95, 0.99)
+
+class Histogram:
+    """Histograma de latência no estilo HDR, em microssegundos.
+
+    Até 64µs cada valor tem sua própria faixa; acima disso, cada potência de 2 é dividida em
+    32 faixas iguais. Registrar custa um `bit_length` e um incremento de dict, e a memória
+    cresce com o número de faixas ocupadas, não com o número de medições.
+    """
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0 # Segundos
+        self.max = 0.0
+
+    @staticmethod
+    def _index(micros: int) -> int:
+        if micros < 2 * SUB_BUCKETS:
+            return micros
+        shift = micros.bit_length() - SUB_BUCKET_BITS - 1
+        return (shift + 1) * SUB_BUCKETS + (micros >> shift) - SUB_BUCKETS
+
+    @staticmethod
+    def _value(index: int) -> float:
+        """Ponto médio da faixa, em microssegundos."""
+        if index < 2 * SUB_BUCKETS:
+            return float(index)
+        shift = index // SUB_BUCKETS - 1
+        low = (index % SUB_BUCKETS + SUB_BUCKETS) << shift
+        return low + (1 << shift) / 2
+
+    def record(self, seconds: float):
+        index = self._index(max(0, int(seconds * 1_000_000)))
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, quantile: float) -> float:
+        """Latência em segundos abaixo da qual estão `quantile` das medições."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(quantile * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._value(index) / 1_000_000, self.max)
+        return self.max
+
+class Registry:
+    """Latências e erros por operação (`comando:/relatorio`, `db:get_farm_ranking`...) e indicadores."""
+    def __init__(self):
+        self.histograms = {}
+        self.errors = {}
+        self.gauges = {} # nome -> função sem argumentos, lida só na exportação
+
+    def observe(self, operation: str, seconds: float):
+        histogram = self.histograms.get(operation)
+        if histogram is None:
+            histogram = self.histograms[operation] = Histogram()
+        histogram.record(seconds)
+
+    def error(self, operation: str):
+        self.errors[operation] = self.errors.get(operation, 0) + 1
+
+    @contextmanager
+    def timer(self, operation: str):
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.error(operation)
+            raise
+        finally:
+            self.observe(operation, time.perf_counter() - started)
+
+    def register_gauge(self, name: str, read):
+        self.gauges[name] = read
+
+    def summary(self) -> list:
+        """[(operação, chamadas, p50, p95, p99, máx)] em segundos, da que mais consumiu tempo para a que menos."""
+        rows = [
+            (operation, histogram.count, *(histogram.percentile(q) for q in QUANTILES), histogram.max)
+            for operation, histogram in self.histograms.items()
+        ]
+        rows.sort(key=lambda row: self.histograms[row[0]].total, reverse=True)
+        return rows
+
+    def to_openmetrics(self) -> str:
+        lines = [
+            "# TYPE oasis_operation_latency_seconds summary",
+            "# UNIT oasis_operation_latency_seconds seconds",
+            "# HELP oasis_operation_latency_seconds Latência por operação (comandos, botões, modais e banco).",
+        ]
+        for operation, histogram in sorted(self.histograms.items()):
+            label = f'operation="{_escape(operation)}"'
+            for quantile in QUANTILES:
+                lines.append(f'oasis_operation_latency_seconds{{{label},quantile="{quantile}"}} {histogram.percentile(quantile):.6f}')
+            lines.append(f"oasis_operation_latency_seconds_sum{{{label}}} {histogram.total:.6f}")
+            lines.append(f"oasis_operation_latency_seconds_count{{{label}}} {histogram.count}")
+        lines.append("# TYPE oasis_operation_errors counter")
+        lines.append("# HELP oasis_operation_errors Operações que terminaram com exceção.")
+        for operation, count in sorted(self.errors.items()):
+            lines.append(f'oasis_operation_errors_total{{operation="{_escape(operation)}"}} {count}')
+        for name, read in sorted(self.gauges.items()):
+            try:
+                value = float(read())
+            except Exception: # Um indicador quebrado não pode derrubar a exportação dos demais
+                log.exception("Falha ao ler o indicador %s.", name)
+                continue
+            lines.append(f"# TYPE oasis_{name} gauge")
+            lines.append(f"oasis_{name} {value:g}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+registry = Registry()
+
+def observe(operation: str, seconds: float):
+    registry.observe(operation, seconds)
+
+def timer(operation: str):
+    return registry.timer(operation)
+
+def register_gauge(name: str, read):
+    registry.register_gauge(name, read)
+
+# --- Instrumentação ---
+def _wrap_method(cls, attribute: str, operation_of):
+    """Mede um método assíncrono de uma classe; `operation_of` recebe os mesmos argumentos."""
+    original = getattr(cls, attribute, None)
+    if original is None:
+        log.warning("%s.%s não existe nesta versão do discord.py; operação não instrumentada.", cls.__name__, attribute)
+        return
+    if getattr(original, "__metrics_wrapped__", False):
+        return
+
+    @functools.wraps(original)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await original(*args, **kwargs)
+        finally:
+            registry.observe(operation_of(*args), time.perf_counter() - started)
+    wrapper.__metrics_wrapped__ = True
+    setattr(cls, attribute, wrapper)
+
+def _callback_name(item) -> str:
+    callback = getattr(item.callback, "callback", item.callback) # Botões de classe vêm embrulhados pelo discord.py
+    return getattr(callback, "__name__", type(item).__name__)
+
+def _command_operation(tree, interaction: discord.Interaction) -> str:
+    command = interaction.command
+    return f"comando:/{command.qualified_name}" if command else "comando:desconhecido"
+
+def instrument_discord():
+    """Mede todo comando, botão/seleção de view, botão dinâmico e envio de modal.
+
+    O discord.py não expõe um gancho público que envolva a execução inteira desses callbacks,
+    então são envolvidos os métodos internos que os executam. Se algum deixar de existir em uma
+    versão futura, só aquela operação deixa de ser medida. Os erros já são tratados pelo
+    discord.py dentro desses métodos; aqui só entra o tempo.
+    """
+    _wrap_method(app_commands.CommandTree, "_call", _command_operation)
+    # BaseView não existe no discord.py 2.4 e 2.5; nessas versões o método fica na própria View
+    view_class = getattr(discord.ui.view, "BaseView", discord.ui.View)
+    _wrap_method(view_class, "_scheduled_task", lambda view, item, interaction: f"view:{type(view).__name__}.{_callback_name(item)}")
+    _wrap_method(discord.ui.Modal, "_scheduled_task", lambda modal, *args: f"modal:{type(modal).__name__}")
+    _wrap_method(discord.ui.view.ViewStore, "schedule_dynamic_item_call", lambda store, component_type, factory, *args: f"dinamico:{factory.__name__}")
+
+def instrument_module(module, prefix: str):
+    """Troca as funções assíncronas públicas do módulo por versões medidas (ex.: `db:get_farm_ranking`).
+
+    Como os chamadores usam `modulo.funcao(...)`, a troca vale para todos sem alterar o código.
+    """
+    for name, function in inspect.getmembers(module, inspect.iscoroutinefunction):
+        if name.startswith("_") or function.__module__ != module.__name__ or getattr(function, "__metrics_wrapped__", False):
+            continue
+        setattr(module, name, _timed(function, f"{prefix}:{name}"))
+
+def _timed(function, operation: str):
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await function(*args, **kwargs)
+        except Exception:
+            registry.error(operation)
+            raise
+        finally:
+            registry.observe(operation, time.perf_counter() - started)
+    wrapper.__metrics_wrapped__ = True
+    return wrapper
+
+# --- Exportação ---
+def write_openmetrics(path: str, text: str):
+    """Grava em um arquivo temporário e troca de nome: o coletor nunca lê um arquivo pela metade."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temporary = f"{path}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(temporary, path)
+
+async def export_loop():
+    """Exporta as métricas a cada METRICS_EXPORT_INTERVAL segundos; a escrita roda fora do laço de eventos."""
+    while True:
+        cfg = config.current()
+        await asyncio.sleep(cfg.metrics_export_interval)
+        if not cfg.metrics_file:
+            continue
+        try:
+            await asyncio.to_thread(write_openmetrics, cfg.metrics_file, registry.to_openmetrics())
+        except OSError as e:
+            log.error("Falha ao exportar métricas para %s: %s", cfg.metrics_file, e)
@@ -0,0 +1,111 @@
+# resolver.py
+import time
+import discord
+
+FAILURE_TTL = 300 # Segundos até tentar buscar de novo um canal que falhou (apagado ou sem permissão)
+
+def normalize_id(value) -> int:
+    """Converte um ID do config.json (int ou string) para int. Levanta ValueError se for inválido."""
+    if isinstance(value, bool) or value is None:
+        raise ValueError(f"ID inválido: {value!r}")
+    normalized = int(str(value).strip())
+    if normalized <= 0:
+        raise ValueError(f"ID inválido: {value!r}")
+    return normalized
+
+class Resolver:
+    """Resolve canais e cargos a partir do cache do bot, aceitando IDs como int ou string.
+
+    Canais que não estão no cache (ex.: sem permissão de leitura) são buscados na API uma única
+    vez e guardados; falhas também ficam guardadas por FAILURE_TTL segundos. O cache é limpo
+    quando o canal é apagado ou alterado.
+    """
+    def __init__(self):
+        self._fetched = {} # channel_id -> canal obtido pela API
+        self._failures = {} # channel_id -> (exceção, horário)
+        self.hits = 0
+        self.misses = 0
+        self.fetches = 0
+
+    def _lookup(self, guild: discord.Guild, channel_id: int):
+        return guild.get_channel(channel_id) or self._fetched.get(channel_id)
+
+    def get_channel(self, guild: discord.Guild, channel_id):
+        """Versão síncrona, só com o cache. Retorna None se o ID for inválido ou o canal não estiver em cache."""
+        try:
+            channel_id = normalize_id(channel_id)
+        except ValueError:
+            self.misses += 1
+            return None
+        channel = self._lookup(guild, channel_id)
+        if channel:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return channel
+
+    async def fetch_channel(self, guild: discord.Guild, channel_id):
+        """Como guild.fetch_channel, mas servido do cache; levanta ValueError, NotFound ou Forbidden."""
+        channel_id = normalize_id(channel_id)
+        channel = self._lookup(guild, channel_id)
+        if channel:
+            self.hits += 1
+            return channel
+        self.misses += 1
+
+        failure = self._failures.get(channel_id)
+        if failure and time.monotonic() - failure[1] < FAILURE_TTL:
+            raise failure[0]
+        self.fetches += 1
+        try:
+            channel = await guild.fetch_channel(channel_id)
+        except (discord.NotFound, discord.Forbidden) as e:
+            self._failures[channel_id] = (e, time.monotonic())
+            raise
+        self._failures.pop(channel_id, None)
+        self._fetched[channel_id] = channel
+        return channel
+
+    def get_role(self, guild: discord.Guild, role_id):
+        try:
+            role = guild.get_role(normalize_id(role_id))
+        except ValueError:
+            role = None
+        if role:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return role
+
+    def invalidate(self, channel_id: int):
+        self._fetched.pop(channel_id, None)
+        self._failures.pop(channel_id, None)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "fetches": self.fetches, "fetched": len(self._fetched)}
+
+resolver = Resolver()
+
+def get_channel(guild: discord.Guild, channel_id):
+    return resolver.get_channel(guild, channel_id)
+
+async def fetch_channel(guild: discord.Guild, channel_id):
+    return await resolver.fetch_channel(guild, channel_id)
+
+def get_role(guild: discord.Guild, role_id):
+    return resolver.get_role(guild, role_id)
+
+def attach(bot: discord.Client):
+    """Registra os listeners que mantêm o cache de canais buscados pela API coerente."""
+    async def on_guild_channel_delete(channel):
+        resolver.invalidate(channel.id)
+
+    async def on_guild_channel_update(before, after):
+        resolver.invalidate(after.id)
+
+    async def on_guild_channel_create(channel):
+        resolver.invalidate(channel.id)
+
+    bot.add_listener(on_guild_channel_delete)
+    bot.add_listener(on_guild_channel_update)
+    bot.add_listener(on_guild_channel_create)
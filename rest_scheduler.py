@@ -0,0 +1,150 @@
+# rest_scheduler.py
+import asyncio
+import bisect
+import enum
+import itertools
+import time
+from contextlib import asynccontextmanager
+import config
+
+RESERVED_SLOTS = 2 # Vagas que só URGENT e INTERACTION podem ocupar
+INTERACTION_WINDOW = 3.0 # Segundos em que trabalhos de fundo cedem a vez após uma interação
+MAX_BACKGROUND_DEFER = 15.0 # Limite de espera por interações, para o fundo nunca ficar parado
+# Chamadas simultâneas por grupo de rota; grupos não listados só respeitam o limite global
+BUCKET_LIMITS = {
+    "hierarchy": 1,
+    "ranking": 1,
+    "bulk": 3,
+}
+
+class Priority(enum.IntEnum):
+    URGENT = 0 # Alertas de resgate
+    INTERACTION = 1 # Respostas ligadas a uma interação em andamento
+    NORMAL = 2 # Logs e tarefas agendadas
+    BACKGROUND = 3 # Repinturas e trabalhos em lote
+
+class _Waiter:
+    def __init__(self, priority: Priority, bucket: str, sequence: int, future: asyncio.Future):
+        self.priority = priority
+        self.bucket = bucket
+        self.sequence = sequence
+        self.future = future
+        self.enqueued_at = time.monotonic()
+
+    def __lt__(self, other):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+class RestScheduler:
+    """Fila única de saída para a API do Discord, atendida por ordem de prioridade.
+
+    Cada chamada ocupa uma vaga (`async with scheduler.slot(...)`). As últimas RESERVED_SLOTS
+    vagas ficam para URGENT e INTERACTION, e trabalhos BACKGROUND esperam enquanto houver
+    interações recentes, então um alerta ou uma resposta nunca fica atrás de um lote.
+    """
+    def __init__(self, concurrency: int = None, reserved: int = RESERVED_SLOTS, bucket_limits: dict = None):
+        self.concurrency = config.current().rest_concurrency if concurrency is None else concurrency
+        self.reserved = reserved
+        self.bucket_limits = BUCKET_LIMITS if bucket_limits is None else bucket_limits
+        self._waiting = [] # Ordenada por (prioridade, ordem de chegada)
+        self._sequence = itertools.count()
+        self._in_flight = 0
+        self._bucket_in_flight = {}
+        self._interaction_until = 0.0
+        self._timer = None
+        self.completed = {priority.name: 0 for priority in Priority}
+        self.wait_time = {priority.name: 0.0 for priority in Priority}
+        self.max_depth = 0
+
+    def set_concurrency(self, concurrency: int):
+        self.concurrency = concurrency
+        if self._waiting:
+            self._dispatch() # Vagas novas podem liberar quem está esperando
+
+    def note_interaction(self):
+        self._interaction_until = time.monotonic() + INTERACTION_WINDOW
+
+    def _can_start(self, waiter: _Waiter, now: float) -> bool:
+        if self._in_flight >= self.concurrency:
+            return False
+        if waiter.priority >= Priority.NORMAL and self._in_flight >= self.concurrency - self.reserved:
+            return False
+        if waiter.priority == Priority.BACKGROUND and now < self._interaction_until and now - waiter.enqueued_at < MAX_BACKGROUND_DEFER:
+            return False
+        limit = self.bucket_limits.get(waiter.bucket)
+        return limit is None or self._bucket_in_flight.get(waiter.bucket, 0) < limit
+
+    def _dispatch(self):
+        now = time.monotonic()
+        for waiter in list(self._waiting):
+            if waiter.future.done(): # Cancelado enquanto esperava
+                self._waiting.remove(waiter)
+            elif self._can_start(waiter, now):
+                self._waiting.remove(waiter)
+                self._start(waiter.bucket)
+                self.wait_time[waiter.priority.name] += now - waiter.enqueued_at
+                waiter.future.set_result(None)
+        # Fundo adiado por interações: reavalia quando a janela acabar
+        if self._waiting and self._timer is None and now < self._interaction_until:
+            self._timer = asyncio.get_running_loop().call_later(self._interaction_until - now, self._on_timer)
+
+    def _on_timer(self):
+        self._timer = None
+        self._dispatch()
+
+    def _start(self, bucket: str):
+        self._in_flight += 1
+        self._bucket_in_flight[bucket] = self._bucket_in_flight.get(bucket, 0) + 1
+
+    def _finish(self, bucket: str, priority: Priority):
+        self._in_flight -= 1
+        self._bucket_in_flight[bucket] -= 1
+        self.completed[priority.name] += 1
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority = Priority.NORMAL, bucket: str = None):
+        waiter = _Waiter(priority, bucket, next(self._sequence), asyncio.get_running_loop().create_future())
+        bisect.insort(self._waiting, waiter)
+        self.max_depth = max(self.max_depth, len(self._waiting))
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._finish(bucket, priority) # A vaga chegou a ser concedida
+            else:
+                self._dispatch()
+            raise
+        try:
+            yield
+        finally:
+            self._finish(bucket, priority)
+
+    def stats(self) -> dict:
+        depth = {priority.name: 0 for priority in Priority}
+        for waiter in self._waiting:
+            depth[waiter.priority.name] += 1
+        return {
+            "in_flight": self._in_flight,
+            "queued": depth,
+            "max_depth": self.max_depth,
+            "completed": dict(self.completed),
+            "wait_time": dict(self.wait_time),
+        }
+
+scheduler = RestScheduler()
+
+def slot(priority: Priority = Priority.NORMAL, bucket: str = None):
+    return scheduler.slot(priority, bucket)
+
+def attach(bot):
+    """Faz os trabalhos de fundo cederem a vez enquanto há interações sendo respondidas."""
+    async def on_interaction(interaction):
+        scheduler.note_interaction()
+
+    async def on_config_update(keys, old, new):
+        if "rest_concurrency" in keys:
+            scheduler.set_concurrency(new.rest_concurrency)
+
+    bot.add_listener(on_interaction)
+    bot.add_listener(on_config_update)
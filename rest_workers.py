@@ -0,0 +1,64 @@
+# rest_workers.py
+import asyncio
+import time
+import discord
+import rest_scheduler
+from rest_scheduler import Priority
+
+DEFAULT_CONCURRENCY = 3 # Chamadas simultâneas por lote
+MAX_RETRIES = 3 # Novas tentativas em caso de 429 ou erro 5xx
+PROGRESS_INTERVAL = 2.0 # Segundos mínimos entre atualizações de progresso
+
+def retry_delay(error: discord.HTTPException, attempt: int) -> float:
+    """Tempo de espera antes de repetir uma chamada que falhou por limite de taxa ou erro do Discord."""
+    if error.status == 429 and error.response is not None:
+        retry_after = error.response.headers.get("Retry-After")
+        if retry_after:
+            return float(retry_after)
+    return min(2 ** attempt, 10)
+
+async def run_bulk(items, action, *, concurrency: int = DEFAULT_CONCURRENCY, on_progress=None, priority: Priority = Priority.BACKGROUND, bucket: str = "bulk"):
+    """Executa `await action(item)` para cada item, com no máximo `concurrency` chamadas em paralelo.
+
+    Cada tentativa ocupa uma vaga do rest_scheduler com a prioridade indicada, então lotes
+    cedem a vez a alertas e respostas de interação entre uma chamada e outra. Lotes pedidos pela
+    staff e acompanhados pelo token da interação devem usar Priority.NORMAL: em BACKGROUND, cada
+    chamada pode esperar até MAX_BACKGROUND_DEFER e o lote todo pode passar dos 15 minutos do token.
+
+    Respostas 429 e 5xx são repetidas respeitando o Retry-After. `on_progress(feitos, total)` é
+    chamado no máximo a cada PROGRESS_INTERVAL segundos e uma última vez ao final.
+    Retorna a lista de (item, erro) dos itens que falharam.
+    """
+    items = list(items)
+    total = len(items)
+    semaphore = asyncio.Semaphore(concurrency)
+    failures = []
+    done = 0
+    last_progress = time.monotonic()
+
+    async def worker(item):
+        nonlocal done, last_progress
+        async with semaphore:
+            for attempt in range(MAX_RETRIES + 1):
+                try:
+                    async with rest_scheduler.slot(priority, bucket):
+                        await action(item)
+                    break
+                except discord.HTTPException as e:
+                    if (e.status == 429 or e.status >= 500) and attempt < MAX_RETRIES:
+                        await asyncio.sleep(retry_delay(e, attempt))
+                        continue
+                    failures.append((item, e))
+                    break
+                except Exception as e:
+                    failures.append((item, e))
+                    break
+        done += 1
+        if on_progress and time.monotonic() - last_progress >= PROGRESS_INTERVAL:
+            last_progress = time.monotonic()
+            await on_progress(done, total)
+
+    await asyncio.gather(*(worker(item) for item in items))
+    if on_progress:
+        await on_progress(done, total)
+    return failures
@@ -0,0 +1,39 @@
+# startup.py
+import time
+from contextlib import contextmanager
+
+class StartupTimer:
+    """Mede a duração de cada fase da inicialização para o relatório de partida a frio.
+
+    O relógio começa na importação deste módulo, que deve ser o primeiro importado pelo
+    main.py; o tempo até a primeira fase é atribuído às importações.
+    """
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._mark = self.started
+        self.phases = [] # [(nome, segundos)] na ordem em que terminaram
+        self.reported = False
+
+    def lap(self, name: str):
+        """Encerra uma fase que começou no fim da anterior (ex.: importações, gateway)."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self._mark))
+        self._mark = now
+
+    @contextmanager
+    def phase(self, name: str):
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self.phases.append((name, now - begin))
+            self._mark = now
+
+    def report(self) -> str:
+        total = time.perf_counter() - self.started
+        lines = [f"  {name:<18} {seconds:7.2f}s" for name, seconds in self.phases]
+        lines.append(f"  {'total':<18} {total:7.2f}s")
+        return "Tempo de inicialização por fase:\n" + "\n".join(lines)
+
+timer = StartupTimer()
@@ -0,0 +1,68 @@
+# uploads.py
+import asyncio
+import discord
+
+class UploadSuperseded(Exception):
+    """O usuário iniciou outro fluxo no mesmo canal antes de enviar a imagem do anterior."""
+
+class UploadDispatcher:
+    """Entrega a próxima mensagem com anexo de um usuário ao fluxo que está esperando por ela.
+
+    Substitui os `bot.wait_for("message", check=...)` de cada formulário: em vez de cada
+    formulário pendente testar todas as mensagens do servidor, há um único listener que
+    encontra o fluxo certo com uma busca O(1) por (user_id, channel_id).
+    """
+    def __init__(self):
+        self._pending: dict[tuple[int, int], asyncio.Future] = {}
+        self.delivered = 0
+        self.timed_out = 0
+        self.superseded = 0
+
+    async def wait_for_upload(self, user_id: int, channel_id: int, timeout: float) -> discord.Message:
+        """Espera a próxima mensagem com anexo do usuário no canal.
+
+        Levanta asyncio.TimeoutError se nada chegar a tempo e UploadSuperseded se o usuário
+        iniciar outro fluxo no mesmo canal enquanto este ainda espera.
+        """
+        key = (user_id, channel_id)
+        self.cancel(user_id, channel_id)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        finally:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+
+    def cancel(self, user_id: int, channel_id: int) -> bool:
+        """Cancela a espera em andamento do usuário no canal, se houver."""
+        future = self._pending.pop((user_id, channel_id), None)
+        if future is None or future.done():
+            return False
+        future.set_exception(UploadSuperseded())
+        self.superseded += 1
+        return True
+
+    async def on_message(self, message: discord.Message):
+        if not message.attachments or message.author.bot:
+            return
+        future = self._pending.get((message.author.id, message.channel.id))
+        if future is not None and not future.done():
+            future.set_result(message)
+            self.delivered += 1
+
+    def is_waiting(self, user_id: int, channel_id: int) -> bool:
+        return (user_id, channel_id) in self._pending
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "delivered": self.delivered,
+            "timed_out": self.timed_out,
+            "superseded": self.superseded,
+        }
+
+dispatcher = UploadDispatcher()